@@ -0,0 +1,53 @@
+"""Benchmark the vectorized address splitter against the per-row `extract_address_components`.
+
+Usage:
+    python -m benchmarks.bench_address_split --rows 1000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from chatlas.data_prep.semantic import ADDRESS_COLUMNS, extract_address_components, split_addresses
+
+TEMPLATES = [
+    "{i} Main St, Springfield, USA",
+    "{i} Main St, Springfield, IL 62701, USA",
+    "Diner {i}, {i} Main St, Springfield, IL 62701, USA",
+    "Springfield, USA",
+    None,
+]
+
+
+def make_addresses(rows: int, seed: int = 0) -> pd.Series:
+    rng = np.random.default_rng(seed)
+    choices = rng.integers(0, len(TEMPLATES), size=rows)
+    return pd.Series([None if TEMPLATES[c] is None else TEMPLATES[c].format(i=i) for i, c in enumerate(choices)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    addresses = make_addresses(args.rows)
+
+    start = time.perf_counter()
+    expected = addresses.apply(extract_address_components)
+    expected.columns = ADDRESS_COLUMNS
+    per_row = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = split_addresses(addresses)
+    vectorized = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(expected, result)
+    print(f"rows:       {args.rows:,}")
+    print(f"per-row:    {per_row:.3f}s")
+    print(f"vectorized: {vectorized:.3f}s ({per_row / vectorized:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""End-to-end offline benchmark of the SQL, graph and DataFrame agents.
+
+Each agent is driven by a deterministic scripted chat model over a synthetic location history, so runs need no API
+key or network. Per question, latency is broken down into model, tool and SQL time (SQL is part of tool time; tool
+time of parallel calls is summed), alongside the number of model calls and the prompt tokens of each call.
+
+Usage:
+    python -m benchmarks.bench_agents --years 2 --questions 10 --llm-latency 0.1
+"""
+
+import argparse
+import json
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from uuid import UUID
+
+import pandas as pd
+from langchain.callbacks.base import BaseCallbackHandler
+from langchain_community.chat_models.fake import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from sqlalchemy import Engine, event
+
+from benchmarks.synthetic import write_semantic_history
+from chatlas.agent.chatlas_sql import create_chatlas
+from chatlas.agent.graph import create_graph_agent
+from chatlas.data_prep import semantic
+
+QUESTION = "Which cities did I spend the most time in?"
+QUERY = "SELECT city, COUNT(*) AS visits FROM places GROUP BY city ORDER BY visits DESC LIMIT 5"
+ANSWER = "You spent most of your time in San Francisco."
+
+
+class ScriptedChatModel(FakeMessagesListChatModel):
+    """Replays a fixed script of model messages, cycling per question, with a fixed per-call latency."""
+
+    latency_s: float = 0.0
+
+    def _generate(self, *args: Any, **kwargs: Any):
+        time.sleep(self.latency_s)
+        return super()._generate(*args, **kwargs)
+
+
+class SQLTimer:
+    """Accumulate the time spent executing SQL statements on any SQLAlchemy engine."""
+
+    def __init__(self):
+        self.total_s = 0.0
+        self.statements = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        event.listen(Engine, "before_cursor_execute", self.before)
+        event.listen(Engine, "after_cursor_execute", self.after)
+
+    def before(self, *args) -> None:
+        self._local.start = time.perf_counter()
+
+    def after(self, *args) -> None:
+        elapsed = time.perf_counter() - self._local.start
+        with self._lock:
+            self.total_s += elapsed
+            self.statements += 1
+
+    def reset(self) -> None:
+        self.total_s, self.statements = 0.0, 0
+
+
+class TimingHandler(BaseCallbackHandler):
+    """Time model and tool runs and count the prompt tokens of every model call."""
+
+    def __init__(self, count_tokens: Callable[[str], int]):
+        self.count_tokens = count_tokens
+        self.llm_s = 0.0
+        self.tool_s = 0.0
+        self.prompt_tokens: List[int] = []
+        self._starts: Dict[UUID, float] = {}
+
+    def on_chat_model_start(self, serialized: Any, messages: List[List[BaseMessage]], *, run_id: UUID, **kwargs):
+        self._starts[run_id] = time.perf_counter()
+        self.prompt_tokens.append(sum(self.count_tokens(message_text(message)) for message in messages[0]))
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs) -> None:
+        self.llm_s += time.perf_counter() - self._starts.pop(run_id)
+
+    def on_tool_start(self, serialized: Any, input_str: str, *, run_id: UUID, **kwargs) -> None:
+        self._starts[run_id] = time.perf_counter()
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs) -> None:
+        self.tool_s += time.perf_counter() - self._starts.pop(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        self.tool_s += time.perf_counter() - self._starts.pop(run_id)
+
+
+def message_text(message: BaseMessage) -> str:
+    """Everything of a message that is sent as prompt: content and any function/tool call arguments."""
+    return str(message.content) + (json.dumps(message.additional_kwargs) if message.additional_kwargs else "")
+
+
+def approximate_tokens(text: str) -> int:
+    # ~4 characters per token for English text and SQL, good enough to spot prompt growth offline
+    return (len(text) + 3) // 4
+
+
+def function_call(name: str, **arguments) -> AIMessage:
+    call = {"name": name, "arguments": json.dumps(arguments)}
+    return AIMessage(content="", additional_kwargs={"function_call": call})
+
+
+def tool_calls(*calls) -> AIMessage:
+    return AIMessage(
+        content="",
+        additional_kwargs={
+            "tool_calls": [
+                {"id": str(i), "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+                for i, (name, arguments) in enumerate(calls)
+            ]
+        },
+    )
+
+
+def sql_agent(db_path: Path, places: pd.DataFrame, latency_s: float):
+    script = [
+        function_call("sql_db_list_tables", tool_input=""),
+        function_call("sql_db_schema", table_names="places"),
+        function_call("sql_db_query", query=QUERY),
+        AIMessage(content=ANSWER),
+    ]
+    llm = ScriptedChatModel(responses=script, latency_s=latency_s)
+    agent = create_chatlas(llm=llm, db=f"sqlite:///{db_path}", functions=True)
+    return lambda config: agent.invoke({"input": QUESTION}, config)["output"]
+
+
+def graph_agent(db_path: Path, places: pd.DataFrame, latency_s: float):
+    script = [
+        tool_calls(("sql_db_schema", {"table_names": "places"}), ("sql_db_schema", {"table_names": "place_rollups"})),
+        tool_calls(("sql_db_query", {"query": QUERY})),
+        AIMessage(content=ANSWER),
+    ]
+    llm = ScriptedChatModel(responses=script, latency_s=latency_s)
+    agent = create_graph_agent(llm, f"sqlite:///{db_path}")
+    return lambda config: agent.invoke({"messages": [HumanMessage(content=QUESTION)]}, config)["messages"][-1].content
+
+
+def dataframe_agent(db_path: Path, places: pd.DataFrame, latency_s: float):
+    from chatlas.agent import chatlas_df
+
+    script = [
+        AIMessage(
+            content="Thought: I should count the visits per city.\n"
+            "Action: python_repl_ast\n"
+            "Action Input: df['city'].value_counts().head()"
+        ),
+        AIMessage(content=f"Thought: I now know the final answer\nFinal Answer: {ANSWER}"),
+    ]
+    llm = ScriptedChatModel(responses=script, latency_s=latency_s)
+    agent = chatlas_df.create_chatlas(llm, places)
+    return lambda config: agent.invoke({"input": QUESTION}, config)["output"]
+
+
+AGENTS = {"sql": sql_agent, "graph": graph_agent, "dataframe": dataframe_agent}
+
+
+def run_agent(ask: Callable[[dict], str], questions: int, sql_timer: SQLTimer, count_tokens) -> Dict[str, Any]:
+    rows = []
+    for _ in range(questions):
+        handler = TimingHandler(count_tokens)
+        sql_timer.reset()
+        start = time.perf_counter()
+        answer = ask({"callbacks": [handler]})
+        total_s = time.perf_counter() - start
+        assert answer == ANSWER, answer
+        rows.append(
+            {
+                "total_s": total_s,
+                "llm_s": handler.llm_s,
+                "tool_s": handler.tool_s,
+                "sql_s": sql_timer.total_s,
+                "sql_statements": sql_timer.statements,
+                "model_calls": len(handler.prompt_tokens),
+                "prompt_tokens": handler.prompt_tokens,
+            }
+        )
+    return summarize(rows)
+
+
+def summarize(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def mean(key: str) -> float:
+        return statistics.fmean(row[key] for row in rows)
+
+    tokens = [n for row in rows for n in row["prompt_tokens"]]
+    return {
+        "total_ms": mean("total_s") * 1000,
+        "llm_ms": mean("llm_s") * 1000,
+        "tool_ms": mean("tool_s") * 1000,
+        "sql_ms": mean("sql_s") * 1000,
+        "sql_statements": mean("sql_statements"),
+        "model_calls": mean("model_calls"),
+        "tokens_per_call": statistics.fmean(tokens),
+        # Growth between the first and last question shows whether the conversation history is bounded
+        "tokens_first_question": statistics.fmean(rows[0]["prompt_tokens"]),
+        "tokens_last_question": statistics.fmean(rows[-1]["prompt_tokens"]),
+    }
+
+
+def build_history(root: Path, years: int, visits_per_day: int) -> Path:
+    semantic_dir = root / "semantic"
+    write_semantic_history(semantic_dir, years=years, visits_per_day=visits_per_day)
+    db_path = root / "chatlas.db"
+    semantic.main(
+        write_df=True,
+        write_sql=True,
+        places_output_path=root / "places.parquet",
+        activities_output_path=root / "activities.parquet",
+        sql_db_path=db_path,
+        semantic_path=semantic_dir,
+    )
+    return db_path
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, default=1)
+    parser.add_argument("--visits-per-day", type=int, default=4)
+    parser.add_argument("--questions", type=int, default=10, help="Questions asked in one conversation per agent")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds per fake model call")
+    parser.add_argument("--agents", nargs="+", choices=list(AGENTS), default=list(AGENTS))
+    parser.add_argument("--tiktoken", action="store_true", help="Count tokens with tiktoken (needs its cached BPE)")
+    args = parser.parse_args(argv)
+
+    count_tokens = approximate_tokens
+    if args.tiktoken:
+        import tiktoken
+
+        count_tokens = lambda text, encoding=tiktoken.get_encoding("cl100k_base"): len(encoding.encode(text))  # noqa
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = Path(tmp_dir)
+        start = time.perf_counter()
+        db_path = build_history(root, args.years, args.visits_per_day)
+        places = semantic.storage.read_table(root / "places.parquet")
+        print(f"Synthetic history: {len(places):,} places in {time.perf_counter() - start:.1f}s")
+
+        sql_timer = SQLTimer()
+        for name in args.agents:
+            try:
+                ask = AGENTS[name](db_path, places, args.llm_latency)
+            except ImportError as e:
+                print(f"{name}: skipped, {e}")
+                continue
+            stats = run_agent(ask, args.questions, sql_timer, count_tokens)
+            print(
+                f"{name}: {stats['total_ms']:.1f}ms per question "
+                f"(llm {stats['llm_ms']:.1f}ms, tools {stats['tool_ms']:.1f}ms, sql {stats['sql_ms']:.1f}ms "
+                f"in {stats['sql_statements']:.0f} statements), {stats['model_calls']:.1f} model calls, "
+                f"{stats['tokens_per_call']:.0f} prompt tokens per call "
+                f"({stats['tokens_first_question']:.0f} on the first question, "
+                f"{stats['tokens_last_question']:.0f} on the last)"
+            )
+
+
+if __name__ == "__main__":
+    main()
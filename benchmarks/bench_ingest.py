@@ -0,0 +1,121 @@
+"""Throughput and peak memory of every ingest stage, on a synthetic Takeout location history.
+
+Peak memory is what Python allocated during a stage (tracemalloc, which also sees numpy and most pandas buffers, but
+not memory of worker processes). Tracing slows stages down; pass --no-memory for clean timings.
+
+Usage:
+    python -m benchmarks.bench_ingest --years 5 --points 10000000 --workers 4
+    python -m benchmarks.bench_ingest --input data/synthetic/location_history
+"""
+
+import argparse
+import resource
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import pyarrow.parquet as pq
+
+from benchmarks.synthetic import generate
+from chatlas.data_prep import records, rollups, semantic, spatial, sqlite_loader, storage
+from chatlas.data_prep.point_store import PointStore
+
+
+class StageTimer:
+    def __init__(self, trace_memory: bool):
+        self.trace_memory = trace_memory
+        if trace_memory:
+            tracemalloc.start()
+
+    def run(self, name: str, fn: Callable[[], Any], rows: Optional[Callable[[Any], int]] = None) -> Any:
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+
+        line = f"{name:<24} {elapsed:8.2f}s"
+        if rows is not None:
+            n = rows(result)
+            line += f" {n:>12,} rows {n / elapsed:>12,.0f} rows/s"
+        if self.trace_memory:
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+            line += f"   peak {peak / 2**20:>9,.1f} MB"
+        print(line)
+        return result
+
+
+def bench_semantic(timer: StageTimer, semantic_dir: Path, output_dir: Path, workers: Optional[int]) -> None:
+    places, activities = timer.run(
+        "semantic extract",
+        lambda: semantic.extract_all_semantic(semantic_dir, workers=workers),
+        lambda result: len(result[0]) + len(result[1]),
+    )
+    places = timer.run("semantic places", lambda: semantic.process_places(places), len)
+    activities = timer.run("semantic activities", lambda: semantic.process_activities(activities), len)
+
+    def write_parquet():
+        semantic.write_to_df(places, output_dir / "semantic_places.parquet", storage.PLACES_TYPES)
+        semantic.write_to_df(activities, output_dir / "semantic_activities.parquet", storage.ACTIVITIES_TYPES)
+
+    timer.run("semantic parquet", write_parquet)
+
+    with sqlite3.connect(output_dir / "chatlas.db") as conn:
+        tables = {"places": places, "activities": activities}
+        timer.run("sqlite load", lambda: sqlite_loader.load(conn, tables), lambda _: len(places) + len(activities))
+        timer.run("spatial index", lambda: spatial.refresh_spatial_index(conn, rebuild=True))
+        timer.run("rollups", lambda: rollups.refresh_rollups(conn))
+
+
+def bench_records(timer: StageTimer, records_path: Path, output_dir: Path) -> None:
+    """Time the streaming records ingest of `records.main` end to end."""
+    output_path, store_path = output_dir / "records.parquet", output_dir / "points"
+    timer.run(
+        "records ingest",
+        lambda: records.main(
+            records_path=records_path,
+            output_path=output_path,
+            sql_db_path=output_dir / "chatlas.db",
+            point_store_path=store_path,
+        ),
+        lambda _: len(PointStore(store_path)),
+    )
+    n_points, n_reduced = len(PointStore(store_path)), pq.ParquetFile(output_path).metadata.num_rows
+    print(f"{'':<24} {n_points:,} -> {n_reduced:,} points ({n_points / max(n_reduced, 1):.1f}x compression)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--input", type=Path, help="Existing location_history directory (semantic/ and Records.json)")
+    parser.add_argument("--years", type=int, default=1)
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--skip-records", action="store_true")
+    parser.add_argument("--no-memory", action="store_true", help="Don't trace memory allocations")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        if args.input is None:
+            start = time.perf_counter()
+            generate(tmp_dir / "location_history", years=args.years, points=0 if args.skip_records else args.points)
+            print(f"Generated synthetic history in {time.perf_counter() - start:.1f}s")
+            location_history = tmp_dir / "location_history"
+        else:
+            location_history = args.input
+
+        timer = StageTimer(trace_memory=not args.no_memory)
+        bench_semantic(timer, location_history / "semantic", tmp_dir, args.workers)
+        if not args.skip_records:
+            bench_records(timer, location_history / "Records.json", tmp_dir)
+
+    # ru_maxrss is in kilobytes on Linux
+    print(f"Process peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:,.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Benchmark typed `normalize_columns` against the per-cell applymap lowercasing of processed Records.
+
+Compares normalization time, in-memory size and pickle/Parquet write times and sizes.
+
+Usage:
+    python -m benchmarks.bench_normalize --points 1000000
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.synthetic import write_records
+from chatlas.data_prep import records
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        write_records(tmp_dir / "Records.json", args.points)
+        df = records.load_data_streaming(tmp_dir / "Records.json")
+        df["timestamp"] = pd.to_datetime(df["timestamp"], format="ISO8601")
+        df["top_activity"], df["confidence"] = records.top_activities(df.pop("activity"))
+
+        applymap, applymap_s = timed(lambda: df.map(lambda x: x.lower() if isinstance(x, str) else x))
+        typed, typed_s = timed(lambda: records.normalize_columns(df))
+
+        for label, result, elapsed in [("applymap", applymap, applymap_s), ("typed", typed, typed_s)]:
+            memory_mb = result.memory_usage(deep=True).sum() / 1e6
+            _, pickle_s = timed(lambda: result.to_pickle(tmp_dir / f"{label}.pkl"))
+            _, parquet_s = timed(lambda: records.save_data(result, tmp_dir / f"{label}.parquet"))
+            pickle_mb = (tmp_dir / f"{label}.pkl").stat().st_size / 1e6
+            parquet_mb = (tmp_dir / f"{label}.parquet").stat().st_size / 1e6
+            print(
+                f"{label}: normalize {elapsed:.3f}s, {memory_mb:,.1f} MB in memory, "
+                f"pickle {pickle_s:.3f}s / {pickle_mb:,.1f} MB, parquet {parquet_s:.3f}s / {parquet_mb:,.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark graph agent iterations with one tool call per turn against parallel tool calls per turn.
+
+A scripted fake chat model answers the same question either by requesting the schema of each table and the query in
+separate turns, or by requesting both schemas in one turn. No API key or network is needed.
+
+Usage:
+    python -m benchmarks.bench_parallel_tools --questions 20 --llm-latency 0.2
+"""
+
+import argparse
+import json
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, List
+
+from langchain_community.chat_models.fake import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+from chatlas.agent.graph import create_graph_agent
+
+QUERY = "SELECT city, COUNT(*) AS visits FROM places GROUP BY city ORDER BY visits DESC LIMIT 5"
+
+
+class SlowFakeChatModel(FakeMessagesListChatModel):
+    """Scripted chat model with a fixed per-call latency, standing in for the API round-trip."""
+
+    latency_s: float = 0.0
+
+    def _generate(self, *args: Any, **kwargs: Any):
+        time.sleep(self.latency_s)
+        return super()._generate(*args, **kwargs)
+
+
+def tool_call(call_id: str, name: str, **arguments) -> dict:
+    return {"id": call_id, "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+
+def calls_message(*calls: dict) -> AIMessage:
+    return AIMessage(content="", additional_kwargs={"tool_calls": list(calls)})
+
+
+def sequential_script() -> List[AIMessage]:
+    return [
+        calls_message(tool_call("1", "sql_db_schema", table_names="places")),
+        calls_message(tool_call("2", "sql_db_schema", table_names="activities")),
+        calls_message(tool_call("3", "sql_db_query", query=QUERY)),
+        AIMessage(content="You were mostly in San Francisco."),
+    ]
+
+
+def parallel_script() -> List[AIMessage]:
+    return [
+        calls_message(
+            tool_call("1", "sql_db_schema", table_names="places"),
+            tool_call("2", "sql_db_schema", table_names="activities"),
+        ),
+        calls_message(tool_call("3", "sql_db_query", query=QUERY)),
+        AIMessage(content="You were mostly in San Francisco."),
+    ]
+
+
+def make_db(db_path: Path, rows: int) -> None:
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE places (name TEXT, city TEXT, start_time TEXT)")
+        conn.execute("CREATE TABLE activities (activity_type TEXT, distance REAL, start_time TEXT)")
+        conn.executemany(
+            "INSERT INTO places VALUES (?, ?, ?)",
+            [(f"Cafe {i % 50}", f"City {i % 7}", "2023-01-01 10:00:00") for i in range(rows)],
+        )
+        conn.executemany(
+            "INSERT INTO activities VALUES (?, ?, ?)",
+            [("WALKING", 1500.0 + i, "2023-01-01 12:00:00") for i in range(rows)],
+        )
+
+
+def run(db_uri: str, script: List[AIMessage], questions: int, latency_s: float):
+    steps = model_calls = 0
+    start = time.perf_counter()
+    for _ in range(questions):
+        llm = SlowFakeChatModel(responses=script, latency_s=latency_s)
+        agent = create_graph_agent(llm, db_uri)
+        for step in agent.stream({"messages": [HumanMessage(content="Where did I spend most of my time?")]}):
+            steps += 1
+            model_calls += "agent" in step
+    return time.perf_counter() - start, steps / questions, model_calls / questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds per fake model call")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / "chatlas.db"
+        make_db(db_path, args.rows)
+        db_uri = f"sqlite:///{db_path}"
+        for label, script in [("sequential", sequential_script()), ("parallel", parallel_script())]:
+            elapsed, steps, model_calls = run(db_uri, script, args.questions, args.llm_latency)
+            print(
+                f"{label}: {steps:.1f} graph steps and {model_calls:.1f} model calls per question, "
+                f"{elapsed / args.questions:.3f}s per question"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Time to load one week of Records points: whole Parquet file, Parquet with row-group filters, and the point store.
+
+Usage:
+    python -m benchmarks.bench_point_store --points 10000000 --years 5
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from chatlas.data_prep import point_store, records, storage
+
+WEEK_START = "2021-06-01"
+WEEK_END = "2021-06-08"
+
+
+def make_points(points: int, years: int, seed: int = 0) -> pd.DataFrame:
+    """Evenly spread points around San Francisco, the same columns as preprocessed Records."""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2020-01-01", tz="UTC").value
+    span = pd.Timedelta(days=365 * years).value
+    return pd.DataFrame(
+        {
+            "timestamp": pd.to_datetime(start + np.sort(rng.integers(0, span, points)), unit="ns", utc=True),
+            "latitudeE7": (377_749_000 + rng.normal(0, 100_000, points)).astype(np.int64),
+            "longitudeE7": (-1_224_194_000 + rng.normal(0, 100_000, points)).astype(np.int64),
+            "accuracy": rng.integers(3, 50, points).astype(np.float64),
+        }
+    )
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, default=10_000_000)
+    parser.add_argument("--years", type=int, default=5)
+    args = parser.parse_args()
+
+    df = make_points(args.points, args.years)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        parquet_path, store_path = tmp_dir / "records.parquet", tmp_dir / "points"
+        _, parquet_write_s = timed(lambda: records.save_data(df, parquet_path))
+        _, store_write_s = timed(lambda: point_store.write_point_store(df, store_path))
+        print(f"Write: parquet {parquet_write_s:.2f}s, point store {store_write_s:.2f}s for {len(df):,} points")
+        del df
+
+        def full_parquet():
+            full = storage.read_table(parquet_path)
+            start, end = pd.Timestamp(WEEK_START, tz="UTC"), pd.Timestamp(WEEK_END, tz="UTC")
+            return full[(full["timestamp"] >= start) & (full["timestamp"] < end)]
+
+        loaders = {
+            "parquet, whole file": full_parquet,
+            "parquet, filtered": lambda: storage.read_table(
+                parquet_path, start=WEEK_START, end=WEEK_END, time_column="timestamp"
+            ),
+            "point store, frame": lambda: point_store.PointStore(store_path).to_frame(WEEK_START, WEEK_END),
+            "point store, views": lambda: point_store.PointStore(store_path).slice(WEEK_START, WEEK_END)["lat"],
+        }
+        for name, load in loaders.items():
+            window, elapsed = timed(load)
+            print(f"{name:<22} {elapsed * 1000:10.1f}ms {len(window):>10,} points")
+
+
+if __name__ == "__main__":
+    main()
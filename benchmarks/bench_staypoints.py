@@ -0,0 +1,78 @@
+"""Throughput and peak memory of stay-point detection as the number of points grows.
+
+Points are generated chunk by chunk in memory: stays with GPS jitter alternate with dense trips between them, so the
+vectorized chain path and the anchor-by-anchor path both get exercised. Time per point should stay flat, and peak
+memory should follow the chunk size rather than the total number of points.
+
+Usage:
+    python -m benchmarks.bench_staypoints --points 1000000 10000000 --chunk-size 1000000
+"""
+
+import argparse
+import time
+import tracemalloc
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from chatlas.data_prep import staypoints
+
+METERS_PER_DEGREE = 111_320.0
+
+
+def make_chunks(points: int, chunk_size: int, seed: int = 0) -> Iterator[pd.DataFrame]:
+    """A track alternating 30-180 minute stays (a fix per minute) and 5-30 minute trips (a fix every 10 s)."""
+    rng = np.random.default_rng(seed)
+    t_s, lat, lon = 1_577_836_800.0, 37.77, -122.42
+    for offset in range(0, points, chunk_size):
+        n = min(chunk_size, points - offset)
+        # Enough stay + trip segments to cover the chunk, each at least 60 points long
+        n_segments = n // 60 + 1
+        stay = rng.integers(30, 180, n_segments)
+        trip = rng.integers(30, 180, n_segments)
+        lengths = np.ravel(np.column_stack([stay, trip]))
+        segment = np.repeat(np.arange(2 * n_segments), lengths)[:n]
+        is_trip = segment % 2 == 1
+
+        # Time and displacement of every point, trips heading in a random direction at a random pace
+        dt = np.where(is_trip, 10.0, 60.0)
+        t = t_s + np.cumsum(dt) - dt[0]
+        angle = rng.uniform(0, 2 * np.pi, 2 * n_segments)[segment]
+        step_m = np.where(is_trip, rng.uniform(5, 25, 2 * n_segments)[segment], 0.0)
+        north = np.cumsum(step_m * np.sin(angle)) + rng.normal(0, 10, n)
+        east = np.cumsum(step_m * np.cos(angle)) + rng.normal(0, 10, n)
+
+        chunk_lat = lat + north / METERS_PER_DEGREE
+        chunk_lon = lon + east / (METERS_PER_DEGREE * np.cos(np.radians(lat)))
+        t_s, lat, lon = t[-1] + 10, chunk_lat[-1], chunk_lon[-1]
+        yield pd.DataFrame({"timestamp": pd.to_datetime(t, unit="s", utc=True), "lat": chunk_lat, "lon": chunk_lon})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, nargs="+", default=[1_000_000, 4_000_000])
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--no-memory", action="store_true", help="Don't trace memory allocations")
+    args = parser.parse_args()
+
+    if not args.no_memory:
+        tracemalloc.start()
+    for points in args.points:
+        if not args.no_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        places = staypoints.detect_places(make_chunks(points, args.chunk_size))
+        elapsed = time.perf_counter() - start
+
+        line = (
+            f"{points:>12,} points {elapsed:8.2f}s {points / elapsed:>12,.0f} points/s "
+            f"{len(places):>9,} stays at {places['place_id'].nunique():>7,} places"
+        )
+        if not args.no_memory:
+            line += f"   peak {tracemalloc.get_traced_memory()[1] / 2**20:>9,.1f} MB"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
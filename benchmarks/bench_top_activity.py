@@ -0,0 +1,62 @@
+"""Benchmark vectorized `top_activities` against the per-row `get_top_activity` apply chain.
+
+Usage:
+    python -m benchmarks.bench_top_activity --rows 1000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import ACTIVITIES
+from chatlas.data_prep.records import get_top_activity, top_activities
+
+
+def make_activity(rows: int, with_activity: float, seed: int = 0) -> pd.Series:
+    """An `activity` column like raw Records: mostly missing, otherwise one or two timestamped guess lists."""
+    rng = np.random.default_rng(seed)
+    values = []
+    for has_activity, n_lists, choice in zip(
+        rng.random(rows) < with_activity, rng.integers(1, 3, rows), rng.integers(0, len(ACTIVITIES), rows)
+    ):
+        if has_activity:
+            values.append([{"activity": ACTIVITIES[(choice + i) % len(ACTIVITIES)]} for i in range(n_lists)])
+        else:
+            values.append(np.nan)
+    return pd.Series(values)
+
+
+def per_row(activity: pd.Series):
+    top = activity.apply(get_top_activity)
+    confidence = top.apply(lambda x: x["confidence"] if x else None)
+    return top.apply(lambda x: x["type"] if x else None), confidence
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--with-activity", type=float, default=0.3, help="Share of rows with activity guesses")
+    args = parser.parse_args()
+
+    activity = make_activity(args.rows, args.with_activity)
+
+    start = time.perf_counter()
+    expected = per_row(activity)
+    baseline = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = top_activities(activity)
+    vectorized = time.perf_counter() - start
+
+    for expected_column, column in zip(expected, result):
+        pd.testing.assert_series_equal(expected_column, column)
+    print(
+        f"{args.rows:,} rows: per-row {baseline:.3f}s, vectorized {vectorized:.3f}s "
+        f"({baseline / vectorized:.1f}x faster)"
+    )
+
+
+if __name__ == "__main__":
+    main()
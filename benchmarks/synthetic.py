@@ -0,0 +1,323 @@
+"""Synthetic Google Takeout location history for benchmarks and scale testing.
+
+Writes semantic monthly files (`semantic/<year>/<year>_<MONTH>.json` with placeVisit/activitySegment timeline objects)
+and a raw `Records.json`, in the formats `chatlas.data_prep.semantic` and `chatlas.data_prep.records` read. Days are
+spent around a home city with occasional trips to other cities, and activity types follow the distance travelled, so
+rollups, spatial queries and the agents see realistic data. Files are written month by month and chunk by chunk, so
+20 years of history or 100M raw points can be generated in bounded memory.
+
+Usage:
+    python -m benchmarks.synthetic data/synthetic --years 20 --points 100000000
+"""
+
+import argparse
+import calendar
+import json
+import math
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# city, state, country, postcode, lat, lon
+CITIES: List[Tuple[str, str, str, str, float, float]] = [
+    ("San Francisco", "CA", "USA", "94103", 37.7749, -122.4194),
+    ("New York", "NY", "USA", "10001", 40.7128, -74.0060),
+    ("Seattle", "WA", "USA", "98101", 47.6062, -122.3321),
+    ("Toronto", "ON", "Canada", "M5H 2N2", 43.6532, -79.3832),
+    ("Mexico City", "CDMX", "Mexico", "06000", 19.4326, -99.1332),
+    ("London", "England", "UK", "SW1A 1AA", 51.5074, -0.1278),
+    ("Paris", "IDF", "France", "75001", 48.8566, 2.3522),
+    ("Tokyo", "Tokyo", "Japan", "100-0001", 35.6762, 139.6503),
+]
+PLACE_KINDS = ["Cafe", "Park", "Office", "Museum", "Restaurant", "Gym", "Bookstore", "Market", "Bar", "Hotel"]
+STREETS = ["Market St", "Main St", "High St", "Broadway", "King St", "Park Ave", "Oak St", "Church St"]
+
+PLACES_PER_CITY = 50
+TRIP_DAYS = 7
+RECORDS_CHUNK_SIZE = 1_000_000
+SOURCES = ["GPS", "WIFI", "CELL"]
+# Raw activity guesses attached to some points, as the Records.json `activity` field
+ACTIVITIES = [
+    [{"type": "STILL", "confidence": 80}, {"type": "ON_FOOT", "confidence": 15}],
+    [{"type": "WALKING", "confidence": 70}, {"type": "ON_FOOT", "confidence": 70}, {"type": "STILL", "confidence": 10}],
+    [{"type": "IN_VEHICLE", "confidence": 85}, {"type": "IN_ROAD_VEHICLE", "confidence": 85}],
+    [{"type": "ON_BICYCLE", "confidence": 60}, {"type": "UNKNOWN", "confidence": 25}],
+]
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6_371_000 * math.asin(math.sqrt(a))
+
+
+def make_places(rng: np.random.Generator) -> List[List[dict]]:
+    """A fixed pool of named places scattered within ~5km of each city centre."""
+    places = []
+    for c, (city, state, country, postcode, lat, lon) in enumerate(CITIES):
+        city_places = []
+        for p in range(PLACES_PER_CITY):
+            place_lat = lat + rng.normal(0, 0.02)
+            place_lon = lon + rng.normal(0, 0.02) / math.cos(math.radians(lat))
+            name = f"{PLACE_KINDS[p % len(PLACE_KINDS)]} {p // len(PLACE_KINDS) + 1}"
+            street = f"{rng.integers(1, 2000)} {STREETS[p % len(STREETS)]}"
+            city_places.append(
+                {
+                    "latitudeE7": int(place_lat * 1e7),
+                    "longitudeE7": int(place_lon * 1e7),
+                    "placeId": f"place_{c}_{p}",
+                    "address": f"{name}, {street}, {city}, {state} {postcode}, {country}",
+                    "name": name,
+                }
+            )
+        places.append(city_places)
+    return places
+
+
+def trip_schedule(rng: np.random.Generator, n_days: int, trip_every_days: int) -> np.ndarray:
+    """City index of every day: the home city (0), or another city during week-long trips."""
+    cities = np.zeros(n_days, dtype=np.int64)
+    day = 0
+    while day < n_days:
+        if rng.random() < 1 / trip_every_days:
+            cities[day : day + TRIP_DAYS] = rng.integers(1, len(CITIES))
+            day += TRIP_DAYS
+        day += 1
+    return cities
+
+
+def activity_type(distance_m: float) -> str:
+    if distance_m < 2_000:
+        return "WALKING"
+    if distance_m < 6_000:
+        return "CYCLING"
+    if distance_m < 300_000:
+        return "IN_PASSENGER_VEHICLE"
+    return "FLYING"
+
+
+def _timestamp(t: datetime) -> str:
+    return t.strftime("%Y-%m-%dT%H:%M:%S.") + f"{t.microsecond // 1000:03d}Z"
+
+
+def _location(place: dict) -> Dict[str, int]:
+    return {"latitudeE7": place["latitudeE7"], "longitudeE7": place["longitudeE7"]}
+
+
+def make_day(
+    rng: np.random.Generator, day: datetime, city_places: List[dict], visits_per_day: int, previous: dict
+) -> Tuple[List[dict], dict]:
+    """Timeline objects of one day: visits spread over waking hours, joined by activity segments."""
+    timeline = []
+    t = day + timedelta(hours=7, minutes=int(rng.integers(0, 120)))
+    slot = timedelta(hours=15) / visits_per_day
+    # Favour a few places per city, like a real routine
+    weights = 1 / np.arange(1, len(city_places) + 1)
+    choices = rng.choice(len(city_places), size=visits_per_day, p=weights / weights.sum())
+
+    for choice in choices:
+        place = city_places[choice]
+        distance_m = haversine_m(
+            previous["latitudeE7"] / 1e7,
+            previous["longitudeE7"] / 1e7,
+            place["latitudeE7"] / 1e7,
+            place["longitudeE7"] / 1e7,
+        )
+        kind = activity_type(distance_m)
+        speed_m_s = {"WALKING": 1.4, "CYCLING": 4.5, "IN_PASSENGER_VEHICLE": 12.0, "FLYING": 220.0}[kind]
+        travel = timedelta(seconds=max(distance_m / speed_m_s, 60))
+        timeline.append(
+            {
+                "activitySegment": {
+                    "startLocation": _location(previous),
+                    "endLocation": _location(place),
+                    "duration": {"startTimestamp": _timestamp(t), "endTimestamp": _timestamp(t + travel)},
+                    "distance": int(distance_m),
+                    "activityType": kind,
+                    "confidence": "HIGH",
+                    "activities": [{"activityType": kind, "probability": 90.0}],
+                }
+            }
+        )
+        t += travel
+        stay = max(slot - travel, timedelta(minutes=10)) * rng.uniform(0.5, 1.0)
+        timeline.append(
+            {
+                "placeVisit": {
+                    "location": {**place, "locationConfidence": float(rng.uniform(50, 100))},
+                    "duration": {"startTimestamp": _timestamp(t), "endTimestamp": _timestamp(t + stay)},
+                    "placeConfidence": "HIGH_CONFIDENCE",
+                    "visitConfidence": float(rng.uniform(50, 100)),
+                    "placeVisitType": "SINGLE_PLACE",
+                    "placeVisitImportance": "MAIN",
+                }
+            }
+        )
+        t += stay
+        previous = place
+    return timeline, previous
+
+
+def write_semantic_history(
+    semantic_dir: Path,
+    start_year: int = 2020,
+    years: int = 1,
+    visits_per_day: int = 4,
+    trip_every_days: int = 60,
+    seed: int = 0,
+) -> int:
+    """
+    Write a synthetic semantic location history, one JSON file per month.
+
+    Parameters:
+        semantic_dir (Path): Directory receiving one subdirectory per year.
+        start_year (int): First year of the history.
+        years (int): Number of years to generate.
+        visits_per_day (int): Place visits per day, each preceded by an activity segment.
+        trip_every_days (int): Average number of days between week-long trips to another city.
+        seed (int): Random seed, the same arguments always write the same files.
+
+    Returns:
+        int: Number of timeline objects written.
+    """
+    rng = np.random.default_rng(seed)
+    places = make_places(rng)
+    first_day = date(start_year, 1, 1)
+    cities = trip_schedule(rng, (date(start_year + years, 1, 1) - first_day).days, trip_every_days)
+    previous = places[0][0]
+    n_objects = 0
+
+    for year in range(start_year, start_year + years):
+        year_dir = semantic_dir / str(year)
+        year_dir.mkdir(parents=True, exist_ok=True)
+        for month in range(1, 13):
+            timeline = []
+            for day in range(1, calendar.monthrange(year, month)[1] + 1):
+                city = cities[(date(year, month, day) - first_day).days]
+                day_start = datetime(year, month, day, tzinfo=timezone.utc)
+                objects, previous = make_day(rng, day_start, places[city], visits_per_day, previous)
+                timeline.extend(objects)
+
+            # One month at a time, like Takeout, so memory stays bounded however many years are written
+            month_name = calendar.month_name[month].upper()
+            with (year_dir / f"{year}_{month_name}.json").open("w") as f:
+                json.dump({"timelineObjects": timeline}, f)
+            n_objects += len(timeline)
+    return n_objects
+
+
+def format_locations(
+    rng: np.random.Generator, timestamps: np.ndarray, lat: np.ndarray, lon: np.ndarray
+) -> List[str]:
+    """Render raw points as Records.json `locations` entries."""
+    n = len(timestamps)
+    times = [f"{t}Z" for t in np.datetime_as_string(timestamps, unit="ms")]
+    lat_e7 = np.round(lat * 1e7).astype(np.int64).tolist()
+    lon_e7 = np.round(lon * 1e7).astype(np.int64).tolist()
+    accuracy = rng.integers(3, 60, n).tolist()
+    sources = rng.choice(len(SOURCES), n, p=[0.5, 0.4, 0.1]).tolist()
+    # About one point in ten carries activity guesses
+    activities = np.where(rng.random(n) < 0.1, rng.integers(0, len(ACTIVITIES), n), -1).tolist()
+    activity_json = [json.dumps(activity) for activity in ACTIVITIES]
+
+    lines = []
+    for i in range(n):
+        line = (
+            f'{{"latitudeE7": {lat_e7[i]}, "longitudeE7": {lon_e7[i]}, "accuracy": {accuracy[i]}, '
+            f'"source": "{SOURCES[sources[i]]}", "deviceTag": 1234567890, "timestamp": "{times[i]}"'
+        )
+        if activities[i] >= 0:
+            line += f', "activity": [{{"activity": {activity_json[activities[i]]}, "timestamp": "{times[i]}"}}]'
+        lines.append(line + "}")
+    return lines
+
+
+def write_records(
+    records_path: Path,
+    points: int,
+    start_year: int = 2020,
+    years: int = 1,
+    trip_every_days: int = 60,
+    seed: int = 0,
+    chunk_size: int = RECORDS_CHUNK_SIZE,
+) -> int:
+    """
+    Write a synthetic Records.json of raw location points, evenly spread over the years and streamed chunk by chunk.
+
+    Parameters:
+        records_path (Path): File to write.
+        points (int): Number of location points.
+        start_year (int): First year of the history.
+        years (int): Number of years the points cover.
+        trip_every_days (int): Average number of days between week-long trips to another city.
+        seed (int): Random seed, the same arguments always write the same file.
+        chunk_size (int): Points generated and written at a time.
+
+    Returns:
+        int: Number of points written.
+    """
+    rng = np.random.default_rng(seed)
+    start = np.datetime64(f"{start_year}-01-01T00:00:00", "ms")
+    span_ms = (np.datetime64(f"{start_year + years}-01-01T00:00:00", "ms") - start).astype(np.int64)
+    cities = trip_schedule(rng, int(span_ms // 86_400_000), trip_every_days)
+    city_lat = np.array([city[4] for city in CITIES])
+    city_lon = np.array([city[5] for city in CITIES])
+    walk = np.zeros(2)
+
+    records_path.parent.mkdir(parents=True, exist_ok=True)
+    with records_path.open("w") as f:
+        f.write('{\n  "locations": [')
+        for offset in range(0, points, chunk_size):
+            n = min(chunk_size, points - offset)
+            # Evenly spaced timestamps with a little jitter, still strictly increasing
+            step_ms = span_ms / points
+            t_ms = (np.arange(offset, offset + n) + rng.uniform(0, 0.5, n)) * step_ms
+            timestamps = start + t_ms.astype(np.int64).astype("timedelta64[ms]")
+            day_cities = cities[np.minimum(t_ms // 86_400_000, len(cities) - 1).astype(np.int64)]
+
+            # A bounded random walk around the city centre, continued across chunks
+            steps = rng.normal(0, 1, (n, 2)).cumsum(axis=0) + walk
+            walk = steps[-1]
+            offsets = 0.05 * np.tanh(steps / 300)
+            lat = city_lat[day_cities] + offsets[:, 0]
+            lon = city_lon[day_cities] + offsets[:, 1] / np.cos(np.radians(city_lat[day_cities]))
+
+            lines = format_locations(rng, timestamps, lat, lon)
+            f.write(("\n    " if offset == 0 else ",\n    ") + ",\n    ".join(lines))
+        f.write("\n  ]\n}\n")
+    return points
+
+
+def generate(
+    root: Path, years: int = 1, points: int = 1_000_000, visits_per_day: int = 4, start_year: int = 2020, seed: int = 0
+) -> Tuple[Path, Path]:
+    """Write a Takeout-like `location_history` under `root`: `semantic/` monthly files and `Records.json`."""
+    semantic_dir = root / "semantic"
+    records_path = root / "Records.json"
+    write_semantic_history(semantic_dir, start_year=start_year, years=years, visits_per_day=visits_per_day, seed=seed)
+    write_records(records_path, points, start_year=start_year, years=years, seed=seed)
+    return semantic_dir, records_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("root", type=Path, help="Output directory, e.g. data/synthetic/location_history")
+    parser.add_argument("--years", type=int, default=1)
+    parser.add_argument("--points", type=int, default=1_000_000, help="Raw points in Records.json")
+    parser.add_argument("--visits-per-day", type=int, default=4)
+    parser.add_argument("--start-year", type=int, default=2020)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    generate(args.root, args.years, args.points, args.visits_per_day, args.start_year, args.seed)
+    size_mb = sum(path.stat().st_size for path in args.root.rglob("*.json")) / 1e6
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {args.years} years and {args.points:,} points ({size_mb:,.0f} MB) in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
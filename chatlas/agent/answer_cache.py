@@ -0,0 +1,151 @@
+"""Persistent cache of final answers to user questions.
+
+Answers are keyed on the normalized question, the version of the data they were computed from and the model that
+produced them, so a repeated question against unchanged data is answered without any LLM round-trip. Optionally,
+near-duplicate questions are matched by character n-gram similarity. Only standalone questions are cached: follow-ups
+depend on the conversation, and relative dates ("last week") on the day they are asked.
+"""
+
+import hashlib
+import logging
+import re
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Optional, Set
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_TTL_S = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 2_000
+NGRAM_SIZE = 3
+
+_WEEKDAYS = "(?:mon|tues|wednes|thurs|fri|satur|sun)day"
+_PERIODS = rf"(?:hours?|days?|nights?|weeks?|weekends?|months?|years?|summer|winter|spring|fall|autumn|{_WEEKDAYS})"
+# Dates relative to when the question is asked, in normalized questions
+RELATIVE_TIME = re.compile(
+    r"\b(?:today|tonight|yesterday|tomorrow|now|currently|recent|recently|lately|ago|so far"
+    rf"|this (?:morning|afternoon|evening|{_PERIODS})"
+    rf"|(?:last|past|previous|next|coming) (?:\d+ |few |couple of )?{_PERIODS})\b"
+)
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    question = re.sub(r"[^\w\s]", " ", question.lower())
+    return re.sub(r"\s+", " ", question).strip()
+
+
+def is_cacheable(question: str, previous_turns: int = 0) -> bool:
+    """Whether the answer to a question can be reused in another conversation.
+
+    That is only the case for the first question of a conversation, which can't refer back to earlier turns, and for
+    questions without dates relative to when they are asked.
+    """
+    return previous_turns == 0 and not RELATIVE_TIME.search(normalize_question(question))
+
+
+def ngrams(text: str, n: int = NGRAM_SIZE) -> Set[str]:
+    text = f" {text} "
+    return {text[i : i + n] for i in range(max(len(text) - n + 1, 1))}
+
+
+def similarity(a: str, b: str) -> float:
+    """Jaccard similarity of the character n-grams of two normalized questions.
+
+    Questions that mention different numbers (years, dates, counts) never match, however similar the rest is.
+    """
+    if re.findall(r"\d+", a) != re.findall(r"\d+", b):
+        return 0.0
+    grams_a, grams_b = ngrams(a), ngrams(b)
+    return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+
+class AnswerCache:
+    """SQLite-backed answer cache with TTL expiry and least-recently-used eviction."""
+
+    def __init__(
+        self,
+        path: Path,
+        ttl_s: Optional[float] = DEFAULT_TTL_S,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        similarity_threshold: Optional[float] = None,
+    ):
+        """
+        Parameters:
+            path (Path): SQLite file holding the cache.
+            ttl_s (Optional[float]): Seconds an answer stays valid, or None to never expire.
+            max_entries (int): Least recently used answers are evicted beyond this count.
+            similarity_threshold (Optional[float]): If set, a question without an exact match reuses the answer of the
+                most similar cached question scoring at least this n-gram similarity (0-1).
+        """
+        self.path = Path(path)
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key TEXT PRIMARY KEY, question TEXT, data_version TEXT, model TEXT, answer TEXT, "
+                "created_at REAL, accessed_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_scope ON answers (data_version, model)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per call, so the cache can be shared across Streamlit sessions and threads
+        return sqlite3.connect(self.path, timeout=5)
+
+    @staticmethod
+    def make_key(question: str, data_version: str, model: str) -> str:
+        return hashlib.sha256("\x1f".join([question, data_version, model]).encode()).hexdigest()
+
+    def get(self, question: str, data_version: str, model: str) -> Optional[str]:
+        """Return a cached answer for the question, or None on a miss."""
+        question = normalize_question(question)
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            if self.ttl_s is not None:
+                conn.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl_s,))
+
+            key = self.make_key(question, data_version, model)
+            row = conn.execute("SELECT key, answer FROM answers WHERE key = ?", (key,)).fetchone()
+            if row is None and self.similarity_threshold is not None:
+                row = self._most_similar(conn, question, data_version, model)
+            if row is None:
+                return None
+
+            conn.execute("UPDATE answers SET accessed_at = ? WHERE key = ?", (now, row[0]))
+            return row[1]
+
+    def _most_similar(self, conn: sqlite3.Connection, question: str, data_version: str, model: str):
+        best, best_score = None, self.similarity_threshold
+        rows = conn.execute(
+            "SELECT key, answer, question FROM answers WHERE data_version = ? AND model = ?", (data_version, model)
+        )
+        for key, answer, cached_question in rows:
+            score = similarity(question, cached_question)
+            if score >= best_score:
+                best, best_score = (key, answer), score
+        if best is not None:
+            LOG.info(f"Near-duplicate answer cache hit (similarity {best_score:.2f}) for: {question}")
+        return best
+
+    def put(self, question: str, data_version: str, model: str, answer: str) -> None:
+        """Store an answer, evicting the least recently used answers beyond `max_entries`."""
+        question = normalize_question(question)
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.make_key(question, data_version, model), question, data_version, model, answer, now, now),
+            )
+            conn.execute(
+                "DELETE FROM answers WHERE key NOT IN (SELECT key FROM answers ORDER BY accessed_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM answers")
@@ -0,0 +1,121 @@
+"""Memoization of SQL tool results, shared across agents and conversations."""
+
+import re
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Quoted literals/identifiers, kept verbatim when normalizing SQL
+_SQL_TOKEN = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])""")
+
+
+def normalize_sql(query: str) -> str:
+    """Normalize a SQL statement for cache lookups: collapse whitespace and lowercase outside of quoted text."""
+    parts = _SQL_TOKEN.split(query.strip().rstrip(";").strip())
+    # split() with a capturing group alternates unquoted and quoted parts
+    return "".join(part if i % 2 else re.sub(r"\s+", " ", part).lower() for i, part in enumerate(parts))
+
+
+def database_version(db_path: Optional[str]) -> Tuple:
+    """Identify the current content of a SQLite database file, including its write-ahead log.
+
+    A missing and an empty WAL are equivalent: readers create and delete an empty one as they connect and disconnect.
+    """
+    if not db_path:
+        return ()
+    version = []
+    for path in (Path(db_path), Path(f"{db_path}-wal")):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            version.append(None)
+            continue
+        version.append((stat.st_mtime_ns, stat.st_size) if stat.st_size else None)
+    return tuple(version)
+
+
+class QueryCache:
+    """Thread-safe LRU cache bounded both by entry count and by the total size of the cached results.
+
+    Keys are namespaced by database path and version. When a database's version changes, every entry cached for its
+    previous version is dropped.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple, Tuple[object, int]]" = OrderedDict()
+        self._versions: Dict[str, Tuple] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get_or_compute(
+        self,
+        db_path: str,
+        key: Hashable,
+        compute: Callable[[], object],
+        cacheable: Optional[Callable[[object], bool]] = None,
+    ) -> object:
+        """
+        Return the cached result for `key` against the current version of the database, computing it on a miss.
+
+        Computed results are only stored if `cacheable` accepts them, e.g. to avoid caching transient errors.
+        """
+        version = database_version(db_path)
+        full_key = (db_path, version, key)
+        with self._lock:
+            if self._versions.get(db_path) != version:
+                self._invalidate(db_path)
+                self._versions[db_path] = version
+            if full_key in self._entries:
+                self._entries.move_to_end(full_key)
+                self.hits += 1
+                return self._entries[full_key][0]
+            self.misses += 1
+
+        # Compute outside the lock so slow queries don't serialize other conversations
+        result = compute()
+        if cacheable is None or cacheable(result):
+            self.put(full_key, result)
+        return result
+
+    def put(self, full_key: Tuple, result: object) -> None:
+        size = sys.getsizeof(result)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if full_key in self._entries:
+                self._bytes -= self._entries.pop(full_key)[1]
+            self._entries[full_key] = (result, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._bytes = 0
+
+    def _invalidate(self, db_path: str) -> None:
+        for full_key in [k for k in self._entries if k[0] == db_path]:
+            self._bytes -= self._entries.pop(full_key)[1]
+
+
+# Shared by every agent in the process, so identical queries are reused across conversations
+SHARED_QUERY_CACHE = QueryCache()
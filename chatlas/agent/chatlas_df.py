@@ -1,17 +1,36 @@
 """Chatlas Agent for workin with the Pandas DF."""
 
+from functools import partial
+from typing import Any, Optional
+
 import pandas as pd
 from langchain.agents.agent import AgentExecutor
 from langchain.agents.mrkl.base import ZeroShotAgent
 from langchain.chains.llm import LLMChain
 from langchain.chat_models.base import BaseChatModel
-from langchain.memory import ConversationBufferMemory
-from langchain.tools.python.tool import PythonAstREPLTool
+from langchain_experimental.tools.python.tool import PythonAstREPLTool
 
+from chatlas.agent.memory import DEFAULT_MAX_TOOL_OUTPUT_CHARS, create_memory, truncate_steps
+from chatlas.agent.tool_output import DEFAULT_MAX_ROWS, guard_output
 from chatlas.prompts.prompts_df import PREFIX, SUFFIX
 
 
-def create_chatlas(llm: BaseChatModel, df: pd.DataFrame) -> AgentExecutor:
+class GuardedPythonAstREPLTool(PythonAstREPLTool):
+    """Python REPL tool returning DataFrames as compact TSV and capping the size of any other output."""
+
+    max_rows: int = DEFAULT_MAX_ROWS
+    max_chars: int = DEFAULT_MAX_TOOL_OUTPUT_CHARS
+
+    def _run(self, query: str, run_manager: Any = None) -> str:
+        return guard_output(super()._run(query, run_manager), max_rows=self.max_rows, max_chars=self.max_chars)
+
+
+def create_chatlas(
+    llm: BaseChatModel,
+    df: pd.DataFrame,
+    max_history_tokens: Optional[int] = None,
+    max_tool_output_chars: int = DEFAULT_MAX_TOOL_OUTPUT_CHARS,
+) -> AgentExecutor:
     prefix = PREFIX
     suffix = SUFFIX
     number_of_head_rows = 5
@@ -23,7 +42,7 @@ def create_chatlas(llm: BaseChatModel, df: pd.DataFrame) -> AgentExecutor:
     input_variables += ["df_head"]  # for adding dataframe sample to the prompt
 
     # Create tools
-    tools = [PythonAstREPLTool(locals={"df": df})]
+    tools = [GuardedPythonAstREPLTool(locals={"df": df}, max_chars=max_tool_output_chars)]
     tool_names = [tool.name for tool in tools]
 
     # Create prompts
@@ -31,8 +50,8 @@ def create_chatlas(llm: BaseChatModel, df: pd.DataFrame) -> AgentExecutor:
     prompt = prompt.partial()
     prompt = prompt.partial(df_head=str(df.head(number_of_head_rows).to_markdown()))  # add df sample to the prompt
 
-    # Setup memory for contextual conversation
-    memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+    # Setup memory for contextual conversation, summarizing older turns beyond the token budget
+    memory = create_memory(llm, max_history_tokens=max_history_tokens)
 
     # Boot up zero-shot agent with LLMChain
     llm_chain = LLMChain(
@@ -57,6 +76,7 @@ def create_chatlas(llm: BaseChatModel, df: pd.DataFrame) -> AgentExecutor:
         max_execution_time=None,
         early_stopping_method="force",
         handle_parsing_errors=True,
+        trim_intermediate_steps=partial(truncate_steps, max_chars=max_tool_output_chars),
     )
 
     return agent_exec
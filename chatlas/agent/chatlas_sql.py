@@ -1,5 +1,9 @@
 """Chatlas Agent for workin with SQL."""
 
+from functools import partial
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional
+
 from langchain.agents.agent import AgentExecutor
 from langchain.agents.format_scratchpad import format_to_openai_functions
 from langchain.agents.mrkl.base import ZeroShotAgent
@@ -7,15 +11,18 @@ from langchain.agents.mrkl.prompt import FORMAT_INSTRUCTIONS
 from langchain.agents.output_parsers import OpenAIFunctionsAgentOutputParser
 from langchain.chains.llm import LLMChain
 from langchain.chat_models.base import BaseChatModel
-from langchain.memory import ConversationBufferMemory
 from langchain.prompts.chat import ChatPromptTemplate, HumanMessagePromptTemplate, MessagesPlaceholder
 from langchain.schema.messages import AIMessage, SystemMessage
 from langchain_core.utils.function_calling import convert_to_openai_function
-from langchain_community.utilities import SQLDatabase
 from langchain_community.agent_toolkits import SQLDatabaseToolkit
 
 
-from chatlas.prompts.prompts_sql import FUNCS_SUFFIX, PREFIX, SUFFIX
+from chatlas.agent.cache import SHARED_QUERY_CACHE
+from chatlas.agent.database import connect_database, sqlite_path
+from chatlas.agent.memory import DEFAULT_MAX_TOOL_OUTPUT_CHARS, create_memory, truncate_steps
+from chatlas.agent.schema_context import load_schema_context
+from chatlas.agent.tools import build_sql_tools
+from chatlas.prompts.prompts_sql import FUNCS_SUFFIX, PREFIX, SCHEMA_CONTEXT, SCHEMA_SUFFIX, SUFFIX
 
 TOP_K = 5
 INPUT_VARIABLES = None
@@ -26,25 +33,50 @@ MAX_EXECUTION_TIME = None
 EARLY_STOPPING_METHOD = "force"
 
 
-def create_chatlas(llm: BaseChatModel, db: str, functions: bool = False) -> AgentExecutor:
-    # Set db connection
-    db_engine = SQLDatabase.from_uri(db)
+def create_chatlas(
+    llm: BaseChatModel,
+    db: str,
+    functions: bool = False,
+    cache_queries: bool = False,
+    precompute_schema: bool = False,
+    shared_pool: bool = False,
+    max_history_tokens: Optional[int] = None,
+    max_tool_output_chars: int = DEFAULT_MAX_TOOL_OUTPUT_CHARS,
+    point_store_path: Optional[Path] = None,
+) -> AgentExecutor:
+    # Set db connection, optionally reusing the process-wide read-only connection pool
+    db_engine = connect_database(db, shared=shared_pool)
 
-    # Gather tools
+    # Gather tools, optionally memoizing query and schema results across conversations
     toolkit = SQLDatabaseToolkit(db=db_engine, llm=llm)
-    tools = toolkit.get_tools()
+    tools = build_sql_tools(
+        toolkit,
+        cache=SHARED_QUERY_CACHE if cache_queries else None,
+        max_chars=max_tool_output_chars,
+        point_store_path=point_store_path,
+    )
 
     # Set prompts
     prefix = PREFIX.format(dialect=toolkit.dialect, top_k=TOP_K)
+    suffix = SUFFIX
+
+    # Put the cached schema context in the system prompt, saving the agent's schema lookups
+    if precompute_schema:
+        schema_context = load_schema_context(Path(sqlite_path(db_engine)))
+        if not functions:
+            # The zero-shot prompt is a template, literal braces in sample values must be escaped
+            schema_context = schema_context.replace("{", "{{").replace("}", "}}")
+        prefix += SCHEMA_CONTEXT.format(schema_context=schema_context)
+        suffix = SCHEMA_SUFFIX
 
-    # Setup memory for contextual conversation
-    memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+    # Setup memory for contextual conversation, summarizing older turns beyond the token budget
+    memory = create_memory(llm, max_history_tokens=max_history_tokens)
 
     if not functions:
         prompt = ZeroShotAgent.create_prompt(
             tools,
             prefix=prefix,
-            suffix=SUFFIX,
+            suffix=suffix,
             format_instructions=FORMAT_INSTRUCTIONS,
             input_variables=INPUT_VARIABLES,
         )
@@ -80,4 +112,22 @@ def create_chatlas(llm: BaseChatModel, db: str, functions: bool = False) -> Agen
             | OpenAIFunctionsAgentOutputParser()
         )
 
-    return AgentExecutor(agent=agent, tools=tools, memory=memory, verbose=True)
+    return AgentExecutor(
+        agent=agent,
+        tools=tools,
+        memory=memory,
+        verbose=True,
+        trim_intermediate_steps=partial(truncate_steps, max_chars=max_tool_output_chars),
+    )
+
+
+async def ainvoke(agent: AgentExecutor, question: str) -> str:
+    """Answer a question without blocking the event loop, so one process can serve many conversations."""
+    response = await agent.ainvoke({"input": question})
+    return response["output"]
+
+
+async def astream(agent: AgentExecutor, question: str) -> AsyncIterator[Dict[str, Any]]:
+    """Stream the agent's intermediate actions, tool observations and final output as they happen."""
+    async for chunk in agent.astream({"input": question}):
+        yield chunk
@@ -0,0 +1,114 @@
+"""Database connections for the Chatlas agents."""
+
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from langchain_community.utilities import SQLDatabase
+from sqlalchemy import URL, Engine, create_engine, event, inspect
+from sqlalchemy.engine import make_url
+
+# Bookkeeping tables written during ingestion that the agent should never see
+INTERNAL_TABLES = {"ingest_manifest", "sqlite_sequence"}
+# Shadow tables backing SQLite R*Tree virtual tables
+RTREE_SHADOW_SUFFIXES = ("_rtree_node", "_rtree_parent", "_rtree_rowid")
+
+DEFAULT_POOL_SIZE = 8
+DEFAULT_POOL_TIMEOUT_S = 30
+
+_shared_engines: Dict[str, Engine] = {}
+# Keyed on the URI and the visible tables, so tables added by a later ingestion show up
+_shared_databases: Dict[Tuple[str, Tuple[str, ...]], SQLDatabase] = {}
+_shared_lock = threading.Lock()
+
+
+def is_internal_table(table_name: str) -> bool:
+    return table_name in INTERNAL_TABLES or table_name.endswith(RTREE_SHADOW_SUFFIXES)
+
+
+def sqlite_path(db: SQLDatabase) -> Optional[str]:
+    """File path of a SQLite database, also for read-only `file:` URIs."""
+    url = db._engine.url
+    if url.get_backend_name() != "sqlite" or not url.database:
+        return None
+    return url.database[len("file:") :] if url.database.startswith("file:") else url.database
+
+
+def visible_tables(engine: Engine) -> List[str]:
+    return [table for table in inspect(engine).get_table_names() if not is_internal_table(table)]
+
+
+def _wrap_engine(engine: Engine, tables: Optional[List[str]] = None) -> SQLDatabase:
+    tables = visible_tables(engine) if tables is None else tables
+    return SQLDatabase(engine, include_tables=tables or None)
+
+
+def connect_database(db_uri: str, shared: bool = False) -> SQLDatabase:
+    """
+    Connect to the chatlas database, hiding internal bookkeeping tables from the agent.
+
+    With `shared`, return the process-wide read-only pooled connection for this database instead of a new engine.
+    """
+    if shared:
+        return get_shared_database(db_uri)
+    return _wrap_engine(create_engine(db_uri))
+
+
+def create_read_only_engine(db_uri: str, pool_size: int = DEFAULT_POOL_SIZE) -> Engine:
+    """
+    Create a pooled, read-only engine safe to share between threads and conversations.
+
+    SQLite files are opened with `mode=ro` and `PRAGMA query_only`, so no agent-written statement can modify them.
+    """
+    url = make_url(db_uri)
+    if url.get_backend_name() != "sqlite":
+        return create_engine(db_uri, pool_size=pool_size, pool_timeout=DEFAULT_POOL_TIMEOUT_S, pool_pre_ping=True)
+
+    database = url.database
+
+    def connect() -> sqlite3.Connection:
+        # Connect directly rather than through a URL, which SQLAlchemy would unescape: the path must stay quoted for
+        # names with '?', '#' or '%' to survive the `file:` URI
+        return sqlite3.connect(f"file:{quote(database)}?mode=ro", uri=True, check_same_thread=False)
+
+    engine = create_engine(
+        URL.create("sqlite", database=database),
+        creator=connect,
+        pool_size=pool_size,
+        max_overflow=0,
+        pool_timeout=DEFAULT_POOL_TIMEOUT_S,
+    )
+
+    @event.listens_for(engine, "connect")
+    def set_query_only(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA query_only = ON")
+
+    return engine
+
+
+def get_shared_database(db_uri: str, pool_size: int = DEFAULT_POOL_SIZE) -> SQLDatabase:
+    """
+    Get the process-wide read-only pooled database for a URI, creating it on first use.
+
+    Every database of a URI shares one connection pool; a new database is only wrapped around it when the visible
+    tables changed since, e.g. after an ingestion added a table.
+    """
+    with _shared_lock:
+        if db_uri not in _shared_engines:
+            _shared_engines[db_uri] = create_read_only_engine(db_uri, pool_size=pool_size)
+        engine = _shared_engines[db_uri]
+        tables = visible_tables(engine)
+        key = (db_uri, tuple(tables))
+        if key not in _shared_databases:
+            _shared_databases[key] = _wrap_engine(engine, tables)
+        return _shared_databases[key]
+
+
+def dispose_shared_databases() -> None:
+    """Close every pooled connection, e.g. after ingestion replaced tables or the database file."""
+    with _shared_lock:
+        for engine in _shared_engines.values():
+            engine.dispose()
+        _shared_engines.clear()
+        _shared_databases.clear()
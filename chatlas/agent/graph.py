@@ -1,58 +1,100 @@
 import json
 import operator
+from pathlib import Path
 from typing import Annotated
+from typing import List
+from typing import Optional
 from typing import Sequence
 from typing import TypedDict
 
 from langchain.chat_models.base import BaseChatModel
 from langchain_community.agent_toolkits import SQLDatabaseToolkit
-from langchain_community.utilities import SQLDatabase
 from langchain_core.messages import BaseMessage
 from langchain_core.messages import FunctionMessage
-from langchain_core.utils.function_calling import convert_to_openai_function
+from langchain_core.messages import ToolMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langgraph.graph import END
 from langgraph.graph import StateGraph
 from langgraph.prebuilt import ToolExecutor
 from langgraph.prebuilt import ToolInvocation
 
+from chatlas.agent.cache import SHARED_QUERY_CACHE
+from chatlas.agent.database import connect_database
+from chatlas.agent.memory import DEFAULT_MAX_TOOL_OUTPUT_CHARS
+from chatlas.agent.memory import trim_messages
+from chatlas.agent.tool_output import guard_output
+from chatlas.agent.tools import build_sql_tools
+
+
+MAX_PARALLEL_TOOL_CALLS = 8
+
 
 class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], operator.add]
 
 
-def create_graph_agent(llm: BaseChatModel, db_uri: str):
+def get_tool_calls(message: BaseMessage) -> List[dict]:
+    """Tool calls requested by a model message, also accepting a legacy single `function_call`."""
+    if message.additional_kwargs.get("tool_calls"):
+        return message.additional_kwargs["tool_calls"]
+    if message.additional_kwargs.get("function_call"):
+        return [{"id": None, "type": "function", "function": message.additional_kwargs["function_call"]}]
+    return []
+
+
+def create_graph_agent(
+    llm: BaseChatModel,
+    db_uri: str,
+    cache_queries: bool = False,
+    shared_pool: bool = False,
+    max_history_tokens: Optional[int] = None,
+    max_tool_output_chars: int = DEFAULT_MAX_TOOL_OUTPUT_CHARS,
+    point_store_path: Optional[Path] = None,
+):
     # Set up the tools
-    db_engine = SQLDatabase.from_uri(db_uri)
+    db_engine = connect_database(db_uri, shared=shared_pool)
     toolkit = SQLDatabaseToolkit(db=db_engine, llm=llm)
-    tools = toolkit.get_tools()
+    tools = build_sql_tools(
+        toolkit,
+        cache=SHARED_QUERY_CACHE if cache_queries else None,
+        max_chars=max_tool_output_chars,
+        point_store_path=point_store_path,
+    )
     tool_executor = ToolExecutor(tools)
 
-    # Set up the model
-    functions = [convert_to_openai_function(t) for t in tools]
-    model = llm.bind_functions(functions)
+    # Set up the model, as tools rather than functions so it can request several calls per turn
+    model = llm.bind(tools=[convert_to_openai_tool(t) for t in tools])
 
     def call_model(state, model=model):
         messages = state["messages"]
+        if max_history_tokens is not None:
+            messages = trim_messages(messages, max_history_tokens, llm.get_num_tokens_from_messages)
         response = model.invoke(messages)
-        # bit of a hack to try and improve memory
-        return {"messages": messages + [response]}
+        # The state appends (operator.add), so only return the new message
+        return {"messages": [response]}
 
     def call_tool(state, tool_executor=tool_executor):
         messages = state["messages"]
-        last_message = messages[-1]
-        action = ToolInvocation(
-            tool=last_message.additional_kwargs["function_call"]["name"],
-            tool_input=json.loads(last_message.additional_kwargs["function_call"]["arguments"]),
-        )
-        response = tool_executor.invoke(action)
-        function_message = FunctionMessage(content=str(response), name=action.tool)
-        # bit of a hack to try and improve memory
-        return {"messages": messages + [function_message]}
+        tool_calls = get_tool_calls(messages[-1])
+        actions = [
+            ToolInvocation(tool=call["function"]["name"], tool_input=json.loads(call["function"]["arguments"]))
+            for call in tool_calls
+        ]
+        # Run every call of the turn concurrently, each tool gets its own pooled db connection
+        responses = tool_executor.batch(actions, {"max_concurrency": MAX_PARALLEL_TOOL_CALLS})
+        results = []
+        for call, action, response in zip(tool_calls, actions, responses):
+            content = guard_output(response, max_chars=max_tool_output_chars)
+            if call["id"] is None:
+                results.append(FunctionMessage(content=content, name=action.tool))
+            else:
+                results.append(ToolMessage(content=content, tool_call_id=call["id"]))
+        return {"messages": results}
 
     def should_continue(state):
         messages = state["messages"]
         last_message = messages[-1]
-        if "function_call" not in last_message.additional_kwargs:
+        if not get_tool_calls(last_message):
             return "end"
         else:
             return "continue"
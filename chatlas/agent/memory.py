@@ -0,0 +1,84 @@
+"""Bounded conversation memory for the Chatlas agents.
+
+Keeps the prompt from growing over a session: older turns are summarized once the history exceeds a token budget,
+and tool outputs are truncated before they are fed back to the model.
+"""
+
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from langchain.chat_models.base import BaseChatModel
+from langchain.memory import ConversationBufferMemory, ConversationSummaryBufferMemory
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain_core.agents import AgentAction
+from langchain_core.messages import BaseMessage, FunctionMessage, HumanMessage, SystemMessage, ToolMessage
+
+DEFAULT_MAX_HISTORY_TOKENS = 2_000
+DEFAULT_MAX_TOOL_OUTPUT_CHARS = 4_000
+# What is left of a tool output of the current turn when even that turn doesn't fit the history budget
+TRIMMED_TOOL_OUTPUT_CHARS = 200
+
+
+def create_memory(llm: BaseChatModel, max_history_tokens: Optional[int] = None) -> BaseChatMemory:
+    """
+    Create the agent's conversation memory.
+
+    Parameters:
+        llm (BaseChatModel): Model used to count tokens and summarize older turns.
+        max_history_tokens (Optional[int]): Token budget of the history. Turns beyond it are folded into a running
+            summary. None keeps the full, unbounded history.
+
+    Returns:
+        BaseChatMemory: Memory exposing the history as `chat_history` messages.
+    """
+    if max_history_tokens is None:
+        return ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+    return ConversationSummaryBufferMemory(
+        llm=llm,
+        memory_key="chat_history",
+        return_messages=True,
+        max_token_limit=max_history_tokens,
+    )
+
+
+def truncate_text(text: str, max_chars: int = DEFAULT_MAX_TOOL_OUTPUT_CHARS) -> str:
+    """Cut text to `max_chars`, noting how much was left out."""
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}\n... [truncated {len(text) - max_chars} of {len(text)} characters]"
+
+
+def truncate_steps(
+    steps: List[Tuple[AgentAction, str]], max_chars: int = DEFAULT_MAX_TOOL_OUTPUT_CHARS
+) -> List[Tuple[AgentAction, str]]:
+    """Truncate the tool observations of an agent's intermediate steps."""
+    return [(action, truncate_text(str(observation), max_chars)) for action, observation in steps]
+
+
+def trim_messages(
+    messages: Sequence[BaseMessage], max_tokens: int, count_tokens: Callable[[List[BaseMessage]], int]
+) -> List[BaseMessage]:
+    """
+    Drop the oldest messages until the rest fit in `max_tokens`.
+
+    A leading system message is always kept, as is the current turn: the latest human message and everything after it.
+    Older history is dropped first, never leaving tool results without the model message that requested them. If the
+    current turn alone is still over budget, its tool results are cut short, oldest first, each keeping its first
+    characters and a note of how much was left out; the model messages and their tool calls are kept as they are.
+    """
+    messages = list(messages)
+    head = messages[:1] if messages and isinstance(messages[0], SystemMessage) else []
+    body = messages[len(head) :]
+    current = next((i for i in range(len(body) - 1, -1, -1) if isinstance(body[i], HumanMessage)), len(body) - 1)
+    history, turn = body[:current], body[current:]
+
+    while history and count_tokens(head + history + turn) > max_tokens:
+        history = history[1:]
+        while history and isinstance(history[0], (FunctionMessage, ToolMessage)):
+            history = history[1:]
+
+    for i, message in enumerate(turn):
+        if count_tokens(head + history + turn) <= max_tokens:
+            break
+        if isinstance(message, (FunctionMessage, ToolMessage)):
+            turn[i] = message.copy(update={"content": truncate_text(str(message.content), TRIMMED_TOOL_OUTPUT_CHARS)})
+    return head + history + turn
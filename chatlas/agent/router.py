@@ -0,0 +1,257 @@
+"""Local intent router answering common questions without the LLM.
+
+Questions matching a known template ("how many countries did I visit in 2021", "where was I on 2023-01-05", "most
+visited places", "how far did I walk in 2022") are answered with a parameterized query against the database, in
+milliseconds. Anything else falls through to the agent.
+"""
+
+import logging
+import re
+import sqlite3
+from contextlib import closing
+from datetime import date, timedelta
+from pathlib import Path
+from re import Match, Pattern
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+from langchain_core.messages import AIMessage
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_TOP_PLACES = 5
+# Placeholder `semantic.split_addresses` writes for absent address components
+MISSING = "missing"
+MAX_PLACES_ON_DATE = 20
+
+# Verb of a distance question -> activity types it covers
+ACTIVITY_VERBS = {
+    "walk": ["WALKING", "ON_FOOT"],
+    "run": ["RUNNING"],
+    "ran": ["RUNNING"],
+    "cycle": ["CYCLING"],
+    "bike": ["CYCLING"],
+    "biked": ["CYCLING"],
+    "drive": ["IN_PASSENGER_VEHICLE"],
+    "drove": ["IN_PASSENGER_VEHICLE"],
+    "driven": ["IN_PASSENGER_VEHICLE"],
+    "fly": ["FLYING"],
+    "flew": ["FLYING"],
+    "flown": ["FLYING"],
+}
+
+Handler = Callable[[sqlite3.Connection, Match], Optional[str]]
+
+
+def normalize(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"\s+", " ", question.lower()).strip().rstrip("?!. ")
+
+
+def _join(items: List[str]) -> str:
+    return items[0] if len(items) == 1 else ", ".join(items[:-1]) + " and " + items[-1]
+
+
+def countries_in_year(conn: sqlite3.Connection, match: Match) -> str:
+    year = match["year"]
+    rows = conn.execute(
+        "SELECT DISTINCT country FROM place_rollups "
+        "WHERE period = 'year' AND period_start = ? AND country IS NOT NULL AND country != ? ORDER BY country",
+        (year, MISSING),
+    ).fetchall()
+    if not rows:
+        return f"I couldn't find any visits in {year}."
+    countries = [country for (country,) in rows]
+    noun = "country" if len(countries) == 1 else "countries"
+    return f"You visited {len(countries)} {noun} in {year}: {_join(countries)}."
+
+
+def places_on_date(conn: sqlite3.Connection, match: Match) -> Optional[str]:
+    day = _parse_date(match["date"])
+    if day is None:
+        return None
+    # Every visit overlapping the day, including overnight and multi-day stays that started before it
+    rows = conn.execute(
+        "SELECT name, city, country FROM places WHERE start_time < ? AND end_time >= ? ORDER BY start_time LIMIT ?",
+        ((day + timedelta(days=1)).isoformat(), day.isoformat(), MAX_PLACES_ON_DATE),
+    ).fetchall()
+    if not rows:
+        return f"I couldn't find any visits on {_format_date(day)}."
+    places = []
+    for name, city, country in rows:
+        where = ", ".join(part for part in (city, country) if part and part != MISSING)
+        place = f"{name} ({where})" if name and where else name or where
+        if place and place not in places:
+            places.append(place)
+    return f"On {_format_date(day)} you were at {_join(places)}."
+
+
+def most_visited_places(conn: sqlite3.Connection, match: Match) -> str:
+    limit = int(match["n"] or DEFAULT_TOP_PLACES)
+    year = match["year"]
+    # Yearly rollups add up to all-time totals without scanning the raw table
+    period_filter, params = ("period_start = ?", [year]) if year else ("1 = 1", [])
+    rows = conn.execute(
+        "SELECT MAX(name), MAX(NULLIF(city, ?)), SUM(visits) AS total FROM place_rollups "
+        f"WHERE period = 'year' AND {period_filter} AND name IS NOT NULL "
+        "GROUP BY place_id ORDER BY total DESC LIMIT ?",
+        (MISSING, *params, limit),
+    ).fetchall()
+    scope = f" in {year}" if year else ""
+    if not rows:
+        return f"I couldn't find any visited places{scope}."
+    lines = [
+        f"{i}. {name}{f' ({city})' if city else ''}: {visits} {'visit' if visits == 1 else 'visits'}"
+        for i, (name, city, visits) in enumerate(rows, 1)
+    ]
+    return f"Your most visited places{scope}:\n" + "\n".join(lines)
+
+
+def distance_in_year(conn: sqlite3.Connection, match: Match) -> str:
+    verb, year = match["verb"], match["year"]
+    activity_types = ACTIVITY_VERBS[verb]
+    placeholders = ", ".join("?" for _ in activity_types)
+    (distance_m,) = conn.execute(
+        "SELECT SUM(distance_m) FROM activity_rollups "
+        f"WHERE period = 'year' AND period_start = ? AND activity_type IN ({placeholders})",
+        (year, *activity_types),
+    ).fetchone()
+    activity = activity_types[0].lower().replace("_", " ")
+    if not distance_m:
+        return f"I couldn't find any {activity} in {year}."
+    return f"You covered {distance_m / 1000:,.1f} km ({distance_m / 1609.344:,.1f} miles) {activity} in {year}."
+
+
+def _parse_date(text: str) -> Optional[date]:
+    # Without an explicit year the parser would silently assume the current one
+    if not re.search(r"\b\d{4}\b", text):
+        return None
+    try:
+        return pd.to_datetime(text).date()
+    except (ValueError, OverflowError):
+        return None
+
+
+def _format_date(day: date) -> str:
+    return f"{day:%B} {day.day}, {day.year}"
+
+
+_VERBS = "|".join(sorted(ACTIVITY_VERBS, key=len, reverse=True))
+
+INTENTS: List[Tuple[str, Pattern, Handler]] = [
+    (
+        "countries_in_year",
+        re.compile(
+            r"^(?:how many|which|what) countries (?:did|have) i "
+            r"(?:visit(?:ed)?|go to|gone to|been to|travel(?:l?ed)? to) in (?P<year>\d{4})$"
+        ),
+        countries_in_year,
+    ),
+    (
+        "places_on_date",
+        re.compile(r"^where (?:was|were) i on (?P<date>.+)$"),
+        places_on_date,
+    ),
+    (
+        "most_visited_places",
+        re.compile(
+            r"^(?:what (?:are|were) )?(?:my )?(?:the )?(?:most|top)(?: (?P<n>\d{1,2}))? "
+            r"(?:most )?(?:visited|frequented|common) places(?: (?:did i visit|i visited))?(?: in (?P<year>\d{4}))?$"
+        ),
+        most_visited_places,
+    ),
+    (
+        "distance_in_year",
+        re.compile(
+            rf"^(?:how far|how many (?:km|kilometers|miles)) (?:did|have) i (?P<verb>{_VERBS})(?:e?d)? "
+            rf"in (?P<year>\d{{4}})$"
+        ),
+        distance_in_year,
+    ),
+    (
+        "distance_in_year",
+        re.compile(
+            rf"^(?:what (?:was|is) )?(?:my |the )?total distance (?P<verb>{_VERBS})(?:e?d)? in (?P<year>\d{{4}})$"
+        ),
+        distance_in_year,
+    ),
+]
+
+
+def match_intent(question: str) -> Optional[Tuple[str, Match, Handler]]:
+    """Find the first template matching the question."""
+    question = normalize(question)
+    for name, pattern, handler in INTENTS:
+        match = pattern.match(question)
+        if match:
+            return name, match, handler
+    return None
+
+
+def answer(db_path: Path, question: str) -> Optional[str]:
+    """
+    Answer a question directly from the database if it matches a known template.
+
+    Parameters:
+        db_path (Path): Path of the chatlas SQLite database.
+        question (str): The user's question.
+
+    Returns:
+        Optional[str]: The answer, or None if no template matches and the agent should handle the question.
+    """
+    intent = match_intent(question)
+    if intent is None:
+        return None
+    name, match, handler = intent
+    try:
+        with closing(sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)) as conn:
+            result = handler(conn, match)
+    except sqlite3.Error as e:
+        # e.g. rollups not built yet: let the agent deal with it
+        LOG.warning(f"Routing {name} failed, falling back to the agent: {e}")
+        return None
+    if result is not None:
+        LOG.info(f"Answered locally with intent {name}: {question}")
+    return result
+
+
+class RoutedAgent:
+    """Put the local router in front of an agent, only calling the agent when no template matches.
+
+    Works with both the `AgentExecutor` from `create_chatlas` (`{"input": ...}`) and the graph from
+    `create_graph_agent` (`{"messages": [...]}`). Everything else, e.g. `memory`, is delegated to the wrapped agent.
+    """
+
+    def __init__(self, agent: Any, db_path: Path):
+        self.agent = agent
+        self.db_path = Path(db_path)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.agent, name)
+
+    def _route(self, inputs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if "input" in inputs:
+            routed = answer(self.db_path, inputs["input"])
+            if routed is None:
+                return None
+            # Keep the agent's conversation memory in step, so follow-up questions have context
+            memory = getattr(self.agent, "memory", None)
+            if memory is not None:
+                memory.save_context({"input": inputs["input"]}, {"output": routed})
+            return {**inputs, "output": routed}
+
+        messages = inputs.get("messages") or []
+        if not messages:
+            return None
+        routed = answer(self.db_path, messages[-1].content)
+        if routed is None:
+            return None
+        return {**inputs, "messages": [*messages, AIMessage(content=routed)]}
+
+    def invoke(self, inputs: Dict[str, Any], config: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        return self._route(inputs) or self.agent.invoke(inputs, config, **kwargs)
+
+    async def ainvoke(
+        self, inputs: Dict[str, Any], config: Optional[Dict[str, Any]] = None, **kwargs
+    ) -> Dict[str, Any]:
+        return self._route(inputs) or await self.agent.ainvoke(inputs, config, **kwargs)
@@ -0,0 +1,107 @@
+"""Precomputed schema context for the SQL agent.
+
+Introspects the database once and renders a compact description of its tables: column types, value ranges, the most
+common values of categorical columns and a few sample rows. The rendered context is cached on disk next to the
+database, per database version, and goes straight into the system prompt so the agent can skip the schema lookups.
+"""
+
+import json
+import logging
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from chatlas.agent.cache import database_version
+
+LOG = logging.getLogger(__name__)
+
+# Tables described in full, and their categorical columns
+CATEGORICAL_COLUMNS: Dict[str, List[str]] = {
+    "places": ["city", "country"],
+    "activities": ["activity_type"],
+}
+# Tables only listed with their columns
+SUMMARY_TABLES = ["place_rollups", "activity_rollups", "places_rtree", "activities_rtree", "points"]
+# Ingestion bookkeeping columns the agent doesn't need
+HIDDEN_COLUMNS = {"source_file"}
+
+SAMPLE_ROWS = 3
+TOP_VALUES = 8
+MAX_VALUE_LENGTH = 40
+
+
+def _table_columns(conn: sqlite3.Connection, table_name: str) -> List[Tuple[str, str]]:
+    rows = conn.execute(f"PRAGMA table_info({table_name})")
+    return [(row[1], row[2]) for row in rows if row[1] not in HIDDEN_COLUMNS]
+
+
+def _shorten(value) -> str:
+    value = str(value)
+    return value if len(value) <= MAX_VALUE_LENGTH else value[: MAX_VALUE_LENGTH - 3] + "..."
+
+
+def describe_table(conn: sqlite3.Connection, table_name: str, categorical: List[str]) -> str:
+    """Render column types, ranges, top categorical values and sample rows of a table."""
+    columns = _table_columns(conn, table_name)
+    n_rows = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+    lines = [f"Table `{table_name}` ({n_rows} rows):"]
+
+    for name, sql_type in columns:
+        line = f"- {name} {sql_type}"
+        if sql_type in ("REAL", "INTEGER") or name.endswith("_time"):
+            low, high = conn.execute(f'SELECT MIN("{name}"), MAX("{name}") FROM {table_name}').fetchone()
+            if low is not None:
+                line += f", range {low} to {high}"
+        if name in categorical:
+            top = conn.execute(
+                f'SELECT "{name}", COUNT(*) AS n FROM {table_name} WHERE "{name}" IS NOT NULL '
+                f"GROUP BY 1 ORDER BY n DESC LIMIT {TOP_VALUES}"
+            ).fetchall()
+            line += ", top values: " + ", ".join(f"{_shorten(value)} ({n})" for value, n in top)
+        lines.append(line)
+
+    names = [name for name, _ in columns]
+    column_list = ", ".join(f'"{name}"' for name in names)
+    rows = conn.execute(f"SELECT {column_list} FROM {table_name} LIMIT {SAMPLE_ROWS}").fetchall()
+    if rows:
+        lines.append("Sample rows:")
+        lines.append("\t".join(names))
+        lines.extend("\t".join(_shorten(value) for value in row) for row in rows)
+    return "\n".join(lines)
+
+
+def build_schema_context(db_path: Path) -> str:
+    """Introspect the database and render its schema context."""
+    with closing(sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)) as conn:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        sections = [
+            describe_table(conn, table_name, categorical)
+            for table_name, categorical in CATEGORICAL_COLUMNS.items()
+            if table_name in tables
+        ]
+        for table_name in SUMMARY_TABLES:
+            if table_name in tables:
+                columns = ", ".join(f"{name} {sql_type}".strip() for name, sql_type in _table_columns(conn, table_name))
+                sections.append(f"Table `{table_name}`: {columns}")
+    return "\n\n".join(sections)
+
+
+def context_cache_path(db_path: Path) -> Path:
+    return Path(f"{db_path}.schema_context.json")
+
+
+def load_schema_context(db_path: Path, cache_path: Optional[Path] = None) -> str:
+    """Get the schema context of a database, rebuilding it only when the database changed since it was cached."""
+    cache_path = cache_path or context_cache_path(db_path)
+    # Round-trip through JSON so the version compares equal to the cached one (tuples become lists)
+    version = json.loads(json.dumps(database_version(str(db_path))))
+    if cache_path.exists():
+        cached = json.loads(cache_path.read_text())
+        if cached.get("version") == version:
+            return cached["context"]
+
+    LOG.info(f"Building schema context for {db_path}...")
+    context = build_schema_context(db_path)
+    cache_path.write_text(json.dumps({"version": version, "context": context}))
+    return context
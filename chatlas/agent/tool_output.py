@@ -0,0 +1,112 @@
+"""Size guard and compact encoding of tool outputs fed back to the LLM.
+
+Tabular results are encoded as TSV, capped by rows and characters, and always end with the total row count, so a
+careless `SELECT *` costs a bounded number of tokens and the model knows to narrow its query.
+"""
+
+from typing import Any, Iterable, List, Optional, Sequence
+
+import pandas as pd
+from langchain_community.utilities import SQLDatabase
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from chatlas.agent.memory import DEFAULT_MAX_TOOL_OUTPUT_CHARS, truncate_text
+
+DEFAULT_MAX_ROWS = 50
+MAX_CELL_CHARS = 100
+
+
+def encode_cell(value: Any) -> str:
+    """Render a value for a TSV cell: no tabs or newlines, long values shortened."""
+    if value is None:
+        return ""
+    value = str(value).replace("\t", " ").replace("\r", " ").replace("\n", " ")
+    return value if len(value) <= MAX_CELL_CHARS else value[: MAX_CELL_CHARS - 3] + "..."
+
+
+def encode_table(
+    columns: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    total_rows: Optional[int],
+    max_rows: int = DEFAULT_MAX_ROWS,
+    max_chars: int = DEFAULT_MAX_TOOL_OUTPUT_CHARS,
+) -> str:
+    """
+    Encode rows as TSV with a header line, stopping at `max_rows` rows or `max_chars` characters.
+
+    Parameters:
+        columns (Sequence[str]): Column names.
+        rows (Iterable[Sequence[Any]]): Rows to encode, only consumed up to the caps.
+        total_rows (Optional[int]): Number of rows in the full result, reported to the model. None when only known to
+            be more than `max_rows`.
+        max_rows (int): Maximum number of rows to encode.
+        max_chars (int): Maximum length of the encoded rows.
+
+    Returns:
+        str: The TSV text, followed by the row count and a note when rows were left out.
+    """
+    lines = ["\t".join(encode_cell(column) for column in columns)]
+    size = len(lines[0])
+    for row in rows:
+        if len(lines) > max_rows:
+            break
+        line = "\t".join(encode_cell(value) for value in row)
+        size += len(line) + 1
+        if size > max_chars and len(lines) > 1:
+            break
+        lines.append(line)
+
+    shown = len(lines) - 1
+    if total_rows is None or shown < total_rows:
+        total = f"more than {max_rows}" if total_rows is None else total_rows
+        lines.append(f"[showing {shown} of {total} rows; use filters, aggregates or LIMIT to narrow the result down]")
+    else:
+        lines.append(f"[{total_rows} rows]")
+    return "\n".join(lines)
+
+
+def encode_dataframe(
+    df: pd.DataFrame, max_rows: int = DEFAULT_MAX_ROWS, max_chars: int = DEFAULT_MAX_TOOL_OUTPUT_CHARS
+) -> str:
+    """Encode a DataFrame as capped TSV, including its index when it carries information."""
+    if not isinstance(df.index, pd.RangeIndex):
+        df = df.reset_index()
+    head = df.head(max_rows)
+    return encode_table(
+        [str(column) for column in df.columns], head.itertuples(index=False), len(df), max_rows, max_chars
+    )
+
+
+def guard_output(
+    output: Any, max_rows: int = DEFAULT_MAX_ROWS, max_chars: int = DEFAULT_MAX_TOOL_OUTPUT_CHARS
+) -> str:
+    """Turn any tool output into bounded text: DataFrames and Series as capped TSV, everything else truncated."""
+    if isinstance(output, pd.Series):
+        output = output.to_frame()
+    if isinstance(output, pd.DataFrame):
+        return encode_dataframe(output, max_rows, max_chars)
+    return truncate_text(str(output), max_chars)
+
+
+def run_query(
+    db: SQLDatabase, query: str, max_rows: int = DEFAULT_MAX_ROWS, max_chars: int = DEFAULT_MAX_TOOL_OUTPUT_CHARS
+) -> str:
+    """
+    Run a SQL query and encode its result as capped TSV.
+
+    At most one row beyond `max_rows` is fetched, to tell whether the result was cut: a large result is never read in
+    full, and reported as having more than `max_rows` rows. Errors are returned as text, like
+    `SQLDatabase.run_no_throw`, so the agent can fix its query.
+    """
+    try:
+        with db._engine.connect() as connection:
+            result = connection.execute(text(query))
+            if not result.returns_rows:
+                return ""
+            columns = list(result.keys())
+            rows: List[Sequence[Any]] = [tuple(row) for row in result.fetchmany(max_rows + 1)]
+    except SQLAlchemyError as e:
+        return f"Error: {e}"
+    total_rows = len(rows) if len(rows) <= max_rows else None
+    return encode_table(columns, rows[:max_rows], total_rows, max_rows, max_chars)
@@ -0,0 +1,138 @@
+"""SQL tools for the Chatlas agents."""
+
+from functools import partial
+from pathlib import Path
+from typing import Any, List, Optional, Type
+
+from langchain_community.agent_toolkits import SQLDatabaseToolkit
+from langchain_community.tools.sql_database.tool import (
+    InfoSQLDatabaseTool,
+    ListSQLDatabaseTool,
+    QuerySQLDataBaseTool,
+)
+from langchain_core.callbacks import CallbackManagerForToolRun
+from langchain_core.pydantic_v1 import BaseModel, Field
+from langchain_core.tools import BaseTool
+
+from chatlas.agent.cache import QueryCache, normalize_sql
+from chatlas.agent.database import sqlite_path
+from chatlas.agent.memory import DEFAULT_MAX_TOOL_OUTPUT_CHARS
+from chatlas.agent.tool_output import DEFAULT_MAX_ROWS, encode_table, run_query
+from chatlas.data_prep.point_store import PointStore
+
+
+def is_cacheable(result: Any) -> bool:
+    """Errors may be transient (e.g. a locked database), so only successful results are cached."""
+    return not (isinstance(result, str) and result.startswith("Error:"))
+
+
+class GuardedQuerySQLDataBaseTool(QuerySQLDataBaseTool):
+    """Query tool returning results as compact TSV, capped by rows and characters."""
+
+    max_rows: int = DEFAULT_MAX_ROWS
+    max_chars: int = DEFAULT_MAX_TOOL_OUTPUT_CHARS
+
+    def _run(self, query: str, run_manager: Optional[CallbackManagerForToolRun] = None) -> str:
+        return run_query(self.db, query, max_rows=self.max_rows, max_chars=self.max_chars)
+
+
+class CachedQuerySQLDataBaseTool(GuardedQuerySQLDataBaseTool):
+    """Query tool memoizing results on the normalized SQL and the database version."""
+
+    cache: QueryCache = Field(exclude=True)
+    db_path: Optional[str] = None
+
+    def _run(self, query: str, run_manager: Optional[CallbackManagerForToolRun] = None) -> Any:
+        key = (self.name, normalize_sql(query), self.max_rows, self.max_chars)
+        return self.cache.get_or_compute(self.db_path, key, partial(super()._run, query), is_cacheable)
+
+
+class CachedInfoSQLDatabaseTool(InfoSQLDatabaseTool):
+    """Schema tool memoizing results on the requested set of tables and the database version."""
+
+    cache: QueryCache = Field(exclude=True)
+    db_path: Optional[str] = None
+
+    def _run(self, table_names: str, run_manager: Optional[CallbackManagerForToolRun] = None) -> str:
+        key = (self.name, tuple(sorted(t.strip().lower() for t in table_names.split(","))))
+        return self.cache.get_or_compute(self.db_path, key, partial(super()._run, table_names), is_cacheable)
+
+
+class CachedListSQLDatabaseTool(ListSQLDatabaseTool):
+    """Table listing tool memoizing its result on the database version."""
+
+    cache: QueryCache = Field(exclude=True)
+    db_path: Optional[str] = None
+
+    def _run(self, tool_input: str = "", run_manager: Optional[CallbackManagerForToolRun] = None) -> str:
+        return self.cache.get_or_compute(self.db_path, (self.name,), partial(super()._run, tool_input), is_cacheable)
+
+
+class PointsInRangeInput(BaseModel):
+    time_range: str = Field(
+        description="Start and end time (UTC) separated by a comma, e.g. '2023-03-01 14:00, 2023-03-01 15:00'"
+    )
+
+
+class PointsInRangeTool(BaseTool):
+    """Tool reading full-resolution points of a time range from the point store, given as one 'start, end' string."""
+
+    name: str = "points_in_range"
+    description: str = (
+        "Input: a start and an end time (UTC), separated by a comma, e.g. '2023-03-01 14:00, 2023-03-01 15:00'. "
+        "Output: every raw GPS point recorded from start up to end, at full resolution, with timestamp (UTC), lat, "
+        "lon and accuracy in meters. Use this for where exactly the user was at a given time; the `points` table only "
+        "holds a simplified trajectory. Keep the range short, at most a few hours."
+    )
+    args_schema: Type[BaseModel] = PointsInRangeInput
+    store_path: Path
+    max_rows: int = DEFAULT_MAX_ROWS
+    max_chars: int = DEFAULT_MAX_TOOL_OUTPUT_CHARS
+
+    def _run(self, time_range: str, run_manager: Optional[CallbackManagerForToolRun] = None) -> str:
+        bounds = [bound.strip().strip("'\"") for bound in time_range.split(",")]
+        if len(bounds) != 2 or not all(bounds):
+            return f"Error: expected a start and an end time separated by a comma, got {time_range!r}"
+        start, end = bounds
+        try:
+            # Opening only maps the files, so every call sees the latest store written by ingestion
+            store = PointStore(self.store_path)
+            first, last = store.bounds(start, end)
+            df = store.to_frame(start, end, limit=self.max_rows)
+        except (OSError, ValueError) as e:
+            return f"Error: {e}"
+        return encode_table(list(df.columns), df.itertuples(index=False), last - first, self.max_rows, self.max_chars)
+
+
+CACHED_TOOLS = {
+    QuerySQLDataBaseTool: CachedQuerySQLDataBaseTool,
+    InfoSQLDatabaseTool: CachedInfoSQLDatabaseTool,
+    ListSQLDatabaseTool: CachedListSQLDatabaseTool,
+}
+
+
+def build_sql_tools(
+    toolkit: SQLDatabaseToolkit,
+    cache: Optional[QueryCache] = None,
+    max_rows: int = DEFAULT_MAX_ROWS,
+    max_chars: int = DEFAULT_MAX_TOOL_OUTPUT_CHARS,
+    point_store_path: Optional[Path] = None,
+) -> List[BaseTool]:
+    """
+    Get the toolkit's tools, with a size-guarded query tool and, given a cache, caching versions of the query, schema
+    and table listing tools. Given an existing point store, a tool reading its points by time range is added.
+    """
+    tools = []
+    db_path = sqlite_path(toolkit.db)
+    for tool in toolkit.get_tools():
+        if cache is not None and type(tool) in CACHED_TOOLS:
+            tool_class = CACHED_TOOLS[type(tool)]
+            tool = tool_class(db=tool.db, description=tool.description, cache=cache, db_path=db_path)
+        elif type(tool) is QuerySQLDataBaseTool:
+            tool = GuardedQuerySQLDataBaseTool(db=tool.db, description=tool.description)
+        if isinstance(tool, GuardedQuerySQLDataBaseTool):
+            tool.max_rows, tool.max_chars = max_rows, max_chars
+        tools.append(tool)
+    if point_store_path is not None and Path(point_store_path).exists():
+        tools.append(PointsInRangeTool(store_path=point_store_path, max_rows=max_rows, max_chars=max_chars))
+    return tools
@@ -2,8 +2,14 @@ import streamlit as st
 from langchain_openai import ChatOpenAI
 
 from chatlas import utils
+from chatlas.agent.answer_cache import AnswerCache, is_cacheable
+from chatlas.agent.cache import database_version
 from chatlas.agent.chatlas_sql import create_chatlas
-from chatlas.data_prep import records, semantic
+from chatlas.agent.database import dispose_shared_databases
+from chatlas.agent.memory import DEFAULT_MAX_HISTORY_TOKENS
+from chatlas.agent.router import RoutedAgent
+from chatlas.data_prep import records, semantic, staypoints
+from chatlas.streaming import StreamHandler
 
 st.set_page_config(page_title="Chatlas", page_icon="🌎")
 st.header("Chat over your location history")
@@ -12,24 +18,40 @@ st.write(
     "[![view source code ](https://img.shields.io/badge/view_source_code-gray?logo=github)](https://github.com/cipher982/chatlas)"  # noqa
 )
 
+ANSWER_CACHE_PATH = semantic.PROCESSED_PATH / "answer_cache.db"
+
+
+@st.cache_resource
+def get_answer_cache() -> AnswerCache:
+    return AnswerCache(ANSWER_CACHE_PATH, similarity_threshold=0.9)
+
 
 class StreamlitApp:
     def __init__(self):
         utils.configure_openai_api_key()
         # self.openai_model = "gpt-3.5-turbo"
         self.openai_model = "gpt-4"
+        self.agent_model = "gpt-3.5-turbo-1106"
 
     @st.spinner("Processing your data...")
     def process_data(self):
+        ingested = False
         # Check if processed semantic places data has been generated
         if not semantic.DEFAULT_PLACES_OUTPUT_PATH.exists():
+            ingested = True
             placeholder = st.empty()
-            placeholder.text("Generating processed data for semantic places...")
-            semantic.main()
+            if semantic.DEFAULT_SEMANTIC_PATH.exists():
+                placeholder.text("Generating processed data for semantic places...")
+                semantic.main()
+            else:
+                # Without semantic history, derive the visits from the raw records
+                placeholder.text("Detecting visited places from records...")
+                staypoints.main()
             placeholder.empty()
 
         # Check if processed semantic activities data has been generated
-        if not semantic.DEFAULT_ACTIVITIES_OUTPUT_PATH.exists():
+        if semantic.DEFAULT_SEMANTIC_PATH.exists() and not semantic.DEFAULT_ACTIVITIES_OUTPUT_PATH.exists():
+            ingested = True
             placeholder = st.empty()
             placeholder.text("Generating processed data for semantic activities...")
             semantic.main(load_sql=True)
@@ -37,10 +59,21 @@ class StreamlitApp:
 
         # Check if processed granular records data has been generated
         if not records.DEFAULT_OUTPUT_PATH.exists():
+            ingested = True
             placeholder = st.empty()
             placeholder.text("Generating processed data for records...")
-            records.main()
+            records.main(sql_db_path=semantic.SQL_DB_PATH)
             placeholder.empty()
+        elif not records.DEFAULT_POINT_STORE_PATH.exists():
+            # Records processed before the point store existed
+            placeholder = st.empty()
+            placeholder.text("Building the point store from records...")
+            records.build_point_store()
+            placeholder.empty()
+
+        # Pooled connections of other sessions may still hold the replaced tables
+        if ingested:
+            dispose_shared_databases()
 
     @st.spinner("Connecting to AI...")
     def setup_agent(self):
@@ -48,11 +81,19 @@ class StreamlitApp:
         self.process_data()
 
         db_path = f"sqlite:///{semantic.SQL_DB_PATH}"
-        model = "gpt-3.5-turbo-1106"
-        # model = "gpt-4"
-        llm = ChatOpenAI(client=None, model=model, temperature=0, streaming=True)
-        agent = create_chatlas(llm=llm, db=db_path, functions=True)
-        return agent
+        llm = ChatOpenAI(client=None, model=self.agent_model, temperature=0, streaming=True)
+        agent = create_chatlas(
+            llm=llm,
+            db=db_path,
+            functions=True,
+            cache_queries=True,
+            precompute_schema=True,
+            shared_pool=True,
+            max_history_tokens=DEFAULT_MAX_HISTORY_TOKENS,
+            point_store_path=records.DEFAULT_POINT_STORE_PATH,
+        )
+        # Answer common questions straight from the database, only asking the agent otherwise
+        return RoutedAgent(agent, semantic.SQL_DB_PATH)
 
     @utils.enable_chat_history
     def main(self):
@@ -65,8 +106,21 @@ class StreamlitApp:
             utils.display_msg(user_query, "user")
 
             with st.chat_message("assistant"):
-                response = st.session_state.agent.invoke({"input": user_query})
-                st.session_state.messages.append({"role": "assistant", "content": response["output"]})
+                answer_cache = get_answer_cache()
+                data_version = str(database_version(str(semantic.SQL_DB_PATH)))
+                # Follow-ups and relative dates depend on the conversation and the day, never share their answers
+                previous_turns = sum(message["role"] == "user" for message in st.session_state.messages) - 1
+                cacheable = is_cacheable(user_query, previous_turns)
+                answer = answer_cache.get(user_query, data_version, self.agent_model) if cacheable else None
+                if answer is None:
+                    handler = StreamHandler(st.empty())
+                    answer = st.session_state.agent.invoke({"input": user_query}, {"callbacks": [handler]})["output"]
+                    if cacheable:
+                        answer_cache.put(user_query, data_version, self.agent_model, answer)
+                else:
+                    # Keep the agent's conversation memory in step with what the user saw
+                    st.session_state.agent.memory.save_context({"input": user_query}, {"output": answer})
+                st.session_state.messages.append({"role": "assistant", "content": answer})
                 st.rerun()
 
 
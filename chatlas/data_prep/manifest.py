@@ -0,0 +1,90 @@
+"""Manifest of ingested semantic files, used to only re-parse months that changed."""
+
+import hashlib
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+LOG = logging.getLogger(__name__)
+
+MANIFEST_TABLE = "ingest_manifest"
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def file_sha256(file_path: Path) -> str:
+    """Hash a file's content in fixed-size blocks."""
+    digest = hashlib.sha256()
+    with file_path.open("rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def create_manifest(conn: sqlite3.Connection) -> None:
+    """Create the manifest table if it does not exist yet."""
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} ("
+        "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT, ingested_at TEXT)"
+    )
+
+
+def load_manifest(conn: sqlite3.Connection) -> Dict[str, Dict]:
+    """Read the manifest table, keyed on the file path relative to the semantic directory."""
+    create_manifest(conn)
+    rows = conn.execute(f"SELECT path, size, mtime_ns, sha256 FROM {MANIFEST_TABLE}").fetchall()
+    return {
+        path: {"path": path, "size": size, "mtime_ns": mtime_ns, "sha256": sha256}
+        for path, size, mtime_ns, sha256 in rows
+    }
+
+
+def diff_manifest(
+    files: List[Path], root: Path, manifest: Dict[str, Dict]
+) -> Tuple[List[Path], List[str], List[Dict]]:
+    """
+    Compare files on disk against the manifest.
+
+    Files whose size and mtime match their manifest entry are skipped without hashing. Files that were touched but
+    whose content hash is unchanged are not re-parsed, only their manifest entry is refreshed.
+
+    Returns:
+        changed (List[Path]): New or modified files that need to be parsed.
+        removed (List[str]): Manifest paths that no longer exist on disk.
+        entries (List[Dict]): Manifest entries to upsert.
+    """
+    changed, entries = [], []
+    seen = set()
+    for file_path in files:
+        key = file_path.relative_to(root).as_posix()
+        seen.add(key)
+        stat = file_path.stat()
+        entry = {"path": key, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        previous = manifest.get(key)
+        if previous and previous["size"] == entry["size"] and previous["mtime_ns"] == entry["mtime_ns"]:
+            continue
+
+        entry["sha256"] = file_sha256(file_path)
+        entries.append(entry)
+        if not previous or previous["sha256"] != entry["sha256"]:
+            changed.append(file_path)
+
+    removed = sorted(key for key in manifest if key not in seen)
+    LOG.info(f"Manifest diff: {len(changed)} new or changed, {len(removed)} removed, {len(files)} total files.")
+    return changed, removed, entries
+
+
+def update_manifest(conn: sqlite3.Connection, entries: List[Dict], removed: List[str]) -> None:
+    """Upsert refreshed entries and drop entries for removed files."""
+    conn.executemany(
+        f"INSERT OR REPLACE INTO {MANIFEST_TABLE} (path, size, mtime_ns, sha256, ingested_at) "
+        "VALUES (:path, :size, :mtime_ns, :sha256, datetime('now'))",
+        entries,
+    )
+    conn.executemany(f"DELETE FROM {MANIFEST_TABLE} WHERE path = ?", [(path,) for path in removed])
+
+
+def clear_manifest(conn: sqlite3.Connection) -> None:
+    """Forget every ingested file, forcing a full rebuild on the next incremental run."""
+    create_manifest(conn)
+    conn.execute(f"DELETE FROM {MANIFEST_TABLE}")
@@ -0,0 +1,221 @@
+"""Memory-mapped columnar store of Records points.
+
+Each column (timestamp, lat, lon, accuracy) is a `.npy` file sorted on timestamp, next to a small JSON manifest.
+Opening the store maps the files without reading them, and a time-range slice is two binary searches on the timestamps
+plus a view into each column: only the pages of the requested window are ever read from disk.
+"""
+
+import json
+import logging
+import shutil
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+LOG = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+# Column -> dtype on disk. Timestamps are nanoseconds since the epoch, UTC
+STORE_COLUMNS = {
+    "timestamp": np.dtype("int64"),
+    "lat": np.dtype("float64"),
+    "lon": np.dtype("float64"),
+    "accuracy": np.dtype("float32"),
+}
+WRITE_CHUNK_SIZE = 1_000_000
+
+TimeBound = Optional[Union[str, pd.Timestamp]]
+
+
+def _timestamp_ns(value: Union[str, pd.Timestamp]) -> int:
+    """Nanoseconds since the epoch of a time bound, reading naive times as UTC like the stored timestamps."""
+    value = pd.Timestamp(value)
+    if value.tzinfo is None:
+        value = value.tz_localize("UTC")
+    return value.value
+
+
+def store_arrays(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """The store columns of raw or preprocessed Records, as unsorted arrays of the on-disk dtypes."""
+    if "lat" in df.columns:
+        lat, lon = df["lat"].to_numpy(dtype="float64"), df["lon"].to_numpy(dtype="float64")
+    else:
+        lat = df["latitudeE7"].to_numpy(dtype="float64") / 1e7
+        lon = df["longitudeE7"].to_numpy(dtype="float64") / 1e7
+    accuracy = df["accuracy"] if "accuracy" in df.columns else pd.Series(np.nan, index=df.index)
+    return {
+        "timestamp": pd.DatetimeIndex(pd.to_datetime(df["timestamp"], format="ISO8601", utc=True)).asi8,
+        "lat": lat,
+        "lon": lon,
+        "accuracy": accuracy.to_numpy(dtype="float32", na_value=np.nan),
+    }
+
+
+class PointStoreWriter:
+    """
+    Write a point store a chunk at a time.
+
+    Each column is appended to a raw file in a temporary directory, and only becomes a `.npy` file, with the manifest,
+    when the writer is closed; the store is then moved into place, so readers never see a partial store. Points appended
+    in time order are written in constant memory. Otherwise the columns are sorted when closing, which needs the
+    timestamps and the sort order in memory.
+    """
+
+    def __init__(self, store_path: Path, chunk_size: int = WRITE_CHUNK_SIZE):
+        """
+        Parameters:
+            store_path (Path): Directory of the store, replaced when the writer is closed.
+            chunk_size (int): Rows gathered into sorted order at a time, for points appended out of order.
+        """
+        self.store_path = Path(store_path)
+        self.chunk_size = chunk_size
+        self.tmp_path = self.store_path.with_name(self.store_path.name + ".tmp")
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+        self.tmp_path.mkdir(parents=True)
+        self.files = {name: (self.tmp_path / f"{name}.bin").open("wb") for name in STORE_COLUMNS}
+        self.n_rows = 0
+        self.is_sorted = True
+        self.last_timestamp: Optional[int] = None
+
+    def __enter__(self) -> "PointStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def append(self, df: pd.DataFrame) -> None:
+        """Append raw or preprocessed Records."""
+        self.append_arrays(store_arrays(df))
+
+    def append_arrays(self, arrays: Dict[str, np.ndarray]) -> None:
+        """Append store columns, as returned by `store_arrays`."""
+        timestamps = arrays["timestamp"]
+        if not len(timestamps):
+            return
+        if np.any(timestamps[1:] < timestamps[:-1]) or (
+            self.last_timestamp is not None and timestamps[0] < self.last_timestamp
+        ):
+            self.is_sorted = False
+        latest = int(timestamps.max())
+        self.last_timestamp = latest if self.last_timestamp is None else max(self.last_timestamp, latest)
+        for name, dtype in STORE_COLUMNS.items():
+            self.files[name].write(np.ascontiguousarray(arrays[name], dtype=dtype).tobytes())
+        self.n_rows += len(timestamps)
+
+    def close(self) -> None:
+        """Turn the appended columns into a store and move it into place."""
+        for name, dtype in STORE_COLUMNS.items():
+            self.files[name].close()
+            raw_path = self.tmp_path / f"{name}.bin"
+            with (self.tmp_path / f"{name}.npy").open("wb") as f, raw_path.open("rb") as raw:
+                header = {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": (self.n_rows,)}
+                np.lib.format.write_array_header_1_0(f, header)
+                shutil.copyfileobj(raw, f)
+            raw_path.unlink()
+        if not self.is_sorted:
+            LOG.warning("Points were not appended in time order, sorting the point store...")
+            self._sort()
+
+        columns = {name: dtype.str for name, dtype in STORE_COLUMNS.items()}
+        manifest = {"version": STORE_VERSION, "rows": self.n_rows, "columns": columns}
+        (self.tmp_path / MANIFEST_FILE).write_text(json.dumps(manifest))
+
+        shutil.rmtree(self.store_path, ignore_errors=True)
+        self.tmp_path.rename(self.store_path)
+        LOG.info(f"Wrote {self.n_rows} points to the point store at {self.store_path}")
+
+    def abort(self) -> None:
+        """Drop everything appended, leaving any existing store untouched."""
+        for f in self.files.values():
+            f.close()
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+    def _sort(self) -> None:
+        order = np.argsort(np.load(self.tmp_path / "timestamp.npy", mmap_mode="r"), kind="stable")
+        for name, dtype in STORE_COLUMNS.items():
+            column_path = self.tmp_path / f"{name}.npy"
+            sorted_path = self.tmp_path / f"{name}.sorted.npy"
+            column = np.load(column_path, mmap_mode="r")
+            sorted_column = np.lib.format.open_memmap(sorted_path, mode="w+", dtype=dtype, shape=(self.n_rows,))
+            for offset in range(0, self.n_rows, self.chunk_size):
+                sorted_column[offset : offset + self.chunk_size] = column[order[offset : offset + self.chunk_size]]
+            sorted_column.flush()
+            del column, sorted_column
+            sorted_path.replace(column_path)
+
+
+def write_point_store(df: pd.DataFrame, store_path: Path, chunk_size: int = WRITE_CHUNK_SIZE) -> None:
+    """
+    Write Records points to a store directory, replacing any existing store.
+
+    The columns are written sorted on timestamp, a chunk at a time, through a `PointStoreWriter`.
+
+    Parameters:
+        df (pd.DataFrame): Raw or preprocessed Records, in any order.
+        store_path (Path): Directory of the store.
+        chunk_size (int): Rows gathered into sorted order at a time.
+    """
+    arrays = store_arrays(df)
+    order = np.argsort(arrays["timestamp"], kind="stable")
+    with PointStoreWriter(store_path, chunk_size) as writer:
+        for offset in range(0, len(order), chunk_size):
+            rows = order[offset : offset + chunk_size]
+            writer.append_arrays({name: arrays[name][rows] for name in STORE_COLUMNS})
+
+
+class PointStore:
+    """Read-only, memory-mapped view of a point store written by `write_point_store`."""
+
+    def __init__(self, store_path: Path):
+        self.store_path = Path(store_path)
+        manifest = json.loads((self.store_path / MANIFEST_FILE).read_text())
+        if manifest["version"] != STORE_VERSION:
+            raise ValueError(f"Unsupported point store version {manifest['version']} at {self.store_path}")
+        # Empty arrays can't be memory-mapped, np.load reads their header only
+        mmap_mode = "r" if manifest["rows"] else None
+        self.columns: Dict[str, np.ndarray] = {
+            name: np.load(self.store_path / f"{name}.npy", mmap_mode=mmap_mode) for name in manifest["columns"]
+        }
+
+    def __len__(self) -> int:
+        return len(self.columns["timestamp"])
+
+    def time_range(self) -> Optional[Tuple[pd.Timestamp, pd.Timestamp]]:
+        """First and last timestamp in the store, or None if it is empty."""
+        if not len(self):
+            return None
+        timestamps = self.columns["timestamp"]
+        return pd.Timestamp(timestamps[0], tz="UTC"), pd.Timestamp(timestamps[-1], tz="UTC")
+
+    def bounds(self, start: TimeBound = None, end: TimeBound = None) -> Tuple[int, int]:
+        """Row range of the points with `start <= timestamp < end`, found by binary search."""
+        timestamps = self.columns["timestamp"]
+        first = 0 if start is None else int(np.searchsorted(timestamps, _timestamp_ns(start), side="left"))
+        last = len(timestamps) if end is None else int(np.searchsorted(timestamps, _timestamp_ns(end), side="left"))
+        return first, max(first, last)
+
+    def slice(self, start: TimeBound = None, end: TimeBound = None) -> Dict[str, np.ndarray]:
+        """
+        Zero-copy views of every column for the points with `start <= timestamp < end`.
+
+        Naive time bounds are read as UTC. The views are read-only and stay valid while the store is referenced.
+        """
+        first, last = self.bounds(start, end)
+        return {name: column[first:last] for name, column in self.columns.items()}
+
+    def to_frame(self, start: TimeBound = None, end: TimeBound = None, limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        Materialize the points of a time range as a DataFrame, with a UTC `timestamp` column.
+
+        With `limit`, only the first `limit` points of the range are read.
+        """
+        window = self.slice(start, end)
+        df = pd.DataFrame({name: np.asarray(values[:limit]) for name, values in window.items()})
+        df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ns", utc=True)
+        return df
@@ -1,17 +1,29 @@
 import json
 import logging
+import sqlite3
+from contextlib import ExitStack, closing
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 import random
 
+import numpy as np
 import pandas as pd
 
+from chatlas.data_prep import point_store, sqlite_loader, storage, trajectory
+
 # Logging configuration
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 # Constants
 DEFAULT_RECORDS_PATH = Path("./data/sample/location_history/Records.json")
-DEFAULT_OUTPUT_PATH = Path("./data/sample/processed/records.pkl")
+DEFAULT_OUTPUT_PATH = Path("./data/sample/processed/records.parquet")
+DEFAULT_POINT_STORE_PATH = Path("./data/sample/processed/points")
+DEFAULT_CHUNK_SIZE = 100_000
+READ_BLOCK_SIZE = 1 << 20
+# Columns with at most this share of distinct values are stored as categories
+CATEGORY_MAX_UNIQUE_RATIO = 0.1
+# Non-string columns that are labels rather than quantities
+CATEGORY_COLUMNS = ["deviceTag"]
 
 
 def load_data(file_path: Path, n: Optional[int] = None) -> pd.DataFrame:
@@ -31,6 +43,97 @@ def load_data(file_path: Path, n: Optional[int] = None) -> pd.DataFrame:
     return df
 
 
+def iter_locations(file_path: Path, block_size: int = READ_BLOCK_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Incrementally parse the `locations` array of a Records.json file, yielding one location at a time.
+
+    Only a single read block plus the element being decoded is held in memory, so the file size does not matter.
+    """
+    decoder = json.JSONDecoder()
+    with file_path.open("r") as f:
+        buffer = ""
+        eof = False
+
+        def fill() -> bool:
+            nonlocal buffer, eof
+            block = f.read(block_size)
+            if not block:
+                eof = True
+                return False
+            buffer += block
+            return True
+
+        # Seek to the opening bracket of the locations array
+        while True:
+            key_pos = buffer.find('"locations"')
+            if key_pos != -1:
+                bracket_pos = buffer.find("[", key_pos)
+                if bracket_pos != -1:
+                    buffer = buffer[bracket_pos + 1 :]
+                    break
+            if not fill():
+                raise ValueError(f"No 'locations' array found in {file_path}")
+
+        pos = 0
+        while True:
+            # Skip whitespace and separators between elements
+            while True:
+                while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                    pos += 1
+                if pos < len(buffer) or not fill():
+                    break
+            if pos >= len(buffer):
+                raise ValueError(f"Unterminated 'locations' array in {file_path}")
+            if buffer[pos] == "]":
+                return
+
+            try:
+                location, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The element straddles the end of the buffer; drop consumed text and read more
+                buffer = buffer[pos:]
+                pos = 0
+                if not fill():
+                    raise
+                continue
+
+            yield location
+            pos = end
+            if pos > block_size:
+                buffer = buffer[pos:]
+                pos = 0
+
+
+def iter_chunks(file_path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Stream a Records.json file as normalized DataFrames of at most `chunk_size` rows.
+    """
+    chunk = []
+    for location in iter_locations(file_path):
+        chunk.append(location)
+        if len(chunk) == chunk_size:
+            yield pd.json_normalize(chunk)
+            chunk = []
+    if chunk:
+        yield pd.json_normalize(chunk)
+
+
+def load_data_streaming(file_path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> pd.DataFrame:
+    """
+    Load data from a JSON file chunk by chunk, without materializing the raw JSON in memory.
+
+    Produces the same DataFrame as `load_data` for the full file. Only the raw JSON is bounded, the DataFrame of the
+    whole file is still built in memory; `main` processes the chunks one at a time instead.
+    """
+    logging.info(f"Streaming data from {file_path} in chunks of {chunk_size}...")
+    chunks = list(iter_chunks(file_path, chunk_size))
+    if not chunks:
+        return pd.DataFrame()
+    df = pd.concat(chunks, ignore_index=True)
+    logging.info(f"Streamed {len(df)} rows in {len(chunks)} chunks.")
+    return df
+
+
 def preprocess_data(df: pd.DataFrame, sample_n: Optional[int] = None) -> pd.DataFrame:
     """
     Preprocess DataFrame.
@@ -44,16 +147,17 @@ def preprocess_data(df: pd.DataFrame, sample_n: Optional[int] = None) -> pd.Data
         df = df.sample(sample_n)
         logging.info(f"Sampled {sample_n} rows from the DataFrame.")
 
-    # Extract the top activity and its confidence
-    df["top_activity"] = df["activity"].apply(get_top_activity)
-    df["confidence"] = df["top_activity"].apply(lambda x: x["confidence"] if x else None)
-    df["top_activity"] = df["top_activity"].apply(lambda x: x["type"] if x else None)
+    # Extract the top activity and its confidence, a chunk of a streamed file may have no activity at all
+    if "activity" in df.columns:
+        df["top_activity"], df["confidence"] = top_activities(df["activity"])
 
-    # Drop redundant columns
-    df.drop(columns=["activity"], inplace=True)
+        # Drop redundant columns
+        df.drop(columns=["activity"], inplace=True)
+    else:
+        df["top_activity"], df["confidence"] = None, np.nan
 
-    # Convert all string data to lowercase
-    df = df.applymap(lambda x: x.lower() if isinstance(x, str) else x)
+    # Lowercase strings and store low-cardinality columns as categories
+    df = normalize_columns(df)
 
     logging.info("Preprocessing completed.")
     return df
@@ -72,26 +176,189 @@ def get_top_activity(activities: Union[List[Dict], float]) -> Optional[Dict]:
         return None
 
 
+def top_activities(activity: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """
+    Vectorized `get_top_activity` over a whole column.
+
+    The nested activity lists are flattened once into typed arrays, then the first activity with the highest
+    confidence of every row is found with NumPy. Ties and missing values resolve exactly as in `get_top_activity`.
+
+    Returns:
+        Tuple[pd.Series, pd.Series]: The top activity type and its confidence, aligned with `activity`.
+    """
+    rows, types, confidences = [], [], []
+    for row, activities in enumerate(activity.tolist()):
+        if isinstance(activities, list):
+            for act in activities:
+                for guess in act["activity"]:
+                    rows.append(row)
+                    types.append(guess["type"])
+                    confidences.append(guess["confidence"])
+
+    n = len(activity)
+    top_type = np.full(n, None, dtype=object)
+    if not rows:
+        return pd.Series(top_type, index=activity.index), pd.Series(top_type.copy(), index=activity.index)
+
+    rows = np.asarray(rows)
+    confidences = np.asarray(confidences)
+    # Guesses of a row are contiguous: reduce each run to its maximum, then take the first guess reaching it
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    run_max = np.maximum.reduceat(confidences, starts)
+    is_max = confidences == np.repeat(run_max, np.diff(np.r_[starts, len(rows)]))
+    max_positions = np.flatnonzero(is_max)
+    _, first = np.unique(rows[max_positions], return_index=True)
+    top = max_positions[first]
+
+    top_rows = rows[top]
+    top_type[top_rows] = np.asarray(types, dtype=object)[top]
+    if len(top_rows) == n:
+        top_confidence = confidences[top]
+    else:
+        top_confidence = np.full(n, np.nan)
+        top_confidence[top_rows] = confidences[top]
+    return pd.Series(top_type, index=activity.index), pd.Series(top_confidence, index=activity.index)
+
+
+def normalize_columns(df: pd.DataFrame, max_unique_ratio: float = CATEGORY_MAX_UNIQUE_RATIO) -> pd.DataFrame:
+    """
+    Lowercase the string columns and convert low-cardinality columns to the `category` dtype.
+
+    Only object columns holding strings are touched, with vectorized string methods. Categories keep one copy of each
+    distinct value plus small integer codes, and are written as dictionary-encoded columns to Parquet.
+    """
+    df = df.copy()
+    for column in df.columns:
+        values = df[column]
+        if values.dtype == object:
+            kind = pd.api.types.infer_dtype(values, skipna=True)
+            if kind == "string":
+                values = values.str.lower()
+            elif kind.startswith("mixed"):
+                is_str = values.map(lambda x: isinstance(x, str)).astype(bool)
+                if not is_str.any():
+                    continue
+                values = values.copy()
+                values[is_str] = values[is_str].str.lower()
+                df[column] = values
+                continue
+            else:
+                continue
+        elif column not in CATEGORY_COLUMNS:
+            continue
+
+        if values.nunique() <= max(1, len(values) * max_unique_ratio):
+            values = values.astype("category")
+        df[column] = values
+    return df
+
+
 def save_data(df: pd.DataFrame, output_file: Path) -> None:
     """
-    Save DataFrame to a pickle file.
+    Save DataFrame to a Parquet file (sorted on timestamp) or a pickle file, depending on the file suffix.
     """
     logging.info("Saving processed data...")
     output_dir = output_file.parent
     output_dir.mkdir(parents=True, exist_ok=True)
-    df.to_pickle(output_file)
+    if output_file.suffix == ".parquet":
+        storage.write_table(df, output_file, types=storage.RECORDS_TYPES, sort_by="timestamp")
+    else:
+        df.to_pickle(output_file)
     logging.info(f"Saved DataFrame of shape {df.shape} to: {output_file}")
 
 
-def main():
+def build_point_store(
+    records_path: Path = DEFAULT_RECORDS_PATH,
+    point_store_path: Path = DEFAULT_POINT_STORE_PATH,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> None:
+    """Write only the point store, for installs whose records were processed before the store existed."""
+    with point_store.PointStoreWriter(point_store_path) as writer:
+        for chunk in iter_chunks(records_path, chunk_size):
+            writer.append(chunk)
+
+
+def process_streaming(
+    records_path: Path,
+    output_path: Path,
+    sql_db_path: Optional[Path] = None,
+    point_store_path: Optional[Path] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    **reduce_kwargs: Any,
+) -> None:
+    """
+    Process Records.json chunk by chunk, so peak memory doesn't depend on the size of the file.
+
+    Each chunk is preprocessed and appended to the point store, then reduced a batch of days at a time, and the kept
+    points are appended to the Parquet output and the points table. Only a chunk, a day of points and a row group are
+    in memory at any time.
+    """
+    logging.info(f"Streaming data from {records_path} in chunks of {chunk_size}...")
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with ExitStack() as stack:
+        writer = stack.enter_context(storage.ChunkedTableWriter(output_path, types=storage.RECORDS_TYPES))
+        store_writer = None
+        if point_store_path is not None:
+            store_writer = stack.enter_context(point_store.PointStoreWriter(point_store_path))
+
+        def preprocessed_chunks() -> Iterator[pd.DataFrame]:
+            for chunk in iter_chunks(records_path, chunk_size):
+                chunk = preprocess_data(chunk)
+                if store_writer is not None:
+                    store_writer.append(chunk)
+                yield chunk
+
+        def saved_batches() -> Iterator[pd.DataFrame]:
+            for reduced in trajectory.iter_reduce_records(preprocessed_chunks(), **reduce_kwargs):
+                writer.write(reduced)
+                yield reduced
+
+        if sql_db_path is None:
+            for _ in saved_batches():
+                pass
+        else:
+            logging.info("Loading points into sqlite3 database...")
+            with closing(sqlite3.connect(sql_db_path)) as conn:
+                sqlite_loader.load_chunks(conn, "points", saved_batches())
+    logging.info(f"Saved {writer.n_rows} points to: {output_path}")
+
+
+def main(
+    stream: bool = True,
+    records_path: Path = DEFAULT_RECORDS_PATH,
+    output_path: Path = DEFAULT_OUTPUT_PATH,
+    sql_db_path: Optional[Path] = None,
+    point_store_path: Optional[Path] = DEFAULT_POINT_STORE_PATH,
+    bucket_s: Optional[float] = trajectory.DEFAULT_BUCKET_S,
+    min_distance_m: Optional[float] = trajectory.DEFAULT_MIN_DISTANCE_M,
+    tolerance_m: Optional[float] = trajectory.DEFAULT_TOLERANCE_M,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+):
+    reduce_kwargs = {"bucket_s": bucket_s, "min_distance_m": min_distance_m, "tolerance_m": tolerance_m}
+    if stream:
+        process_streaming(records_path, output_path, sql_db_path, point_store_path, chunk_size, **reduce_kwargs)
+        return
+
     # Load raw data and convert to DataFrame
-    df = load_data(DEFAULT_RECORDS_PATH)
+    df = load_data(records_path)
 
     # Preprocess DataFrame
-    df_processed = preprocess_data(df, sample_n=10_000)
+    df_processed = preprocess_data(df)
+
+    # Keep every point at full resolution in the memory-mapped store, for time-range lookups
+    if point_store_path is not None:
+        point_store.write_point_store(df_processed, point_store_path)
+
+    # Reduce the full history to the points describing the trajectory
+    df_processed = trajectory.reduce_records(df_processed, **reduce_kwargs)
 
     # Save the preprocessed data
-    save_data(df_processed, DEFAULT_OUTPUT_PATH)
+    save_data(df_processed, output_path)
+
+    if sql_db_path is not None:
+        logging.info("Loading points into sqlite3 database...")
+        with sqlite3.connect(sql_db_path) as conn:
+            sqlite_loader.load(conn, {"points": df_processed})
 
 
 if __name__ == "__main__":
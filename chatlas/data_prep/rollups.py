@@ -0,0 +1,88 @@
+"""Pre-aggregated rollup tables for common travel questions.
+
+`place_rollups` and `activity_rollups` hold daily, monthly and yearly counts and durations, so questions like "how many
+countries did I visit in 2021" or "how far did I walk per month" don't need GROUP BYs over the raw tables.
+"""
+
+import logging
+import sqlite3
+from typing import Iterable, Optional, Set
+
+LOG = logging.getLogger(__name__)
+
+# period -> strftime format of its period_start
+PERIODS = {"day": "%Y-%m-%d", "month": "%Y-%m", "year": "%Y"}
+
+DURATION_S = "CAST(ROUND((julianday(end_time) - julianday(start_time)) * 86400) AS INTEGER)"
+
+ROLLUPS = {
+    "place_rollups": {
+        "source": "places",
+        "columns": (
+            "period TEXT, period_start TEXT, country TEXT, city TEXT, place_id TEXT, name TEXT, "
+            "visits INTEGER, duration_s INTEGER"
+        ),
+        "keys": ["country", "city", "place_id"],
+        "select": "country, city, place_id, MAX(name), COUNT(*), SUM({duration})",
+    },
+    "activity_rollups": {
+        "source": "activities",
+        "columns": (
+            "period TEXT, period_start TEXT, activity_type TEXT, "
+            "segments INTEGER, distance_m INTEGER, duration_s INTEGER"
+        ),
+        "keys": ["activity_type"],
+        "select": "activity_type, COUNT(*), SUM(distance), SUM({duration})",
+    },
+}
+
+
+def affected_years(conn: sqlite3.Connection, source_files: Iterable[str]) -> Set[str]:
+    """Years of the rows currently loaded from the given source files."""
+    years = set()
+    params = [(source_file,) for source_file in source_files]
+    for rollup in ROLLUPS.values():
+        query = f"SELECT DISTINCT strftime('%Y', start_time) FROM {rollup['source']} WHERE source_file = ?"
+        for param in params:
+            years.update(year for (year,) in conn.execute(query, param) if year)
+    return years
+
+
+def refresh_rollups(conn: sqlite3.Connection, years: Optional[Iterable[str]] = None) -> None:
+    """
+    Recompute the rollup tables from `places` and `activities`.
+
+    Parameters:
+        conn (sqlite3.Connection): The SQLite connection object.
+        years (Optional[Iterable[str]]): Only recompute these years, e.g. after an incremental load. Rebuilds
+            everything when omitted.
+    """
+    years = None if years is None else sorted(years)
+    if years == []:
+        return
+
+    with conn:
+        for table_name, rollup in ROLLUPS.items():
+            if years is None:
+                conn.execute(f"DROP TABLE IF EXISTS {table_name}")
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table_name} ({rollup['columns']})")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_period ON {table_name} (period, period_start)")
+
+            year_filter, params = "", []
+            if years is not None:
+                placeholders = ", ".join("?" for _ in years)
+                conn.execute(f"DELETE FROM {table_name} WHERE substr(period_start, 1, 4) IN ({placeholders})", years)
+                year_filter, params = f"AND strftime('%Y', start_time) IN ({placeholders})", years
+
+            select = rollup["select"].format(duration=DURATION_S)
+            keys = ", ".join(rollup["keys"])
+            for period, fmt in PERIODS.items():
+                conn.execute(
+                    f"INSERT INTO {table_name} "
+                    f"SELECT '{period}', strftime('{fmt}', start_time) AS period_start, {select} "
+                    f"FROM {rollup['source']} WHERE start_time IS NOT NULL {year_filter} "
+                    f"GROUP BY period_start, {keys}",
+                    params,
+                )
+
+    LOG.info(f"Refreshed rollup tables for {'all years' if years is None else ', '.join(years)}.")
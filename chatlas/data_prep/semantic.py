@@ -1,13 +1,16 @@
 import json
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 import sqlite3
 
-from chatlas.utils import get_nested_value
+from chatlas.data_prep import manifest, rollups, spatial, sqlite_loader, storage
+from chatlas.utils import FieldExtractor
 
 # logging configuration
 LOG = logging.getLogger(__name__)
@@ -21,9 +24,50 @@ PROCESSED_PATH = BASE_PATH / "processed"
 
 # Constants
 DEFAULT_SEMANTIC_PATH = SEMANTIC_PATH
-DEFAULT_PLACES_OUTPUT_PATH = PROCESSED_PATH / "semantic_places.pkl"
-DEFAULT_ACTIVITIES_OUTPUT_PATH = PROCESSED_PATH / "semantic_activities.pkl"
+DEFAULT_PLACES_OUTPUT_PATH = PROCESSED_PATH / "semantic_places.parquet"
+DEFAULT_ACTIVITIES_OUTPUT_PATH = PROCESSED_PATH / "semantic_activities.parquet"
 SQL_DB_PATH = PROCESSED_PATH / "chatlas.db"
+ADDRESS_COLUMNS = ["addr_name", "street", "city", "state", "country"]
+
+# Output column -> key path within a placeVisit
+PLACE_FIELDS = {
+    # Location
+    "name": ["location", "name"],
+    "address": ["location", "address"],
+    "lat": ["location", "latitudeE7"],
+    "lon": ["location", "longitudeE7"],
+    "place_id": ["location", "placeId"],
+    # Confidence
+    "confidence_visit": ["visitConfidence"],
+    "confidence_location": ["locationConfidence"],
+    # Times
+    "start_time": ["duration", "startTimestamp"],
+    "end_time": ["duration", "endTimestamp"],
+    # Other
+    "visit_type": ["placeVisitType"],
+    "visit_importance": ["placeVisitImportance"],
+}
+
+# Output column -> key path within an activitySegment
+ACTIVITY_FIELDS = {
+    # Locations
+    "startLocation_lat": ["startLocation", "latitudeE7"],
+    "startLocation_lon": ["startLocation", "longitudeE7"],
+    "endLocation_lat": ["endLocation", "latitudeE7"],
+    "endLocation_lon": ["endLocation", "longitudeE7"],
+    # Times
+    "start_time": ["duration", "startTimestamp"],
+    "end_time": ["duration", "endTimestamp"],
+    # Distance
+    "distance": ["distance"],
+    # Activity Type
+    "activity_type": ["activityType"],
+    # Confidence
+    "confidence": ["activities", 0, "probability"],
+}
+
+PLACE_EXTRACTOR = FieldExtractor(PLACE_FIELDS)
+ACTIVITY_EXTRACTOR = FieldExtractor(ACTIVITY_FIELDS)
 
 
 def parse_datetime(dt_str: str) -> datetime:
@@ -40,7 +84,7 @@ def parse_datetime(dt_str: str) -> datetime:
 def load_data_from_files(directory: Path) -> list:
     """Load JSON files from a directory."""
     LOG.info("Loading data from files...")
-    data_files = [file for file in directory.glob("*.json")]
+    data_files = sorted(directory.glob("*.json"))
     data = []
 
     for file in data_files:
@@ -51,86 +95,72 @@ def load_data_from_files(directory: Path) -> list:
     return data
 
 
-def extract_single_year(data: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
-    places = []
-    activities = []
+def extract_columns(data: List[Dict[str, Any]]) -> Tuple[Dict[str, List[Any]], Dict[str, List[Any]]]:
+    """Extract places and activities from monthly timelines into columnar lists."""
+    visits = []
+    segments = []
 
     for month in data:
         for i in month["timelineObjects"]:
-            timeline_keys = list(i.keys())
-
             # Check to make sure data is in the expected format
-            if len(timeline_keys) == 1:
-                key = timeline_keys[0]
+            if len(i) == 1:
+                key = next(iter(i))
             else:
-                raise ValueError(f"Expected 1 key, got {len(timeline_keys)} keys.")
+                raise ValueError(f"Expected 1 key, got {len(i)} keys.")
 
             if key == "placeVisit":
-                place_visit = {}
-
-                visit = i["placeVisit"]
-
-                # Location
-                place_visit["name"] = get_nested_value(visit, ["location", "name"], None)
-                place_visit["address"] = get_nested_value(visit, ["location", "address"], None)
-                place_visit["lat"] = get_nested_value(visit, ["location", "latitudeE7"], None)
-                place_visit["lon"] = get_nested_value(visit, ["location", "longitudeE7"], None)
-                place_visit["place_id"] = get_nested_value(visit, ["location", "placeId"], None)
-
-                # Confidence
-                place_visit["confidence_visit"] = get_nested_value(visit, ["visitConfidence"], None)
-                place_visit["confidence_location"] = get_nested_value(visit, ["locationConfidence"], None)
-
-                # Times
-                place_visit["start_time"] = get_nested_value(visit, ["duration", "startTimestamp"], None)
-                place_visit["end_time"] = get_nested_value(visit, ["duration", "endTimestamp"], None)
-
-                # Other
-                place_visit["visit_type"] = get_nested_value(visit, ["placeVisitType"], None)
-                place_visit["visit_importance"] = get_nested_value(visit, ["placeVisitImportance"], None)
-
-                places.append(place_visit)
-
+                visits.append(i[key])
             elif key == "activitySegment":
-                activity = {}
+                segments.append(i[key])
+            else:
+                raise ValueError(f"Unexpected key {key}")
 
-                segment = i["activitySegment"]
+    places = PLACE_EXTRACTOR.extract(visits)
+    activities = ACTIVITY_EXTRACTOR.extract(segments)
 
-                # Locations
-                activity["startLocation_lat"] = get_nested_value(segment, ["startLocation", "latitudeE7"], None)
-                activity["startLocation_lon"] = get_nested_value(segment, ["startLocation", "longitudeE7"], None)
-                activity["endLocation_lat"] = get_nested_value(segment, ["endLocation", "latitudeE7"], None)
-                activity["endLocation_lon"] = get_nested_value(segment, ["endLocation", "longitudeE7"], None)
+    LOG.info(f"Extracted {len(visits)} places and {len(segments)} activities.")
 
-                # Times
-                activity["start_time"] = get_nested_value(segment, ["duration", "startTimestamp"], None)
-                activity["end_time"] = get_nested_value(segment, ["duration", "endTimestamp"], None)
+    return places, activities
 
-                # Distance
-                activity["distance"] = get_nested_value(segment, ["distance"], None)
 
-                # Activity Type
-                activity["activity_type"] = get_nested_value(segment, ["activityType"], None)
+def concat_columns(parts: List[Dict[str, List[Any]]], extractor: FieldExtractor) -> Dict[str, List[Any]]:
+    """Concatenate columnar extraction results, keeping the extractor's column order."""
+    columns = extractor.empty()
+    for part in parts:
+        for column, values in part.items():
+            columns.setdefault(column, []).extend(values)
+    return columns
 
-                # Confidence
-                activity["confidence"] = get_nested_value(segment, ["activities", 0, "probability"], None)
 
-                activities.append(activity)
+def extract_single_year(data: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Extract places and activities from monthly timelines as lists of row dicts."""
+    places, activities = extract_columns(data)
+    return (
+        [dict(zip(places, row)) for row in zip(*places.values())],
+        [dict(zip(activities, row)) for row in zip(*activities.values())],
+    )
 
-            else:
-                raise ValueError(f"Unexpected key {key}")
 
-    LOG.info(f"Extracted {len(places)} places and {len(activities)} activities.")
+def list_month_files(semantic_dir: Path) -> List[Path]:
+    """List the monthly JSON files of every year directory, in a deterministic order."""
+    year_dirs = sorted(year_dir for year_dir in semantic_dir.iterdir() if year_dir.is_dir())
+    return [file for year_dir in year_dirs for file in sorted(year_dir.glob("*.json"))]
 
-    return places, activities
+
+def extract_month_file(file_path: Path) -> Tuple[Dict[str, List[Any]], Dict[str, List[Any]]]:
+    """Load and extract a single monthly JSON file into columns. Runs inside worker processes."""
+    with file_path.open("r") as f:
+        data = json.load(f)
+    return extract_columns([data])
 
 
-def extract_all_semantic(semantic_dir: Path) -> Tuple[pd.DataFrame, pd.DataFrame]:
+def extract_all_semantic(semantic_dir: Path, workers: Optional[int] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """
     Processes data for all years present in the given semantic directory.
 
     Parameters:
         semantic_dir (Path): The path to the semantic directory containing subdirectories for each year.
+        workers (Optional[int]): If set, parse the monthly files in a pool of this many processes.
 
     Returns:
         all_places (pd.DataFrame): DataFrame containing all places.
@@ -139,33 +169,77 @@ def extract_all_semantic(semantic_dir: Path) -> Tuple[pd.DataFrame, pd.DataFrame
     all_places = []
     all_activities = []
 
-    for year_dir in semantic_dir.iterdir():
-        if year_dir.is_dir():
-            LOG.info(f"=== Processing {year_dir.name}... ===")
-            data = load_data_from_files(year_dir)
-            places, activities = extract_single_year(data)
-            all_places.extend(places)
-            all_activities.extend(activities)
-        else:
-            LOG.info(f"Skipping {year_dir} as it is not a directory.")
+    if workers:
+        month_files = list_month_files(semantic_dir)
+        LOG.info(f"=== Processing {len(month_files)} monthly files with {workers} workers... ===")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map() yields in submission order, so the merged result is deterministic
+            for places, activities in pool.map(extract_month_file, month_files):
+                all_places.append(places)
+                all_activities.append(activities)
+    else:
+        for year_dir in sorted(semantic_dir.iterdir()):
+            if year_dir.is_dir():
+                LOG.info(f"=== Processing {year_dir.name}... ===")
+                data = load_data_from_files(year_dir)
+                places, activities = extract_columns(data)
+                all_places.append(places)
+                all_activities.append(activities)
+            else:
+                LOG.info(f"Skipping {year_dir} as it is not a directory.")
 
     # Convert to DataFrames
-    all_places = pd.DataFrame(all_places)
-    all_activities = pd.DataFrame(all_activities)
+    all_places = pd.DataFrame(concat_columns(all_places, PLACE_EXTRACTOR))
+    all_activities = pd.DataFrame(concat_columns(all_activities, ACTIVITY_EXTRACTOR))
 
     LOG.info(f"Extracted {len(all_places)} places and {len(all_activities)} activities in total.")
 
     return all_places, all_activities
 
 
+def extract_month_files(
+    month_files: List[Path], root: Path, workers: Optional[int] = None
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Extract the given monthly files, tagging every row with its `source_file` relative to `root`.
+
+    Parameters:
+        month_files (List[Path]): The monthly JSON files to extract.
+        root (Path): The semantic directory the source paths are relative to.
+        workers (Optional[int]): If set, parse the files in a pool of this many processes.
+
+    Returns:
+        places (pd.DataFrame): DataFrame containing the places of the given files.
+        activities (pd.DataFrame): DataFrame containing the activities of the given files.
+    """
+    all_places = []
+    all_activities = []
+
+    if workers:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(extract_month_file, month_files))
+    else:
+        results = map(extract_month_file, month_files)
+
+    for file_path, (places, activities) in zip(month_files, results):
+        source_file = file_path.relative_to(root).as_posix()
+        places["source_file"] = [source_file] * len(places["name"])
+        activities["source_file"] = [source_file] * len(activities["start_time"])
+        all_places.append(places)
+        all_activities.append(activities)
+
+    all_places = pd.DataFrame(concat_columns(all_places, PLACE_EXTRACTOR))
+    all_activities = pd.DataFrame(concat_columns(all_activities, ACTIVITY_EXTRACTOR))
+    return all_places, all_activities
+
+
 def process_places(places: pd.DataFrame) -> pd.DataFrame:
     # Convert timestamp to datetime format
     places["start_time"] = pd.to_datetime(places["start_time"], format="ISO8601")
     places["end_time"] = pd.to_datetime(places["end_time"], format="ISO8601")
 
     # Extract address components
-    addr_components = places["address"].apply(extract_address_components)
-    places[["addr_name", "street", "city", "state", "country"]] = addr_components
+    places[ADDRESS_COLUMNS] = split_addresses(places["address"])
 
     # Convert lat/lon to float
     places["lat"] = (places["lat"] / 1e7).astype("float64")
@@ -233,12 +307,45 @@ def extract_address_components(address: str) -> pd.Series:
     )
 
 
-def write_to_df(df: pd.DataFrame, output_file: Path) -> None:
-    """Save DataFrame to a pickle file."""
+def split_addresses(addresses: pd.Series) -> pd.DataFrame:
+    """
+    Vectorized version of `extract_address_components` over a whole column of addresses.
+
+    Follows the same 3/4/5 component rules, and fills "missing" for absent components and unexpected formats.
+    """
+    addresses = addresses.astype(object).where(addresses.map(type) == str, "")
+    n_components = addresses.str.count(",").to_numpy() + 1
+    # Columns no address reaches come out all-NaN floats, which have no .str accessor
+    parts = addresses.str.split(",", n=4, expand=True).reindex(columns=range(5)).astype(object)
+    parts = [parts[i].str.strip().to_numpy() for i in range(5)]
+
+    # Source component for every output column, keyed on the number of components
+    layouts = {
+        3: [None, parts[0], parts[1], None, parts[2]],
+        4: [None, parts[0], parts[1], parts[2], parts[3]],
+        5: [parts[0], parts[1], parts[2], parts[3], parts[4]],
+    }
+    result = {}
+    for i, column in enumerate(ADDRESS_COLUMNS):
+        values = np.full(len(addresses), "missing", dtype=object)
+        for n, layout in layouts.items():
+            if layout[i] is not None:
+                mask = n_components == n
+                values[mask] = layout[i][mask]
+        result[column] = values
+
+    return pd.DataFrame(result, index=addresses.index)
+
+
+def write_to_df(df: pd.DataFrame, output_file: Path, types: Optional[Dict[str, Any]] = None) -> None:
+    """Save DataFrame to a Parquet file (sorted on start_time, with the given column types) or a pickle file."""
     LOG.info("Saving processed data...")
     output_dir = output_file.parent
     output_dir.mkdir(parents=True, exist_ok=True)
-    df.to_pickle(output_file)
+    if output_file.suffix == ".parquet":
+        storage.write_table(df, output_file, types=types, sort_by="start_time")
+    else:
+        df.to_pickle(output_file)
     LOG.info(f"Saved DataFrame of shape {df.shape} to: {output_file}")
 
 
@@ -254,26 +361,96 @@ def write_to_sql(df: pd.DataFrame, table_name: str, conn: sqlite3.Connection, if
     df.to_sql(table_name, conn, if_exists=if_exists, index=False)
 
 
+def has_column(conn: sqlite3.Connection, table_name: str, column: str) -> bool:
+    """Check whether a table exists and has the given column."""
+    return any(row[1] == column for row in conn.execute(f"PRAGMA table_info({table_name})"))
+
+
+def read_from_sql(table_name: str, conn: sqlite3.Connection) -> pd.DataFrame:
+    """Read a processed table back from the SQL database, without the ingestion bookkeeping columns."""
+    parse_dates = {"start_time": {"utc": True}, "end_time": {"utc": True}}
+    df = pd.read_sql(f"SELECT * FROM {table_name}", conn, parse_dates=parse_dates)
+    return df.drop(columns=["id", "source_file"], errors="ignore")
+
+
+def ingest_incremental(semantic_path: Path, conn: sqlite3.Connection, workers: Optional[int] = None) -> None:
+    """
+    Upsert only new or changed monthly files into the `places` and `activities` tables.
+
+    Rows are tracked by their `source_file`; rows of changed or removed files are deleted before the freshly parsed
+    rows are appended. If the tables were not built incrementally before, they are rebuilt from scratch.
+    """
+    month_files = list_month_files(semantic_path)
+    previous = manifest.load_manifest(conn)
+    rebuild = not previous or not all(has_column(conn, table, "source_file") for table in ("places", "activities"))
+    if rebuild:
+        LOG.info("No usable manifest found, rebuilding tables from scratch.")
+        manifest.clear_manifest(conn)
+        previous = {}
+
+    changed, removed, entries = manifest.diff_manifest(month_files, semantic_path, previous)
+    if not changed and not removed and not rebuild:
+        manifest.update_manifest(conn, entries, removed)
+        conn.commit()
+        LOG.info("Semantic data is up to date.")
+        return
+
+    places, activities = extract_month_files(changed, semantic_path, workers=workers)
+    if not places.empty:
+        places = process_places(places)
+    if not activities.empty:
+        activities = process_activities(activities)
+
+    changed_sources = [file_path.relative_to(semantic_path).as_posix() for file_path in changed]
+    stale = changed_sources + removed
+    stale_years = set() if rebuild else rollups.affected_years(conn, stale)
+    sqlite_loader.load(conn, {"places": places, "activities": activities}, replace=rebuild, stale_sources=stale)
+    spatial.refresh_spatial_index(conn, rebuild=rebuild)
+    rollups.refresh_rollups(conn, None if rebuild else stale_years | rollups.affected_years(conn, changed_sources))
+    with conn:
+        manifest.update_manifest(conn, entries, removed)
+
+    LOG.info(f"Upserted {len(places)} places and {len(activities)} activities from {len(changed)} files.")
+
+
 def main(
     write_df: bool = True,
     write_sql: bool = True,
     places_output_path: Path = DEFAULT_PLACES_OUTPUT_PATH,
     activities_output_path: Path = DEFAULT_ACTIVITIES_OUTPUT_PATH,
     sql_db_path: Path = SQL_DB_PATH,
+    semantic_path: Path = DEFAULT_SEMANTIC_PATH,
+    workers: Optional[int] = None,
+    incremental: bool = False,
 ) -> None:
-    places, activities = extract_all_semantic(DEFAULT_SEMANTIC_PATH)
+    if incremental:
+        if not write_sql:
+            raise ValueError("Incremental ingestion updates the SQL database, it can't run with write_sql=False")
+        # The database is the store of record; the DataFrame outputs are refreshed from it
+        LOG.info("Incrementally loading data into sqlite3 database...")
+        with sqlite3.connect(sql_db_path) as conn:
+            ingest_incremental(semantic_path, conn, workers=workers)
+            if write_df:
+                write_to_df(read_from_sql("places", conn), places_output_path, storage.PLACES_TYPES)
+                write_to_df(read_from_sql("activities", conn), activities_output_path, storage.ACTIVITIES_TYPES)
+        return
+
+    places, activities = extract_all_semantic(semantic_path, workers=workers)
     places = process_places(places)
     activities = process_activities(activities)
 
     if write_df:
-        write_to_df(places, places_output_path)
-        write_to_df(activities, activities_output_path)
+        write_to_df(places, places_output_path, storage.PLACES_TYPES)
+        write_to_df(activities, activities_output_path, storage.ACTIVITIES_TYPES)
 
     if write_sql:
         LOG.info("Loading data into sqlite3 database...")
         with sqlite3.connect(sql_db_path) as conn:
-            write_to_sql(places, "places", conn)
-            write_to_sql(activities, "activities", conn)
+            # A full load invalidates whatever an incremental run recorded
+            manifest.clear_manifest(conn)
+            sqlite_loader.load(conn, {"places": places, "activities": activities})
+            spatial.refresh_spatial_index(conn, rebuild=True)
+            rollups.refresh_rollups(conn)
         LOG.info("Done loading data into sqlite3 database.")
 
 
@@ -0,0 +1,117 @@
+"""R*Tree spatial index over places and activities in the chatlas SQLite database.
+
+Each indexed table gets a companion `<table>_rtree` virtual table holding a bounding box per row, keyed on the row id.
+Radius and bounding-box lookups first select candidates through the R*Tree and only compute exact distances on those.
+"""
+
+import logging
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+LOG = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6_371_008.8
+METERS_PER_DEGREE_LAT = 111_320.0
+
+# Table -> lat/lon column pairs covered by each row's bounding box
+SPATIAL_COLUMNS: Dict[str, List[Tuple[str, str]]] = {
+    "places": [("lat", "lon")],
+    "activities": [("startLocation_lat", "startLocation_lon"), ("endLocation_lat", "endLocation_lon")],
+}
+
+
+def rtree_table(table_name: str) -> str:
+    return f"{table_name}_rtree"
+
+
+def _bbox_select(table_name: str) -> str:
+    """SELECT producing (id, min_lat, max_lat, min_lon, max_lon) rows for a table."""
+    pairs = SPATIAL_COLUMNS[table_name]
+    lats = ", ".join(lat for lat, _ in pairs)
+    lons = ", ".join(lon for _, lon in pairs)
+    if len(pairs) == 1:
+        bounds = f"{lats}, {lats}, {lons}, {lons}"
+    else:
+        bounds = f"min({lats}), max({lats}), min({lons}), max({lons})"
+    not_null = " AND ".join(f"{lat} IS NOT NULL AND {lon} IS NOT NULL" for lat, lon in pairs)
+    return f"SELECT id, {bounds} FROM {table_name} WHERE {not_null}"
+
+
+def refresh_spatial_index(conn: sqlite3.Connection, rebuild: bool = False) -> None:
+    """
+    Bring the R*Tree indexes in line with their tables.
+
+    Row ids are never reused, so after an incremental load it is enough to drop entries of deleted rows and add the
+    rows past the highest indexed id. With `rebuild`, the indexes are recreated from scratch.
+    """
+    with conn:
+        for table_name in SPATIAL_COLUMNS:
+            rtree = rtree_table(table_name)
+            if rebuild:
+                conn.execute(f"DROP TABLE IF EXISTS {rtree}")
+            conn.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {rtree} USING rtree(id, min_lat, max_lat, min_lon, max_lon)"
+            )
+            conn.execute(f"DELETE FROM {rtree} WHERE id NOT IN (SELECT id FROM {table_name})")
+            conn.execute(
+                f"INSERT INTO {rtree} {_bbox_select(table_name)} "
+                f"AND id > (SELECT COALESCE(MAX(id), 0) FROM {rtree})"
+            )
+            count = conn.execute(f"SELECT COUNT(*) FROM {rtree}").fetchone()[0]
+            LOG.info(f"Spatial index {rtree} covers {count} rows.")
+
+
+def haversine_m(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance in meters, vectorized over arrays."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype="float64")) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def within_bbox(
+    conn: sqlite3.Connection,
+    min_lat: float,
+    min_lon: float,
+    max_lat: float,
+    max_lon: float,
+    table_name: str = "places",
+    columns: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """Rows of a table whose bounding box intersects the given box. Boxes crossing the antimeridian are not split."""
+    select = ", ".join(f't."{column}"' for column in columns) if columns else "t.*"
+    query = (
+        f"SELECT {select} FROM {table_name} t JOIN {rtree_table(table_name)} r ON t.id = r.id "
+        "WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ?"
+    )
+    return pd.read_sql(query, conn, params=(min_lat, max_lat, min_lon, max_lon))
+
+
+def nearby(
+    conn: sqlite3.Connection,
+    lat: float,
+    lon: float,
+    radius_m: float,
+    table_name: str = "places",
+    limit: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Rows of a table within `radius_m` meters of a point, closest first, with their distance in a `distance_m` column.
+
+    For activities, the distance is to the closer of the start and end locations.
+    """
+    dlat = radius_m / METERS_PER_DEGREE_LAT
+    dlon = radius_m / (METERS_PER_DEGREE_LAT * max(np.cos(np.radians(lat)), 1e-6))
+    candidates = within_bbox(conn, lat - dlat, lon - dlon, lat + dlat, lon + dlon, table_name=table_name)
+
+    distances = np.full(len(candidates), np.inf)
+    for lat_column, lon_column in SPATIAL_COLUMNS[table_name]:
+        distances = np.fmin(distances, haversine_m(lat, lon, candidates[lat_column], candidates[lon_column]))
+    candidates["distance_m"] = distances
+
+    result = candidates[candidates["distance_m"] <= radius_m].sort_values("distance_m", kind="stable")
+    if limit is not None:
+        result = result.head(limit)
+    return result.reset_index(drop=True)
@@ -0,0 +1,187 @@
+"""Bulk loader for the chatlas SQLite database.
+
+Creates explicitly typed `places`, `activities` and `points` tables, inserts rows in a single transaction with pragmas
+tuned for loading, and builds the lookup indexes once the data is in.
+"""
+
+import logging
+import sqlite3
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import pandas as pd
+
+LOG = logging.getLogger(__name__)
+
+# Timestamps are stored as UTC text, which sorts correctly and works with SQLite's date functions
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+TABLES: Dict[str, List[Tuple[str, str]]] = {
+    "places": [
+        ("name", "TEXT"),
+        ("address", "TEXT"),
+        ("lat", "REAL"),
+        ("lon", "REAL"),
+        ("place_id", "TEXT"),
+        ("confidence_visit", "INTEGER"),
+        ("confidence_location", "INTEGER"),
+        ("start_time", "TEXT"),
+        ("end_time", "TEXT"),
+        ("visit_type", "TEXT"),
+        ("visit_importance", "TEXT"),
+        ("addr_name", "TEXT"),
+        ("street", "TEXT"),
+        ("city", "TEXT"),
+        ("state", "TEXT"),
+        ("country", "TEXT"),
+        ("source_file", "TEXT"),
+    ],
+    "activities": [
+        ("startLocation_lat", "REAL"),
+        ("startLocation_lon", "REAL"),
+        ("endLocation_lat", "REAL"),
+        ("endLocation_lon", "REAL"),
+        ("start_time", "TEXT"),
+        ("end_time", "TEXT"),
+        ("distance", "INTEGER"),
+        ("activity_type", "TEXT"),
+        ("confidence", "INTEGER"),
+        ("source_file", "TEXT"),
+    ],
+    # Raw Records, reduced to the points that describe the trajectory
+    "points": [
+        ("timestamp", "TEXT"),
+        ("lat", "REAL"),
+        ("lon", "REAL"),
+        ("accuracy", "INTEGER"),
+        ("top_activity", "TEXT"),
+        ("confidence", "INTEGER"),
+    ],
+}
+
+INDEXES: Dict[str, List[str]] = {
+    "places": ["start_time", "end_time", "city", "country", "place_id", "source_file"],
+    "activities": ["start_time", "end_time", "activity_type", "source_file"],
+    "points": ["timestamp"],
+}
+
+LOAD_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -262144",
+]
+
+QUERY_PRAGMAS = [
+    "PRAGMA synchronous = NORMAL",
+]
+
+
+def create_table(conn: sqlite3.Connection, table_name: str) -> None:
+    """Create a typed table if it does not exist yet. Row ids are never reused, so derived indexes can track them."""
+    columns = ", ".join(f'"{name}" {sql_type}' for name, sql_type in TABLES[table_name])
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {table_name} (id INTEGER PRIMARY KEY AUTOINCREMENT, {columns})")
+
+
+def create_indexes(conn: sqlite3.Connection, table_name: str) -> None:
+    """Create the lookup indexes of a table."""
+    for column in INDEXES[table_name]:
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table_name}_{column} ON {table_name} ("{column}")')
+
+
+def to_sql_values(series: pd.Series) -> List:
+    """Convert a column into a list of Python values SQLite can bind, with None for missing values."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        if series.dt.tz is not None:
+            series = series.dt.tz_convert("UTC")
+        series = series.dt.strftime(TIME_FORMAT)
+    values = series.astype(object)
+    return values.where(series.notna(), None).tolist()
+
+
+def iter_rows(df: pd.DataFrame, columns: Sequence[str]) -> Iterable[Tuple]:
+    """Iterate the rows of the given columns as tuples, filling absent columns with NULLs."""
+    n_rows = len(df)
+    values = [to_sql_values(df[column]) if column in df.columns else [None] * n_rows for column in columns]
+    return zip(*values)
+
+
+def bulk_insert(conn: sqlite3.Connection, table_name: str, df: pd.DataFrame) -> None:
+    """Insert every row of the DataFrame into a table with a single executemany."""
+    columns = [name for name, _ in TABLES[table_name]]
+    placeholders = ", ".join("?" for _ in columns)
+    column_list = ", ".join(f'"{name}"' for name in columns)
+    conn.executemany(f"INSERT INTO {table_name} ({column_list}) VALUES ({placeholders})", iter_rows(df, columns))
+
+
+def load(
+    conn: sqlite3.Connection,
+    tables: Dict[str, pd.DataFrame],
+    replace: bool = True,
+    stale_sources: Sequence[str] = (),
+) -> None:
+    """
+    Bulk load DataFrames into their tables in a single transaction.
+
+    Parameters:
+        conn (sqlite3.Connection): The SQLite connection object.
+        tables (Dict[str, pd.DataFrame]): DataFrames to load, keyed on table name.
+        replace (bool): Drop and recreate the tables, building the indexes after the insert. Otherwise rows are
+            appended to the existing tables.
+        stale_sources (Sequence[str]): When appending, first delete the rows of these source files.
+    """
+    # journal_mode can't be changed inside a transaction
+    conn.commit()
+    for pragma in LOAD_PRAGMAS:
+        conn.execute(pragma)
+
+    try:
+        with conn:
+            conn.execute("BEGIN")
+            for table_name, df in tables.items():
+                if replace:
+                    conn.execute(f"DROP TABLE IF EXISTS {table_name}")
+                create_table(conn, table_name)
+                if not replace:
+                    conn.executemany(
+                        f"DELETE FROM {table_name} WHERE source_file = ?", [(source,) for source in stale_sources]
+                    )
+                bulk_insert(conn, table_name, df)
+                create_indexes(conn, table_name)
+                LOG.info(f"Loaded {len(df)} rows into {table_name}.")
+    finally:
+        for pragma in QUERY_PRAGMAS:
+            conn.execute(pragma)
+
+    conn.execute("ANALYZE")
+
+
+def load_chunks(conn: sqlite3.Connection, table_name: str, chunks: Iterable[pd.DataFrame]) -> int:
+    """
+    Replace a table with rows arriving in chunks, in a single transaction.
+
+    Like `load`, but only one chunk is in memory at a time, and the indexes are built once every chunk is in.
+
+    Returns:
+        int: Number of rows loaded.
+    """
+    conn.commit()
+    for pragma in LOAD_PRAGMAS:
+        conn.execute(pragma)
+
+    n_rows = 0
+    try:
+        with conn:
+            conn.execute("BEGIN")
+            conn.execute(f"DROP TABLE IF EXISTS {table_name}")
+            create_table(conn, table_name)
+            for df in chunks:
+                bulk_insert(conn, table_name, df)
+                n_rows += len(df)
+            create_indexes(conn, table_name)
+            LOG.info(f"Loaded {n_rows} rows into {table_name}.")
+    finally:
+        for pragma in QUERY_PRAGMAS:
+            conn.execute(pragma)
+
+    conn.execute("ANALYZE")
+    return n_rows
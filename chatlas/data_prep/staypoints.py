@@ -0,0 +1,389 @@
+"""Stay-point detection: derive visits from raw location Records.
+
+A stay is a run of consecutive points that all lie within `distance_m` of the run's first point, without a recording
+gap longer than `max_gap_s`, lasting at least `min_duration_s`. Runs are found with vectorized passes: the track is cut
+into chains wherever the gap or the step between two points rules out a shared stay, chains that never leave the
+radius of their first point are runs as a whole, and only chains that drift are walked anchor by anchor. Points are
+processed in chunks, carrying a summary of the open run over to the next chunk, so memory stays bounded by the chunk
+size.
+
+Stays of different days at the same location are optionally merged into one place with a grid-based DBSCAN, and the
+result has the schema of `semantic.process_places`, so it can stand in for the semantic places.
+"""
+
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from chatlas.data_prep import records, rollups, semantic, spatial, sqlite_loader, storage
+
+LOG = logging.getLogger(__name__)
+
+NS_PER_S = 1_000_000_000
+
+DEFAULT_DISTANCE_M = 100.0
+DEFAULT_MIN_DURATION_S = 5 * 60
+# Phones record sparsely while still, so a stay may span gaps of up to this long
+DEFAULT_MAX_GAP_S = 2 * 60 * 60
+DEFAULT_MERGE_DISTANCE_M = 50.0
+DEFAULT_MIN_SAMPLES = 1
+
+STAY_VISIT_TYPE = "STAY_POINT"
+STAY_COLUMNS = ["start_time", "end_time", "lat", "lon", "n_points"]
+PLACE_COLUMNS = [*semantic.PLACE_FIELDS, *semantic.ADDRESS_COLUMNS]
+
+
+def point_arrays(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Time-sorted timestamps (ns since epoch, UTC), latitudes and longitudes of raw or preprocessed Records.
+
+    Rows without coordinates are dropped.
+    """
+    if "lat" in df.columns:
+        lat, lon = df["lat"].to_numpy(dtype=float), df["lon"].to_numpy(dtype=float)
+    else:
+        lat = df["latitudeE7"].to_numpy(dtype=float) / 1e7
+        lon = df["longitudeE7"].to_numpy(dtype=float) / 1e7
+    timestamps = pd.DatetimeIndex(pd.to_datetime(df["timestamp"], format="ISO8601", utc=True)).asi8
+
+    valid = ~(np.isnan(lat) | np.isnan(lon))
+    order = np.argsort(timestamps[valid], kind="stable")
+    return timestamps[valid][order], lat[valid][order], lon[valid][order]
+
+
+def chain_starts(
+    timestamps: np.ndarray, lat: np.ndarray, lon: np.ndarray, distance_m: float, max_gap_s: float
+) -> np.ndarray:
+    """
+    Indices where a new chain starts: after a gap longer than `max_gap_s`, or a step longer than `2 * distance_m`.
+
+    A point more than twice the radius away from its predecessor is outside the radius of any anchor the predecessor
+    shares a run with, so no run crosses a chain boundary.
+    """
+    steps = spatial.haversine_m(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    breaks = (np.diff(timestamps) > max_gap_s * NS_PER_S) | (steps > 2 * distance_m)
+    return np.flatnonzero(np.r_[True, breaks])
+
+
+def anchor_runs(lat: np.ndarray, lon: np.ndarray, start: int, end: int, distance_m: float) -> List[int]:
+    """Walk a chain anchor by anchor: each run ends at the first point outside the radius of its first point."""
+    phi, lam = np.radians(lat[start:end]), np.radians(lon[start:end])
+    cos_phi = np.cos(phi)
+    # Compare the haversine term itself, skipping the arcsin and square root per point
+    threshold = np.sin(distance_m / (2 * spatial.EARTH_RADIUS_M)) ** 2
+
+    starts = []
+    anchor, n = 0, end - start
+    while anchor < n:
+        starts.append(start + anchor)
+        scan, size = anchor + 1, 16
+        # Look ahead in growing blocks, long stays take a few vectorized steps instead of one per point
+        while scan < n:
+            stop = min(scan + size, n)
+            h = (
+                np.sin((phi[scan:stop] - phi[anchor]) / 2) ** 2
+                + cos_phi[anchor] * cos_phi[scan:stop] * np.sin((lam[scan:stop] - lam[anchor]) / 2) ** 2
+            )
+            outside = h > threshold
+            first = int(outside.argmax())
+            if outside[first]:
+                scan += first
+                break
+            scan, size = stop, size * 4
+        anchor = scan
+    return starts
+
+
+def split_runs(
+    timestamps: np.ndarray, lat: np.ndarray, lon: np.ndarray, distance_m: float, max_gap_s: float
+) -> np.ndarray:
+    """
+    Split time-sorted points into runs of points within `distance_m` of the run's first point.
+
+    Returns:
+        np.ndarray: Sorted start index of every run.
+    """
+    if len(timestamps) == 0:
+        return np.array([], dtype=np.int64)
+
+    starts = chain_starts(timestamps, lat, lon, distance_m, max_gap_s)
+    ends = np.r_[starts[1:], len(timestamps)]
+    first = np.repeat(starts, ends - starts)
+    radius = np.maximum.reduceat(spatial.haversine_m(lat[first], lon[first], lat, lon), starts)
+    drifting = radius > distance_m
+
+    runs = [starts[~drifting]]
+    for start, end in zip(starts[drifting], ends[drifting]):
+        runs.append(np.asarray(anchor_runs(lat, lon, start, end, distance_m), dtype=np.int64))
+    return np.sort(np.concatenate(runs))
+
+
+def summarize_runs(
+    timestamps: np.ndarray, lat: np.ndarray, lon: np.ndarray, run_starts: np.ndarray, min_duration_s: float
+) -> pd.DataFrame:
+    """Centroid, time span and size of the runs lasting at least `min_duration_s`."""
+    run_ends = np.r_[run_starts[1:], len(timestamps)].astype(np.int64) if len(run_starts) else run_starts
+    n_points = run_ends - run_starts
+    start_time, end_time = timestamps[run_starts], timestamps[run_ends - 1]
+    is_stay = end_time - start_time >= min_duration_s * NS_PER_S
+
+    def mean(values: np.ndarray) -> np.ndarray:
+        return np.add.reduceat(values, run_starts) / n_points if len(run_starts) else np.array([])
+
+    return pd.DataFrame(
+        {
+            "start_time": pd.to_datetime(start_time[is_stay], utc=True),
+            "end_time": pd.to_datetime(end_time[is_stay], utc=True),
+            "lat": mean(lat)[is_stay],
+            "lon": mean(lon)[is_stay],
+            "n_points": n_points[is_stay],
+        }
+    )
+
+
+class OpenRun(NamedTuple):
+    """Running summary of the last run of a chunk, which may continue in the next chunk."""
+
+    anchor_lat: float
+    anchor_lon: float
+    start_ns: int
+    last_ns: int
+    lat_sum: float
+    lon_sum: float
+    n_points: int
+
+    def extend(self, timestamps: np.ndarray, lat: np.ndarray, lon: np.ndarray) -> "OpenRun":
+        if not len(timestamps):
+            return self
+        return self._replace(
+            last_ns=int(timestamps[-1]),
+            lat_sum=self.lat_sum + lat.sum(),
+            lon_sum=self.lon_sum + lon.sum(),
+            n_points=self.n_points + len(timestamps),
+        )
+
+    def continued_by(
+        self, timestamps: np.ndarray, lat: np.ndarray, lon: np.ndarray, distance_m: float, max_gap_s: float
+    ) -> int:
+        """Number of leading points that continue the run: within the anchor's radius, without a long gap."""
+        gaps = np.diff(np.r_[self.last_ns, timestamps]) > max_gap_s * NS_PER_S
+        outside = spatial.haversine_m(self.anchor_lat, self.anchor_lon, lat, lon) > distance_m
+        stops = np.flatnonzero(gaps | outside)
+        return int(stops[0]) if len(stops) else len(timestamps)
+
+    def summarize(self, min_duration_s: float) -> pd.DataFrame:
+        """The run as a stay, or no rows if it is too short."""
+        is_stay = self.last_ns - self.start_ns >= min_duration_s * NS_PER_S
+        rows = 1 if is_stay else 0
+        return pd.DataFrame(
+            {
+                "start_time": pd.to_datetime(np.array([self.start_ns] * rows, dtype=np.int64), utc=True),
+                "end_time": pd.to_datetime(np.array([self.last_ns] * rows, dtype=np.int64), utc=True),
+                "lat": np.array([self.lat_sum / self.n_points] * rows),
+                "lon": np.array([self.lon_sum / self.n_points] * rows),
+                "n_points": np.array([self.n_points] * rows, dtype=np.int64),
+            }
+        )
+
+
+def iter_stays(
+    chunks: Iterable[pd.DataFrame],
+    distance_m: float = DEFAULT_DISTANCE_M,
+    min_duration_s: float = DEFAULT_MIN_DURATION_S,
+    max_gap_s: float = DEFAULT_MAX_GAP_S,
+) -> Iterator[pd.DataFrame]:
+    """
+    Detect stays chunk by chunk.
+
+    The last run of a chunk may continue in the next one. It is carried over as a running summary (anchor, time span,
+    coordinate sums), not as points: whether a point continues a run only depends on the anchor and the time of the
+    previous point. Memory and work per chunk therefore don't depend on how long a stay lasts. Chunks are expected in
+    time order, as Records.json is written; points are only sorted within a chunk.
+
+    Parameters:
+        chunks (Iterable[pd.DataFrame]): Raw (e.g. `records.iter_chunks`) or preprocessed Records.
+        distance_m (float): Radius around the first point of a stay that all its points lie within.
+        min_duration_s (float): Minimum time between the first and last point of a stay.
+        max_gap_s (float): Recording gaps longer than this end a stay.
+
+    Yields:
+        pd.DataFrame: The stays completed by each chunk, with columns `STAY_COLUMNS`.
+    """
+    open_run: Optional[OpenRun] = None
+    for chunk in chunks:
+        timestamps, lat, lon = point_arrays(chunk)
+        if not len(timestamps):
+            continue
+
+        if open_run is not None:
+            n_continued = open_run.continued_by(timestamps, lat, lon, distance_m, max_gap_s)
+            open_run = open_run.extend(timestamps[:n_continued], lat[:n_continued], lon[:n_continued])
+            if n_continued == len(timestamps):
+                continue
+            yield open_run.summarize(min_duration_s)
+            timestamps, lat, lon = timestamps[n_continued:], lat[n_continued:], lon[n_continued:]
+
+        run_starts = split_runs(timestamps, lat, lon, distance_m, max_gap_s)
+        last = run_starts[-1]
+        yield summarize_runs(timestamps[:last], lat[:last], lon[:last], run_starts[:-1], min_duration_s)
+        open_run = OpenRun(lat[last], lon[last], int(timestamps[last]), int(timestamps[last]), 0.0, 0.0, 0).extend(
+            timestamps[last:], lat[last:], lon[last:]
+        )
+
+    if open_run is not None:
+        yield open_run.summarize(min_duration_s)
+
+
+def connected_components(n: int, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Label the nodes of an undirected graph with the smallest node id of their component."""
+    labels = np.arange(n)
+    while True:
+        updated = labels.copy()
+        np.minimum.at(updated, a, labels[b])
+        np.minimum.at(updated, b, labels[a])
+        # Pointer jumping: follow labels to their own label, halving the remaining path every round
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def cluster_stays(
+    lat: np.ndarray, lon: np.ndarray, eps_m: float = DEFAULT_MERGE_DISTANCE_M, min_samples: int = DEFAULT_MIN_SAMPLES
+) -> np.ndarray:
+    """
+    Grid-based DBSCAN over stay centroids.
+
+    Stays are snapped to square cells with a diagonal of `eps_m`, so any two stays of a cell are neighbors. Cells with
+    at least `min_samples` stays are core cells, and neighboring core cells form a cluster. Other cells join the
+    cluster of a neighboring core cell, or are a cluster of their own: every stay stays a visit.
+
+    Returns:
+        np.ndarray: Cluster label of every stay.
+    """
+    if len(lat) == 0:
+        return np.array([], dtype=np.int64)
+
+    side_m = eps_m / np.sqrt(2)
+    dlat = side_m / spatial.METERS_PER_DEGREE_LAT
+    # Cells are narrowest in meters at the latitude closest to the equator, keep them within the side there
+    dlon = side_m / (spatial.METERS_PER_DEGREE_LAT * np.cos(np.radians(np.abs(lat).min())))
+    cells = pd.DataFrame({"cx": np.floor(lon / dlon).astype(np.int64), "cy": np.floor(lat / dlat).astype(np.int64)})
+    grouped = cells.groupby(["cx", "cy"], sort=False)
+    cell_ids = grouped.ngroup().to_numpy()
+    unique_cells = grouped.size().reset_index()[["cx", "cy"]].assign(cell=np.arange(grouped.ngroups))
+    is_core = np.bincount(cell_ids, minlength=len(unique_cells)) >= min_samples
+
+    pairs = []
+    for dx, dy in [(1, 0), (0, 1), (1, 1), (1, -1)]:
+        shifted = unique_cells.assign(cx=unique_cells["cx"] + dx, cy=unique_cells["cy"] + dy)
+        pairs.append(unique_cells.merge(shifted, on=["cx", "cy"])[["cell_x", "cell_y"]].to_numpy())
+    a, b = np.concatenate(pairs).T
+
+    core_edges = is_core[a] & is_core[b]
+    labels = connected_components(len(unique_cells), a[core_edges], b[core_edges])
+
+    # Border cells take the smallest label of their neighboring core cells
+    border = labels.copy()
+    for source, target in ((a, b), (b, a)):
+        attach = is_core[source] & ~is_core[target]
+        np.minimum.at(border, target[attach], labels[source[attach]])
+    return border[cell_ids]
+
+
+def to_places(stays: pd.DataFrame, labels: Optional[np.ndarray] = None) -> pd.DataFrame:
+    """
+    Turn stays into visits with the schema of `semantic.process_places`.
+
+    Stays with the same label share a place: its location is the mean of their centroids.
+    """
+    stays = stays.reset_index(drop=True)
+    labels = np.arange(len(stays)) if labels is None else labels
+    place_lat = stays["lat"].groupby(labels).transform("mean").to_numpy()
+    place_lon = stays["lon"].groupby(labels).transform("mean").to_numpy()
+
+    places = pd.DataFrame(
+        {
+            "name": pd.Series([None] * len(stays), dtype=object),
+            "address": pd.Series([None] * len(stays), dtype=object),
+            "lat": place_lat.astype("float64"),
+            "lon": place_lon.astype("float64"),
+            "place_id": [f"stay:{lat:.5f},{lon:.5f}" for lat, lon in zip(place_lat, place_lon)],
+            "confidence_visit": pd.array([pd.NA] * len(stays), dtype="Int64"),
+            "confidence_location": pd.array([pd.NA] * len(stays), dtype="Int64"),
+            "start_time": stays["start_time"],
+            "end_time": stays["end_time"],
+            "visit_type": STAY_VISIT_TYPE,
+            "visit_importance": pd.Series([None] * len(stays), dtype=object),
+        }
+    )
+    # As `semantic.split_addresses` fills them for visits without an address
+    for column in semantic.ADDRESS_COLUMNS:
+        places[column] = "missing"
+    return places[PLACE_COLUMNS]
+
+
+def detect_places(
+    chunks: Iterable[pd.DataFrame],
+    distance_m: float = DEFAULT_DISTANCE_M,
+    min_duration_s: float = DEFAULT_MIN_DURATION_S,
+    max_gap_s: float = DEFAULT_MAX_GAP_S,
+    merge_distance_m: Optional[float] = DEFAULT_MERGE_DISTANCE_M,
+    min_samples: int = DEFAULT_MIN_SAMPLES,
+) -> pd.DataFrame:
+    """
+    Detect the visits of a Records history.
+
+    Parameters:
+        chunks (Iterable[pd.DataFrame]): Raw or preprocessed Records, in time order.
+        distance_m (float): Radius around the first point of a stay that all its points lie within.
+        min_duration_s (float): Minimum duration of a stay.
+        max_gap_s (float): Recording gaps longer than this end a stay.
+        merge_distance_m (Optional[float]): Merge stays of different days closer than this into one place. None to
+            keep every stay a place of its own.
+        min_samples (int): Stays a location needs to anchor a merged place, as in DBSCAN.
+
+    Returns:
+        pd.DataFrame: One row per stay, with the columns of `semantic.process_places`.
+    """
+    stays = list(iter_stays(chunks, distance_m, min_duration_s, max_gap_s))
+    if not stays:
+        # No points at all, e.g. an empty `locations` array
+        no_points = np.array([], dtype=np.int64)
+        stays = [summarize_runs(no_points, no_points.astype("float64"), no_points.astype("float64"), no_points, 0)]
+    stays = pd.concat(stays, ignore_index=True)
+    labels = None
+    if merge_distance_m:
+        labels = cluster_stays(stays["lat"].to_numpy(), stays["lon"].to_numpy(), merge_distance_m, min_samples)
+    places = to_places(stays, labels)
+    LOG.info(f"Detected {len(places)} stays at {places['place_id'].nunique()} places.")
+    return places
+
+
+def main(
+    records_path: Path = records.DEFAULT_RECORDS_PATH,
+    places_output_path: Path = semantic.DEFAULT_PLACES_OUTPUT_PATH,
+    sql_db_path: Optional[Path] = semantic.SQL_DB_PATH,
+    chunk_size: int = records.DEFAULT_CHUNK_SIZE,
+) -> None:
+    """Build the places from Records.json, for histories without semantic location data."""
+    places = detect_places(records.iter_chunks(records_path, chunk_size))
+    semantic.write_to_df(places, places_output_path, storage.PLACES_TYPES)
+
+    if sql_db_path is not None:
+        LOG.info("Loading stay points into sqlite3 database...")
+        with sqlite3.connect(sql_db_path) as conn:
+            sqlite_loader.load(conn, {"places": places})
+            # Rollups and the spatial index cover activities too, which Records alone don't provide
+            sqlite_loader.create_table(conn, "activities")
+            spatial.refresh_spatial_index(conn, rebuild=True)
+            rollups.refresh_rollups(conn)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,242 @@
+"""Columnar Parquet storage for processed DataFrames.
+
+Tables are written with a typed schema, zstd compression and row-group statistics, sorted on their time column so
+readers can prune both columns and row groups when they only need part of the data.
+"""
+
+import logging
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_ROW_GROUP_SIZE = 128_000
+DEFAULT_COMPRESSION = "zstd"
+
+TIMESTAMP = pa.timestamp("ns", tz="UTC")
+
+PLACES_TYPES = {
+    "name": pa.string(),
+    "address": pa.string(),
+    "lat": pa.float64(),
+    "lon": pa.float64(),
+    "place_id": pa.string(),
+    "confidence_visit": pa.int64(),
+    "confidence_location": pa.int64(),
+    "start_time": TIMESTAMP,
+    "end_time": TIMESTAMP,
+    "visit_type": pa.string(),
+    "visit_importance": pa.string(),
+    "addr_name": pa.string(),
+    "street": pa.string(),
+    "city": pa.string(),
+    "state": pa.string(),
+    "country": pa.string(),
+    "source_file": pa.string(),
+}
+
+ACTIVITIES_TYPES = {
+    "startLocation_lat": pa.float64(),
+    "startLocation_lon": pa.float64(),
+    "endLocation_lat": pa.float64(),
+    "endLocation_lon": pa.float64(),
+    "start_time": TIMESTAMP,
+    "end_time": TIMESTAMP,
+    "distance": pa.int64(),
+    "activity_type": pa.string(),
+    "confidence": pa.int64(),
+    "source_file": pa.string(),
+}
+
+RECORDS_TYPES = {
+    "timestamp": TIMESTAMP,
+    "latitudeE7": pa.int64(),
+    "longitudeE7": pa.int64(),
+    "lat": pa.float64(),
+    "lon": pa.float64(),
+    "accuracy": pa.float64(),
+    "confidence": pa.float64(),
+}
+
+
+def build_schema(df: pd.DataFrame, types: Optional[Dict[str, pa.DataType]] = None) -> pa.Schema:
+    """Build a schema for the DataFrame's columns, using the declared types where known and inferring the rest."""
+    inferred = pa.Schema.from_pandas(df, preserve_index=False)
+    types = types or {}
+    return pa.schema([pa.field(f.name, types.get(f.name, f.type)) for f in inferred])
+
+
+def write_table(
+    df: pd.DataFrame,
+    output_file: Path,
+    types: Optional[Dict[str, pa.DataType]] = None,
+    sort_by: Optional[str] = None,
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    compression: str = DEFAULT_COMPRESSION,
+) -> None:
+    """
+    Write a DataFrame to a Parquet file.
+
+    Parameters:
+        df (pd.DataFrame): The DataFrame to write.
+        output_file (Path): The Parquet file to write.
+        types (Optional[Dict[str, pa.DataType]]): Declared column types, other columns are inferred.
+        sort_by (Optional[str]): Column to sort on before writing, so row-group statistics on it are selective.
+        row_group_size (int): Maximum number of rows per row group.
+        compression (str): Parquet compression codec.
+    """
+    if sort_by is not None and sort_by in df.columns:
+        df = df.sort_values(sort_by, kind="stable")
+    table = pa.Table.from_pandas(df, schema=build_schema(df, types), preserve_index=False)
+    pq.write_table(
+        table,
+        output_file,
+        row_group_size=row_group_size,
+        compression=compression,
+        write_statistics=True,
+    )
+
+
+class ChunkedTableWriter:
+    """
+    Write a Parquet file from DataFrames arriving in chunks, holding about one chunk and one row group in memory.
+
+    Chunks may differ in their columns and inferred types, like normalized Records do. Each chunk is first written to a
+    part file of its own; closing the writer unifies the part schemas, so later columns or wider types are kept, and
+    streams the parts into the output file. Columns stored as categories in any chunk stay dictionary encoded.
+    Chunks are written in the order they arrive, so they should already be sorted on the time column.
+    """
+
+    def __init__(
+        self,
+        output_file: Path,
+        types: Optional[Dict[str, pa.DataType]] = None,
+        row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+        compression: str = DEFAULT_COMPRESSION,
+    ):
+        """
+        Parameters:
+            output_file (Path): The Parquet file to write, replaced when the writer is closed.
+            types (Optional[Dict[str, pa.DataType]]): Declared column types, other columns are inferred.
+            row_group_size (int): Maximum number of rows per row group.
+            compression (str): Parquet compression codec.
+        """
+        self.output_file = Path(output_file)
+        self.types = types or {}
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.parts_path = self.output_file.with_name(self.output_file.name + ".parts")
+        shutil.rmtree(self.parts_path, ignore_errors=True)
+        self.parts_path.mkdir(parents=True)
+        self.parts: List[Path] = []
+        self.dictionary_columns: Set[str] = set()
+        self.n_rows = 0
+
+    def __enter__(self) -> "ChunkedTableWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            shutil.rmtree(self.parts_path, ignore_errors=True)
+
+    def write(self, df: pd.DataFrame) -> None:
+        """Write a chunk to a part file."""
+        if df.empty:
+            return
+        table = pa.Table.from_pandas(df, schema=build_schema(df, self.types), preserve_index=False)
+        # Categories of different chunks can't be unified, store their values and encode them again when closing
+        for i, field in enumerate(table.schema):
+            if pa.types.is_dictionary(field.type):
+                self.dictionary_columns.add(field.name)
+                table = table.set_column(i, field.name, table.column(i).cast(field.type.value_type))
+        part = self.parts_path / f"part-{len(self.parts):06d}.parquet"
+        pq.write_table(table.replace_schema_metadata(None), part)
+        self.parts.append(part)
+        self.n_rows += len(df)
+
+    def close(self) -> None:
+        """Stream the parts into the output file, under their unified schema."""
+        if self.parts:
+            schema = pa.unify_schemas([pq.read_schema(part) for part in self.parts], promote_options="permissive")
+        else:
+            schema = pa.schema(list(self.types.items()))
+        schema = pa.schema(
+            [
+                pa.field(f.name, pa.dictionary(pa.int32(), f.type)) if f.name in self.dictionary_columns else f
+                for f in schema
+            ]
+        )
+
+        tmp_file = self.output_file.with_name(self.output_file.name + ".tmp")
+        with pq.ParquetWriter(tmp_file, schema, compression=self.compression, write_statistics=True) as writer:
+            pending, pending_rows = [], 0
+            for part in self.parts:
+                table = pq.read_table(part)
+                columns = [
+                    _conform(table.column(f.name), f.type)
+                    if f.name in table.column_names
+                    else pa.nulls(len(table), f.type)
+                    for f in schema
+                ]
+                pending.append(pa.Table.from_arrays(columns, schema=schema))
+                pending_rows += len(table)
+                if pending_rows >= self.row_group_size:
+                    # Write whole row groups only, the rest starts the next one
+                    table = pa.concat_tables(pending)
+                    full_rows = pending_rows - pending_rows % self.row_group_size
+                    writer.write_table(table.slice(0, full_rows), row_group_size=self.row_group_size)
+                    pending, pending_rows = [table.slice(full_rows)], pending_rows - full_rows
+            if pending_rows:
+                writer.write_table(pa.concat_tables(pending), row_group_size=self.row_group_size)
+        tmp_file.replace(self.output_file)
+        shutil.rmtree(self.parts_path, ignore_errors=True)
+        LOG.info(f"Wrote {self.n_rows} rows in {len(self.parts)} chunks to {self.output_file}")
+
+
+def _conform(column: pa.ChunkedArray, type: pa.DataType) -> pa.ChunkedArray:
+    """Cast a column of a part to its unified type, encoding dictionaries explicitly, as not every type casts to one."""
+    if pa.types.is_dictionary(type):
+        return column.cast(type.value_type).dictionary_encode()
+    return column.cast(type)
+
+
+def read_table(
+    input_file: Path,
+    columns: Optional[List[str]] = None,
+    start: Optional[Union[str, pd.Timestamp]] = None,
+    end: Optional[Union[str, pd.Timestamp]] = None,
+    time_column: str = "start_time",
+) -> pd.DataFrame:
+    """
+    Read a Parquet file, loading only the requested columns and rows with `start <= time_column < end`.
+
+    Row groups whose statistics fall outside the time range are skipped without being decoded.
+    """
+    filters = []
+    if start is not None or end is not None:
+        tz = pq.read_schema(input_file).field(time_column).type.tz
+        if start is not None:
+            filters.append((time_column, ">=", _as_timestamp(start, tz)))
+        if end is not None:
+            filters.append((time_column, "<", _as_timestamp(end, tz)))
+
+    table = pq.read_table(input_file, columns=columns, filters=filters or None)
+    LOG.info(f"Read {table.num_rows} rows and {table.num_columns} columns from {input_file}")
+    return table.to_pandas()
+
+
+def _as_timestamp(value: Union[str, pd.Timestamp], tz: Optional[str]) -> pd.Timestamp:
+    """Coerce a time bound to the timezone of the column it is compared against."""
+    value = pd.Timestamp(value)
+    if tz is not None and value.tzinfo is None:
+        return value.tz_localize(tz)
+    if tz is None and value.tzinfo is not None:
+        return value.tz_convert(None)
+    return value
@@ -0,0 +1,206 @@
+"""Downsampling and trajectory compression for raw location Records.
+
+Raw Records hold a point every few seconds to minutes, most of them redundant: repeated fixes while standing still, or
+points on a straight line. The reduction keeps at most one point per time bucket, drops points that haven't left the
+previous point's grid cell, and simplifies each day's track with Douglas-Peucker. The endpoints of every day, of every
+stay (the points on both sides of a recording gap) and of every activity change are always kept.
+"""
+
+import logging
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+LOG = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6_371_000
+NS_PER_S = 1_000_000_000
+NS_PER_DAY = 86_400 * NS_PER_S
+
+DEFAULT_BUCKET_S = 60
+DEFAULT_MIN_DISTANCE_M = 25.0
+DEFAULT_TOLERANCE_M = 15.0
+# A recording gap this long means the phone stopped moving (or recording): both sides are stay endpoints
+DEFAULT_GAP_S = 10 * 60
+
+
+def project(lat: np.ndarray, lon: np.ndarray, lat0: Optional[float] = None) -> tuple:
+    """Equirectangular projection to meters around `lat0`, accurate at the scale of a day's track."""
+    lat0 = np.nanmean(lat) if lat0 is None else lat0
+    x = EARTH_RADIUS_M * np.radians(lon) * np.cos(np.radians(lat0))
+    y = EARTH_RADIUS_M * np.radians(lat)
+    return x, y
+
+
+def douglas_peucker(x: np.ndarray, y: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Simplify a polyline, keeping the points that deviate more than `tolerance` from the simplified line.
+
+    Parameters:
+        x (np.ndarray): Projected x coordinates, in meters.
+        y (np.ndarray): Projected y coordinates, in meters.
+        tolerance (float): Maximum distance in meters between a dropped point and the simplified line.
+
+    Returns:
+        np.ndarray: Boolean mask of the points to keep, always including the first and last.
+    """
+    n = len(x)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[[0, n - 1]] = True
+
+    # An explicit stack instead of recursion, days can have thousands of points
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        px, py = x[start + 1 : end] - x[start], y[start + 1 : end] - y[start]
+        length = np.hypot(dx, dy)
+        distances = np.hypot(px, py) if length == 0 else np.abs(dx * py - dy * px) / length
+        i = int(np.argmax(distances))
+        if distances[i] > tolerance:
+            split = start + 1 + i
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return keep
+
+
+def first_in_bucket(timestamps_ns: np.ndarray, bucket_s: float) -> np.ndarray:
+    """Mask of the first point of every time bucket, for time-sorted points."""
+    buckets = timestamps_ns // int(bucket_s * NS_PER_S)
+    return np.r_[True, buckets[1:] != buckets[:-1]]
+
+
+def leaves_cell(lat: np.ndarray, lon: np.ndarray, cell_m: float) -> np.ndarray:
+    """Mask of the points in a different grid cell (of `cell_m` meters) than the point before them."""
+    x, y = project(lat, lon, lat0=0.0)
+    # Scale x by latitude so cells are roughly square everywhere
+    x = x * np.cos(np.radians(lat))
+    cells_x = np.floor(x / cell_m).astype(np.int64)
+    cells_y = np.floor(y / cell_m).astype(np.int64)
+    return np.r_[True, (cells_x[1:] != cells_x[:-1]) | (cells_y[1:] != cells_y[:-1])]
+
+
+def reduce_records(
+    df: pd.DataFrame,
+    bucket_s: Optional[float] = DEFAULT_BUCKET_S,
+    min_distance_m: Optional[float] = DEFAULT_MIN_DISTANCE_M,
+    tolerance_m: Optional[float] = DEFAULT_TOLERANCE_M,
+    gap_s: float = DEFAULT_GAP_S,
+    previous_activity: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Reduce preprocessed Records to the points needed to redraw the trajectory.
+
+    Parameters:
+        df (pd.DataFrame): Records with `timestamp`, `latitudeE7`, `longitudeE7` and optionally `top_activity`.
+        bucket_s (Optional[float]): Keep at most one point per bucket of this many seconds. None to disable.
+        min_distance_m (Optional[float]): Drop points still in the previous point's grid cell of this size. None to
+            disable.
+        tolerance_m (Optional[float]): Douglas-Peucker tolerance applied to each day's track. None to disable.
+        gap_s (float): Points on both sides of a gap of at least this many seconds are kept.
+        previous_activity (Optional[str]): Last known activity before these points, when reducing a history in batches.
+
+    Returns:
+        pd.DataFrame: The kept points, sorted on timestamp, with added `lat` and `lon` columns in degrees.
+    """
+    n_points = len(df)
+    df = df.sort_values("timestamp", kind="stable").reset_index(drop=True)
+    if n_points == 0:
+        return df.assign(lat=pd.Series(dtype=float), lon=pd.Series(dtype=float))
+
+    timestamps_ns = pd.DatetimeIndex(df["timestamp"]).asi8
+    lat = df["latitudeE7"].to_numpy(dtype=float) / 1e7
+    lon = df["longitudeE7"].to_numpy(dtype=float) / 1e7
+    days = timestamps_ns // NS_PER_DAY
+    day_starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    day_ends = np.r_[day_starts[1:], n_points]
+
+    # Endpoints that are always kept: days, stays around recording gaps, and activity changes
+    anchors = np.zeros(n_points, dtype=bool)
+    anchors[day_starts] = True
+    anchors[day_ends - 1] = True
+    gaps = np.flatnonzero(np.diff(timestamps_ns) >= gap_s * NS_PER_S)
+    anchors[gaps] = True
+    anchors[gaps + 1] = True
+    if "top_activity" in df.columns:
+        activity = df["top_activity"].astype(object).ffill()
+        if previous_activity is not None:
+            activity = activity.fillna(previous_activity)
+        activity = activity.to_numpy()
+        changed = np.r_[False, activity[1:] != activity[:-1]] & pd.notna(activity)
+        anchors |= changed
+
+    keep = np.ones(n_points, dtype=bool)
+    if bucket_s:
+        keep &= first_in_bucket(timestamps_ns, bucket_s)
+    if min_distance_m:
+        keep &= leaves_cell(lat, lon, min_distance_m)
+    keep |= anchors
+
+    if tolerance_m:
+        simplified = np.zeros(n_points, dtype=bool)
+        for start, end in zip(day_starts, day_ends):
+            candidates = start + np.flatnonzero(keep[start:end])
+            x, y = project(lat[candidates], lon[candidates])
+            simplified[candidates[douglas_peucker(x, y, tolerance_m)]] = True
+        keep = simplified | anchors
+
+    reduced = df[keep].assign(lat=lat[keep], lon=lon[keep]).reset_index(drop=True)
+    LOG.info(
+        f"Reduced {n_points} points to {len(reduced)} ({n_points / max(len(reduced), 1):.1f}x compression) "
+        f"over {len(day_starts)} days."
+    )
+    return reduced
+
+
+def iter_reduce_records(
+    chunks: Iterable[pd.DataFrame],
+    bucket_s: Optional[float] = DEFAULT_BUCKET_S,
+    min_distance_m: Optional[float] = DEFAULT_MIN_DISTANCE_M,
+    tolerance_m: Optional[float] = DEFAULT_TOLERANCE_M,
+    gap_s: float = DEFAULT_GAP_S,
+) -> Iterator[pd.DataFrame]:
+    """
+    Reduce preprocessed Records arriving in chunks, holding at most a chunk and a day of points in memory.
+
+    Every reduction step works within a day, so each batch of complete days is reduced on its own, and the last,
+    possibly incomplete day is carried over to the next chunk. For points in time order, as Takeout writes them, the
+    batches concatenate to the result of `reduce_records` on the whole history. Points arriving after their day was
+    reduced are still kept, as a day of their own.
+
+    Parameters:
+        chunks (Iterable[pd.DataFrame]): Preprocessed Records, in time order.
+        The other parameters are those of `reduce_records`.
+
+    Returns:
+        Iterator[pd.DataFrame]: The kept points of each batch of complete days.
+    """
+    pending: Optional[pd.DataFrame] = None
+    previous_activity = None
+
+    def reduce(batch: pd.DataFrame) -> pd.DataFrame:
+        nonlocal previous_activity
+        reduced = reduce_records(batch, bucket_s, min_distance_m, tolerance_m, gap_s, previous_activity)
+        if "top_activity" in batch.columns:
+            activity = batch["top_activity"].astype(object).dropna()
+            previous_activity = activity.iloc[-1] if len(activity) else previous_activity
+        return reduced
+
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        batch = chunk if pending is None else pd.concat([pending, chunk], ignore_index=True)
+        days = pd.DatetimeIndex(batch["timestamp"]).asi8 // NS_PER_DAY
+        last_day = days == days.max()
+        pending = batch[last_day]
+        if not last_day.all():
+            yield reduce(batch[~last_day])
+
+    if pending is not None:
+        yield reduce(pending)
@@ -14,13 +14,24 @@ DO NOT make any DML statements (INSERT, UPDATE, DELETE, DROP etc.) to the databa
 
 Not everything is database, sql, travel related. You can also just respond to the user directly.
 
-The two tables you have are `places` and `activities`.
+The main tables you have are `places` and `activities`.
+Before querying them, check whether the pre-aggregated rollup tables already answer the question, they are much faster:
+- `place_rollups` (period, period_start, country, city, place_id, name, visits, duration_s): visit counts and time spent per country, city and place.
+- `activity_rollups` (period, period_start, activity_type, segments, distance_m, duration_s): segment counts, distance in meters and time spent per activity type.
+`period` is one of 'day', 'month' or 'year', and `period_start` is formatted 'YYYY-MM-DD', 'YYYY-MM' or 'YYYY' accordingly. For example, the countries visited in 2021 are the distinct `country` values of `place_rollups` where period = 'year' and period_start = '2021'.
+For questions about what is near a location, filter through the spatial index tables `places_rtree` and `activities_rtree` (columns `id`, `min_lat`, `max_lat`, `min_lon`, `max_lon`; `id` joins to the `id` of the indexed table) with a bounding box instead of scanning every lat/lon.
 When responding to human, don't include or respond with None or NULL values, such as asking about common activities.
 Do not tell the human anything about SQL, databases, or the tables in the database. Just respond to the user question directly.
 Please make use of the tools available to find an answer, do not be afraid to use them or unsure what to do.
 
 """
 
+SCHEMA_CONTEXT = """Here is the schema of the database, with value ranges, the most common values and a few sample rows. You already know the tables and their columns, so only look up the schema if something is missing from it:
+
+{schema_context}
+
+"""
+
 FUNCS_SUFFIX = """Ok let's think if I need to use tools or just respond to the user question directly."""
 
 
@@ -29,3 +40,10 @@ SUFFIX = """Begin!
 Question: {input}
 Thought: I should look at the tables in the database to see what I can query.  Then I should query the schema of the most relevant tables.
 {agent_scratchpad}"""
+
+
+SCHEMA_SUFFIX = """Begin!
+
+Question: {input}
+Thought: I already know the schema of the database, so I can write a query for the most relevant tables right away.
+{agent_scratchpad}"""
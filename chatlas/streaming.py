@@ -1,11 +1,104 @@
+import logging
+import time
+from typing import Any, Optional
+
 from langchain.callbacks.base import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+LOG = logging.getLogger(__name__)
+
+CURSOR = "▌"
 
 
 class StreamHandler(BaseCallbackHandler):
-    def __init__(self, container, initial_text=""):
+    """Stream the agent's final answer into a Streamlit container as tokens arrive.
+
+    Only answer tokens are shown: LLM calls that end in a function/tool call are discarded, and with
+    `final_answer_prefix` (zero-shot agents) only the text after the prefix is shown. Re-renders are throttled to at
+    most one per `min_interval_s`, so the cost of rendering no longer grows with every token.
+    """
+
+    def __init__(
+        self,
+        container,
+        initial_text: str = "",
+        min_interval_s: float = 0.1,
+        final_answer_prefix: Optional[str] = None,
+    ):
         self.container = container
         self.text = initial_text
+        self.min_interval_s = min_interval_s
+        self.final_answer_prefix = final_answer_prefix
+        self.started_at = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.renders = 0
+        self._run_text = ""
+        # When the current LLM call first showed answer text, only kept once the call turns out to be the answer
+        self._run_shown_at: Optional[float] = None
+        self._last_render = 0.0
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        """Seconds from creating the handler until the first answer token was rendered.
+
+        Tokens shown by an LLM call that ends in a tool call, and are taken back, don't count.
+        """
+        return None if self.first_token_at is None else self.first_token_at - self.started_at
+
+    @property
+    def visible_text(self) -> str:
+        """Text of the current LLM call that belongs to the answer."""
+        if self.final_answer_prefix is None:
+            return self._run_text
+        _, found, answer = self._run_text.partition(self.final_answer_prefix)
+        return answer.lstrip() if found else ""
+
+    def on_llm_start(self, serialized: Any, prompts: Any, **kwargs) -> None:
+        self._run_text = ""
+        self._run_shown_at = None
+
+    def on_chat_model_start(self, serialized: Any, messages: Any, **kwargs) -> None:
+        self._run_text = ""
+        self._run_shown_at = None
 
     def on_llm_new_token(self, token: str, **kwargs):
-        self.text += token
-        self.container.markdown(self.text)
+        if not token:
+            return
+        self._run_text += token
+        if not self.visible_text:
+            return
+        if time.perf_counter() - self._last_render >= self.min_interval_s:
+            self.render(cursor=True)
+
+    def on_llm_end(self, response: LLMResult, **kwargs) -> None:
+        if _is_tool_call(response):
+            # Not the answer after all, take back anything shown for this call
+            had_text = bool(self.visible_text)
+            self._run_text = ""
+            self._run_shown_at = None
+            if had_text:
+                self.render()
+            return
+        self.render()
+        self.text += self.visible_text
+        self._run_text = ""
+        if self.first_token_at is None and self._run_shown_at is not None:
+            self.first_token_at = self._run_shown_at
+            LOG.info(f"Time to first token: {self.time_to_first_token:.3f}s")
+
+    def render(self, cursor: bool = False) -> None:
+        self.container.markdown(self.text + self.visible_text + (CURSOR if cursor else ""))
+        self._last_render = time.perf_counter()
+        self.renders += 1
+        if self.visible_text and self._run_shown_at is None:
+            self._run_shown_at = self._last_render
+
+
+def _is_tool_call(response: LLMResult) -> bool:
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            kwargs = getattr(message, "additional_kwargs", {})
+            if "function_call" in kwargs or "tool_calls" in kwargs:
+                return True
+    return False
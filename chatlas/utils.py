@@ -1,6 +1,6 @@
 import logging
 import os
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, Iterable, List, Union
 
 import streamlit as st
 
@@ -20,6 +20,60 @@ def get_nested_value(data: Union[Dict[str, Any], List[Any]], keys: List[Union[st
     return data
 
 
+_MISSING = object()
+
+
+def _resolve_step(values: List[Any], key: Union[str, int], missing: Any) -> List[Any]:
+    """Resolve one key for a whole column of intermediate values."""
+    if isinstance(key, int):
+        if key < 0:
+            return [missing] * len(values)
+        return [v[key] if type(v) is list and key < len(v) else missing for v in values]
+    return [v.get(key, missing) if type(v) is dict else missing for v in values]
+
+
+class FieldExtractor:
+    """Extract a declared set of fields from many JSON-like objects straight into columnar lists.
+
+    The spec maps output column names to key paths. It is compiled once into a plan of steps where every key path
+    prefix is resolved a single time for the whole batch and shared between the columns that start with it, e.g.
+    `["location", "name"]` and `["location", "address"]` only look up "location" once per object.
+    Results are the same as calling `get_nested_value` for every object and column.
+    """
+
+    def __init__(self, spec: Dict[str, List[Union[str, int]]], default: Any = None):
+        self.spec = {column: tuple(keys) for column, keys in spec.items()}
+        self.columns = list(self.spec)
+        self.default = default
+
+        # Every distinct prefix becomes one step, ordered so that parents are resolved before children
+        self._steps = []
+        seen = set()
+        for keys in self.spec.values():
+            for i in range(1, len(keys) + 1):
+                if keys[:i] not in seen:
+                    seen.add(keys[:i])
+                    self._steps.append((keys[:i], keys[: i - 1], keys[i - 1]))
+
+    def extract(self, objs: Iterable[Any]) -> Dict[str, List[Any]]:
+        """Extract every field of every object, returning a dict of column name to list of values."""
+        resolved = {(): objs if isinstance(objs, list) else list(objs)}
+        # With a None default, None can double as the missing marker and the final substitution pass is skipped
+        missing = None if self.default is None else _MISSING
+        for prefix, parent, key in self._steps:
+            resolved[prefix] = _resolve_step(resolved[parent], key, missing)
+
+        columns = {column: resolved[keys] for column, keys in self.spec.items()}
+        if missing is _MISSING:
+            default = self.default
+            columns = {column: [default if v is _MISSING else v for v in values] for column, values in columns.items()}
+        return columns
+
+    def empty(self) -> Dict[str, List[Any]]:
+        """Columns without any rows."""
+        return {column: [] for column in self.columns}
+
+
 # decorator
 def enable_chat_history(func):
     if os.environ.get("OPENAI_API_KEY"):
@@ -0,0 +1,13 @@
+import pytest
+
+from tests.helpers import write_month
+
+
+@pytest.fixture
+def semantic_dir(tmp_path):
+    """A small synthetic semantic location history: two years of two months each."""
+    semantic_dir = tmp_path / "semantic"
+    for year in (2022, 2023):
+        for month in (1, 2):
+            write_month(semantic_dir, year, month)
+    return semantic_dir
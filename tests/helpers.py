@@ -0,0 +1,55 @@
+"""Builders of synthetic Google Takeout data shared by the tests."""
+
+import json
+
+
+def make_place_visit(i: int, year: int, month: int) -> dict:
+    day = i % 28 + 1
+    return {
+        "placeVisit": {
+            "location": {
+                "latitudeE7": 377_749_000 + i * 1_000,
+                "longitudeE7": -1_224_194_000 - i * 1_000,
+                "placeId": f"place_{i % 4}",
+                "address": f"Cafe {i}, {i} Market St, San Francisco, CA 94103, USA",
+                "name": f"Cafe {i % 4}",
+                "locationConfidence": 90.4,
+            },
+            "duration": {
+                "startTimestamp": f"{year}-{month:02d}-{day:02d}T10:00:00.000Z",
+                "endTimestamp": f"{year}-{month:02d}-{day:02d}T11:30:00Z",
+            },
+            "placeConfidence": "HIGH_CONFIDENCE",
+            "visitConfidence": 95.2,
+            "placeVisitType": "SINGLE_PLACE",
+            "placeVisitImportance": "MAIN",
+        }
+    }
+
+
+def make_activity_segment(i: int, year: int, month: int) -> dict:
+    day = i % 28 + 1
+    return {
+        "activitySegment": {
+            "startLocation": {"latitudeE7": 377_749_000 + i * 1_000, "longitudeE7": -1_224_194_000},
+            "endLocation": {"latitudeE7": 377_849_000, "longitudeE7": -1_224_294_000 - i * 1_000},
+            "duration": {
+                "startTimestamp": f"{year}-{month:02d}-{day:02d}T12:00:00.000Z",
+                "endTimestamp": f"{year}-{month:02d}-{day:02d}T12:20:00.000Z",
+            },
+            "distance": 1500 + i,
+            "activityType": "WALKING" if i % 2 else "IN_PASSENGER_VEHICLE",
+            "confidence": "HIGH",
+            "activities": [{"activityType": "WALKING", "probability": 87.6}],
+        }
+    }
+
+
+def write_month(semantic_dir, year: int, month: int, n: int = 6) -> None:
+    timeline = []
+    for i in range(n):
+        timeline.append(make_place_visit(i, year, month))
+        timeline.append(make_activity_segment(i, year, month))
+    year_dir = semantic_dir / str(year)
+    year_dir.mkdir(parents=True, exist_ok=True)
+    (year_dir / f"{year}_{month:02d}.json").write_text(json.dumps({"timelineObjects": timeline}))
@@ -0,0 +1,68 @@
+import time
+
+from chatlas.agent.answer_cache import AnswerCache, is_cacheable, normalize_question, similarity
+
+
+def test_normalize_question():
+    assert normalize_question("  How many countries did I visit in 2021?! ") == "how many countries did i visit in 2021"
+
+
+def test_is_cacheable():
+    assert is_cacheable("How many countries did I visit in 2021?")
+    assert is_cacheable("Where was I on March 3, 2022?")
+    # Follow-ups depend on the conversation
+    assert not is_cacheable("And the year before?", previous_turns=1)
+    assert not is_cacheable("How many countries did I visit in 2021?", previous_turns=2)
+    # Relative dates depend on the day
+    for question in [
+        "Where was I last week?",
+        "How far did I walk this month?",
+        "Where have I been in the past 3 days",
+        "What did I do yesterday?",
+        "Where was I two years ago?",
+        "Where did I go last Saturday?",
+    ]:
+        assert not is_cacheable(question), question
+
+
+def test_similarity():
+    a = normalize_question("How many countries did I visit in 2021?")
+    assert similarity(a, normalize_question("how many countries have I visited in 2021")) > 0.6
+    assert similarity(a, normalize_question("How many countries did I visit in 2022?")) == 0.0
+
+
+def test_answer_cache_exact_and_scoped(tmp_path):
+    cache = AnswerCache(tmp_path / "answers.db")
+    cache.put("How many countries did I visit in 2021?", "v1", "gpt-4", "Three!")
+    assert cache.get("how many countries did i visit in 2021", "v1", "gpt-4") == "Three!"
+    assert cache.get("How many countries did I visit in 2021?", "v2", "gpt-4") is None
+    assert cache.get("How many countries did I visit in 2021?", "v1", "gpt-3.5") is None
+    assert cache.get("How many cities did I visit in 2021?", "v1", "gpt-4") is None
+
+    # Persisted across instances
+    assert AnswerCache(tmp_path / "answers.db").get("How many countries did I visit in 2021", "v1", "gpt-4") == "Three!"
+
+
+def test_answer_cache_near_duplicates(tmp_path):
+    cache = AnswerCache(tmp_path / "answers.db", similarity_threshold=0.7)
+    cache.put("What was the most visited place in 2023?", "v1", "gpt-4", "The cafe.")
+    assert cache.get("what was my most visited place in 2023", "v1", "gpt-4") == "The cafe."
+    assert cache.get("What was the most visited place in 2022?", "v1", "gpt-4") is None
+
+
+def test_answer_cache_ttl_and_lru(tmp_path):
+    cache = AnswerCache(tmp_path / "answers.db", ttl_s=None, max_entries=2)
+    cache.put("a", "v1", "m", "A")
+    time.sleep(0.01)
+    cache.put("b", "v1", "m", "B")
+    time.sleep(0.01)
+    assert cache.get("a", "v1", "m") == "A"
+    time.sleep(0.01)
+    cache.put("c", "v1", "m", "C")
+    assert cache.get("b", "v1", "m") is None
+    assert cache.get("a", "v1", "m") == "A"
+
+    expiring = AnswerCache(tmp_path / "expiring.db", ttl_s=0)
+    expiring.put("a", "v1", "m", "A")
+    time.sleep(0.01)
+    assert expiring.get("a", "v1", "m") is None
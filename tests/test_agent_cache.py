@@ -0,0 +1,67 @@
+import sqlite3
+
+from langchain_community.agent_toolkits import SQLDatabaseToolkit
+from langchain_community.llms.fake import FakeListLLM
+
+from chatlas.agent.cache import QueryCache, normalize_sql
+from chatlas.agent.database import connect_database
+from chatlas.agent.tools import CachedQuerySQLDataBaseTool, build_sql_tools
+
+
+def test_normalize_sql():
+    assert normalize_sql("SELECT  name\n FROM places WHERE city = 'San  Francisco';") == (
+        "select name from places where city = 'San  Francisco'"
+    )
+    assert normalize_sql("select name from places where city = 'San  Francisco'") == (
+        "select name from places where city = 'San  Francisco'"
+    )
+    assert normalize_sql("SELECT \"Name\" FROM t WHERE a = 'it''s  X'") == "select \"Name\" from t where a = 'it''s  X'"
+
+
+def test_query_cache_lru_and_size_eviction():
+    cache = QueryCache(max_entries=2, max_bytes=10_000)
+    calls = []
+
+    def compute(value):
+        return lambda: calls.append(value) or value
+
+    cache.get_or_compute(None, "a", compute("a"))
+    cache.get_or_compute(None, "b", compute("b"))
+    cache.get_or_compute(None, "a", compute("a"))
+    cache.get_or_compute(None, "c", compute("c"))  # evicts "b", the least recently used
+    cache.get_or_compute(None, "a", compute("a"))
+    cache.get_or_compute(None, "b", compute("b"))
+    assert calls == ["a", "b", "c", "b"]
+    assert cache.hits == 2
+
+    cache.get_or_compute(None, "big", compute("x" * 20_000))
+    assert len(cache) == 2
+    assert cache.size_bytes <= 10_000
+
+    cache.get_or_compute(None, "error", compute("Error: locked"), cacheable=lambda r: not r.startswith("Error"))
+    cache.get_or_compute(None, "error", compute("Error: locked"), cacheable=lambda r: not r.startswith("Error"))
+    assert calls.count("Error: locked") == 2
+
+
+def test_cached_sql_tools_invalidate_on_write(tmp_path):
+    db_path = tmp_path / "chatlas.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE places (name TEXT)")
+        conn.execute("INSERT INTO places VALUES ('Cafe')")
+
+    cache = QueryCache()
+    toolkit = SQLDatabaseToolkit(db=connect_database(f"sqlite:///{db_path}"), llm=FakeListLLM(responses=[]))
+    tools = {tool.name: tool for tool in build_sql_tools(toolkit, cache=cache)}
+    query_tool = tools["sql_db_query"]
+    assert isinstance(query_tool, CachedQuerySQLDataBaseTool)
+
+    assert query_tool.run("SELECT COUNT(*) AS n FROM places") == "n\n1\n[1 rows]"
+    assert query_tool.run("select count(*) as n  from places;") == "n\n1\n[1 rows]"
+    assert "CREATE TABLE places" in tools["sql_db_schema"].run("places")
+    assert tools["sql_db_list_tables"].run("") == "places"
+    assert (cache.hits, cache.misses) == (1, 3)
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO places VALUES ('Diner')")
+    assert query_tool.run("SELECT COUNT(*) AS n FROM places") == "n\n2\n[1 rows]"
+    assert cache.misses == 4
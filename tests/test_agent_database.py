@@ -0,0 +1,70 @@
+import asyncio
+import sqlite3
+
+import pytest
+from langchain_community.chat_models.fake import FakeListChatModel
+from sqlalchemy import URL
+from sqlalchemy.exc import OperationalError
+
+from chatlas.agent.chatlas_sql import ainvoke, create_chatlas
+from chatlas.agent.database import dispose_shared_databases, get_shared_database, sqlite_path
+
+
+@pytest.fixture
+def db_uri(tmp_path):
+    db_path = tmp_path / "chatlas.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE places (name TEXT)")
+        conn.execute("INSERT INTO places VALUES ('Cafe')")
+    yield f"sqlite:///{db_path}"
+    dispose_shared_databases()
+
+
+def test_shared_database_is_pooled_and_read_only(db_uri):
+    db = get_shared_database(db_uri)
+    assert get_shared_database(db_uri) is db
+    assert sqlite_path(db) == db_uri[len("sqlite:///") :]
+    assert db.run("SELECT name FROM places") == "[('Cafe',)]"
+    with pytest.raises(OperationalError):
+        db.run("INSERT INTO places VALUES ('Diner')")
+
+
+def test_shared_database_sees_new_tables(db_uri):
+    db = get_shared_database(db_uri)
+    with sqlite3.connect(sqlite_path(db)) as conn:
+        conn.execute("CREATE TABLE points (lat REAL)")
+
+    refreshed = get_shared_database(db_uri)
+    assert "points" not in db.get_usable_table_names()
+    assert refreshed.get_usable_table_names() == ["places", "points"]
+    # Same pool, only the table list changed
+    assert refreshed._engine is db._engine
+
+
+def test_shared_database_escapes_path(tmp_path):
+    db_path = tmp_path / "my data #1?%20" / "chatlas.db"
+    db_path.parent.mkdir()
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE places (name TEXT)")
+        conn.execute("INSERT INTO places VALUES ('Cafe')")
+
+    try:
+        db = get_shared_database(URL.create("sqlite", database=str(db_path)).render_as_string())
+        assert sqlite_path(db) == str(db_path)
+        assert db.run("SELECT name FROM places") == "[('Cafe',)]"
+        with pytest.raises(OperationalError):
+            db.run("INSERT INTO places VALUES ('Diner')")
+    finally:
+        dispose_shared_databases()
+
+
+def test_concurrent_ainvoke(db_uri):
+    async def ask(i):
+        llm = FakeListChatModel(responses=[f"answer {i}"])
+        agent = create_chatlas(llm=llm, db=db_uri, functions=True, shared_pool=True)
+        return await ainvoke(agent, f"question {i}")
+
+    async def main():
+        return await asyncio.gather(*(ask(i) for i in range(20)))
+
+    assert asyncio.run(main()) == [f"answer {i}" for i in range(20)]
@@ -0,0 +1,62 @@
+import json
+import sqlite3
+
+from langchain_community.chat_models.fake import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage, FunctionMessage, HumanMessage, ToolMessage
+
+from chatlas.agent.graph import create_graph_agent
+
+
+def tool_call(call_id, name, **arguments):
+    return {"id": call_id, "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+
+def make_db(tmp_path):
+    db_path = tmp_path / "chatlas.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE places (name TEXT)")
+        conn.execute("CREATE TABLE activities (activity_type TEXT)")
+        conn.execute("INSERT INTO places VALUES ('Cafe')")
+    return f"sqlite:///{db_path}"
+
+
+def test_parallel_tool_calls(tmp_path):
+    responses = [
+        AIMessage(
+            content="",
+            additional_kwargs={
+                "tool_calls": [
+                    tool_call("a", "sql_db_schema", table_names="places"),
+                    tool_call("b", "sql_db_schema", table_names="activities"),
+                    tool_call("c", "sql_db_query", query="SELECT name FROM places"),
+                ]
+            },
+        ),
+        AIMessage(content="You went to Cafe."),
+    ]
+    agent = create_graph_agent(FakeMessagesListChatModel(responses=responses), make_db(tmp_path))
+    messages = agent.invoke({"messages": [HumanMessage(content="Where did I go?")]})["messages"]
+
+    # Every message appears once: question, tool calls, one result per call and the answer
+    assert len(messages) == 6
+    results = messages[2:5]
+    assert all(isinstance(message, ToolMessage) for message in results)
+    assert [message.tool_call_id for message in results] == ["a", "b", "c"]
+    assert "CREATE TABLE places" in results[0].content
+    assert "CREATE TABLE activities" in results[1].content
+    assert results[2].content == "name\nCafe\n[1 rows]"
+    assert messages[-1].content == "You went to Cafe."
+
+
+def test_legacy_function_call(tmp_path):
+    function_call = tool_call(None, "sql_db_query", query="SELECT COUNT(*) AS n FROM places")["function"]
+    responses = [
+        AIMessage(content="", additional_kwargs={"function_call": function_call}),
+        AIMessage(content="One place."),
+    ]
+    agent = create_graph_agent(FakeMessagesListChatModel(responses=responses), make_db(tmp_path))
+    messages = agent.invoke({"messages": [HumanMessage(content="How many places?")]})["messages"]
+
+    assert isinstance(messages[2], FunctionMessage)
+    assert messages[2].content == "n\n1\n[1 rows]"
+    assert messages[-1].content == "One place."
@@ -0,0 +1,99 @@
+import sqlite3
+
+from langchain_community.chat_models.fake import FakeListChatModel
+from langchain_core.agents import AgentAction
+from langchain_core.messages import AIMessage, FunctionMessage, HumanMessage, SystemMessage, ToolMessage
+
+from chatlas.agent.chatlas_sql import create_chatlas
+from chatlas.agent.memory import trim_messages, truncate_steps, truncate_text
+
+
+class WordCountChatModel(FakeListChatModel):
+    """Fake chat model counting one token per word, so no tokenizer is needed."""
+
+    def get_num_tokens(self, text: str) -> int:
+        return len(text.split())
+
+    def get_num_tokens_from_messages(self, messages) -> int:
+        return sum(self.get_num_tokens(message.content) for message in messages)
+
+
+def count_tokens(messages):
+    return sum(len(message.content.split()) for message in messages)
+
+
+def test_truncate_text():
+    assert truncate_text("short", max_chars=10) == "short"
+    truncated = truncate_text("x" * 100, max_chars=10)
+    assert truncated.startswith("x" * 10 + "\n")
+    assert "truncated 90 of 100 characters" in truncated
+
+    action = AgentAction(tool="sql_db_query", tool_input="SELECT 1", log="")
+    assert truncate_steps([(action, "y" * 50)], max_chars=5)[0][1].startswith("yyyyy\n")
+
+
+def test_trim_messages_keeps_system_and_latest():
+    messages = [
+        SystemMessage(content="system prompt"),
+        HumanMessage(content="one two three"),
+        AIMessage(content="", additional_kwargs={"function_call": {"name": "q", "arguments": "{}"}}),
+        FunctionMessage(content="a b c d e f", name="q"),
+        AIMessage(content="answer words"),
+        HumanMessage(content="latest question"),
+    ]
+    trimmed = trim_messages(messages, max_tokens=8, count_tokens=count_tokens)
+    assert trimmed == [messages[0], messages[4], messages[5]]
+    # Nothing but the system prompt and the latest message fits: keep them anyway
+    assert trim_messages(messages, max_tokens=1, count_tokens=count_tokens) == [messages[0], messages[5]]
+
+
+def test_trim_messages_keeps_current_turn():
+    def tool_call(call_id):
+        return {"id": call_id, "type": "function", "function": {"name": "q", "arguments": "{}"}}
+
+    messages = [
+        SystemMessage(content="system prompt"),
+        HumanMessage(content="older question"),
+        AIMessage(content="older answer"),
+        HumanMessage(content="current question"),
+        AIMessage(content="", additional_kwargs={"tool_calls": [tool_call("a"), tool_call("b")]}),
+        ToolMessage(content="row " * 500, tool_call_id="a"),
+        ToolMessage(content="row " * 500, tool_call_id="b"),
+        AIMessage(content="", additional_kwargs={"tool_calls": [tool_call("c")]}),
+        ToolMessage(content="row " * 100, tool_call_id="c"),
+    ]
+    # The tool outputs of the current turn alone are far over budget
+    trimmed = trim_messages(messages, max_tokens=300, count_tokens=count_tokens)
+
+    assert trimmed[:2] == [messages[0], messages[3]]
+    assert [type(message) for message in trimmed[2:]] == [type(message) for message in messages[4:]]
+    assert [message.tool_call_id for message in trimmed if isinstance(message, ToolMessage)] == ["a", "b", "c"]
+    assert count_tokens(trimmed) <= 300
+    # Oldest outputs are cut first, the latest one survives if the rest is enough
+    assert "truncated" in trimmed[3].content and "truncated" in trimmed[4].content
+    assert trimmed[6] == messages[8]
+
+    # Within budget, older history is dropped before anything of the current turn
+    fits = trim_messages(messages[:5] + [ToolMessage(content="ok", tool_call_id="a")], 6, count_tokens)
+    assert fits == [messages[0], messages[3], messages[4], ToolMessage(content="ok", tool_call_id="a")]
+
+
+def test_history_stays_bounded(tmp_path):
+    db_path = tmp_path / "chatlas.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE places (name TEXT)")
+
+    # The fake model gives the same reply when answering and when summarizing older turns
+    answer = "answer " + "word " * 20
+    llm = WordCountChatModel(responses=[answer])
+    agent = create_chatlas(llm=llm, db=f"sqlite:///{db_path}", functions=True, max_history_tokens=60)
+
+    history_sizes = []
+    for i in range(30):
+        agent.invoke({"input": f"question {i}"})
+        history = agent.memory.load_memory_variables({})["chat_history"]
+        history_sizes.append(count_tokens(history))
+
+    assert history_sizes[0] < history_sizes[1]
+    assert max(history_sizes) <= 60 + count_tokens([AIMessage(content=answer)])
+    assert len(set(history_sizes[5:])) == 1
@@ -0,0 +1,93 @@
+import sqlite3
+from contextlib import closing
+
+import pytest
+from langchain_community.chat_models.fake import FakeListChatModel
+from langchain_core.messages import HumanMessage
+
+from chatlas.agent.chatlas_sql import create_chatlas
+from chatlas.agent.router import RoutedAgent, answer, match_intent
+from chatlas.data_prep import rollups
+from chatlas.data_prep.semantic import main
+
+
+@pytest.fixture
+def db_path(semantic_dir, tmp_path):
+    db_path = tmp_path / "chatlas.db"
+    main(write_df=False, write_sql=True, sql_db_path=db_path, semantic_path=semantic_dir)
+    return db_path
+
+
+@pytest.mark.parametrize(
+    "question, intent",
+    [
+        ("How many countries did I visit in 2021?", "countries_in_year"),
+        ("which countries have I traveled to in 2019", "countries_in_year"),
+        ("Where was I on January 5, 2023?", "places_on_date"),
+        ("What are my top 3 most visited places?", "most_visited_places"),
+        ("most visited places in 2022", "most_visited_places"),
+        ("How far did I walk in 2022?", "distance_in_year"),
+        ("How many km have I cycled in 2020", "distance_in_year"),
+        ("Total distance walked in 2022", "distance_in_year"),
+        ("What's a fun fact about my travels?", None),
+    ],
+)
+def test_match_intent(question, intent):
+    match = match_intent(question)
+    assert (match[0] if match else None) == intent
+
+
+def test_answers(db_path):
+    assert answer(db_path, "How many countries did I visit in 2023?") == "You visited 1 country in 2023: USA."
+    assert answer(db_path, "How many countries did I visit in 2021?") == "I couldn't find any visits in 2021."
+    assert "Cafe 1" in answer(db_path, "Where was I on 2023-01-02?")
+    # Without a year the question is left to the agent
+    assert answer(db_path, "Where was I on January 2?") is None
+
+    top = answer(db_path, "top 2 most visited places").split("\n")
+    assert len(top) == 3
+    assert all(line.endswith(": 8 visits") for line in top[1:])
+
+    assert answer(db_path, "How far did I walk in 2022?") == "You covered 9.0 km (5.6 miles) walking in 2022."
+
+
+def test_answers_skip_missing_and_overlap_days(db_path):
+    """Missing address placeholders aren't places, and visits count on every day they overlap."""
+    with closing(sqlite3.connect(db_path)) as conn, conn:
+        conn.executemany(
+            "INSERT INTO places (name, place_id, city, country, start_time, end_time) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                ("Hotel", "hotel", "missing", "missing", "2023-03-01 22:00:00", "2023-03-03 09:00:00"),
+                ("Hut", "hut", "Zermatt", "Switzerland", "2023-03-04 10:00:00", "2023-03-04 11:00:00"),
+            ],
+        )
+        rollups.refresh_rollups(conn)
+
+    assert answer(db_path, "How many countries did I visit in 2023?") == (
+        "You visited 2 countries in 2023: Switzerland and USA."
+    )
+    assert answer(db_path, "Where was I on 2023-03-02?") == "On March 2, 2023 you were at Hotel."
+    assert "Hotel" in answer(db_path, "Where was I on 2023-03-03?")
+    assert answer(db_path, "Where was I on 2023-03-04?") == "On March 4, 2023 you were at Hut (Zermatt, Switzerland)."
+
+    top = answer(db_path, "top 40 most visited places in 2023").split("\n")
+    assert any(line.endswith("Hotel: 1 visit") for line in top)
+    assert not any("missing" in line for line in top)
+
+
+def test_routed_agent_falls_back(db_path):
+    llm = FakeListChatModel(responses=["from the agent"])
+    agent = RoutedAgent(create_chatlas(llm=llm, db=f"sqlite:///{db_path}", functions=True), db_path)
+
+    routed = agent.invoke({"input": "How many countries did I visit in 2023?"})
+    assert routed["output"] == "You visited 1 country in 2023: USA."
+    assert agent.invoke({"input": "Tell me something fun"})["output"] == "from the agent"
+    # The routed turn is part of the conversation memory
+    history = agent.memory.load_memory_variables({})["chat_history"]
+    assert [message.content for message in history][:2] == [
+        "How many countries did I visit in 2023?",
+        "You visited 1 country in 2023: USA.",
+    ]
+
+    graph_state = RoutedAgent(None, db_path).invoke({"messages": [HumanMessage(content="most visited places")]})
+    assert graph_state["messages"][-1].content.startswith("Your most visited places:")
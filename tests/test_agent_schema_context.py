@@ -0,0 +1,49 @@
+import sqlite3
+
+from langchain_community.llms.fake import FakeListLLM
+
+from chatlas.agent import schema_context
+from chatlas.agent.chatlas_sql import create_chatlas
+from chatlas.data_prep.semantic import main
+
+
+def load_db(semantic_dir, tmp_path):
+    db_path = tmp_path / "chatlas.db"
+    main(write_df=False, write_sql=True, sql_db_path=db_path, semantic_path=semantic_dir)
+    return db_path
+
+
+def test_build_schema_context(semantic_dir, tmp_path):
+    context = schema_context.build_schema_context(load_db(semantic_dir, tmp_path))
+    assert "Table `places` (24 rows):" in context
+    assert "- city TEXT, top values: San Francisco (24)" in context
+    assert "- start_time TEXT, range 2022-01-01 10:00:00 to 2023-02-06 10:00:00" in context
+    assert "top values: IN_PASSENGER_VEHICLE (12), WALKING (12)" in context
+    assert "Sample rows:" in context
+    assert "Table `place_rollups`: period TEXT" in context
+    assert "source_file" not in context
+
+
+def test_load_schema_context_is_cached_per_version(semantic_dir, tmp_path, monkeypatch):
+    db_path = load_db(semantic_dir, tmp_path)
+    context = schema_context.load_schema_context(db_path)
+    assert schema_context.context_cache_path(db_path).exists()
+
+    builds = []
+    build = schema_context.build_schema_context
+    monkeypatch.setattr(schema_context, "build_schema_context", lambda path: builds.append(path) or build(path))
+    assert schema_context.load_schema_context(db_path) == context
+    assert builds == []
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("DELETE FROM places WHERE id > 12")
+    assert "Table `places` (12 rows):" in schema_context.load_schema_context(db_path)
+    assert builds == [db_path]
+
+
+def test_create_chatlas_with_schema_context(semantic_dir, tmp_path):
+    db_path = load_db(semantic_dir, tmp_path)
+    agent = create_chatlas(llm=FakeListLLM(responses=[]), db=f"sqlite:///{db_path}", precompute_schema=True)
+    template = agent.agent.llm_chain.prompt.template
+    assert "Table `places` (24 rows):" in template
+    assert "I already know the schema" in template
@@ -0,0 +1,105 @@
+import sqlite3
+
+import pandas as pd
+from langchain_community.llms.fake import FakeListLLM
+from langchain_community.utilities import SQLDatabase
+from langchain_core.callbacks import BaseCallbackHandler
+
+from chatlas.agent.chatlas_sql import create_chatlas
+from chatlas.agent.tool_output import encode_table, guard_output, run_query
+from chatlas.agent.tools import PointsInRangeTool
+from chatlas.data_prep.point_store import write_point_store
+
+
+def test_encode_table_caps_rows_and_chars():
+    rows = [(i, f"place\t{i}") for i in range(100)]
+    encoded = encode_table(["id", "name"], rows, total_rows=100, max_rows=3)
+    assert encoded.split("\n") == [
+        "id\tname",
+        "0\tplace 0",
+        "1\tplace 1",
+        "2\tplace 2",
+        "[showing 3 of 100 rows; use filters, aggregates or LIMIT to narrow the result down]",
+    ]
+
+    encoded = encode_table(["id", "name"], rows, total_rows=100, max_rows=100, max_chars=50)
+    assert len(encoded.split("\n")[-1]) < 100
+    assert sum(len(line) + 1 for line in encoded.split("\n")[:-1]) <= 50
+
+
+def test_guard_output():
+    df = pd.DataFrame({"city": ["Paris", "Rome"], "visits": [3, 1]})
+    assert guard_output(df) == "city\tvisits\nParis\t3\nRome\t1\n[2 rows]"
+    assert guard_output(df.set_index("city")["visits"]) == "city\tvisits\nParis\t3\nRome\t1\n[2 rows]"
+    assert guard_output("x" * 10, max_chars=5).startswith("xxxxx\n... [truncated")
+
+
+def test_run_query(tmp_path):
+    db_path = tmp_path / "chatlas.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE places (name TEXT)")
+        conn.executemany("INSERT INTO places VALUES (?)", [(f"place {i}",) for i in range(1_000)])
+    db = SQLDatabase.from_uri(f"sqlite:///{db_path}")
+
+    encoded = run_query(db, "SELECT name FROM places", max_rows=2)
+    assert encoded.startswith("name\nplace 0\nplace 1\n[showing 2 of more than 2 rows;")
+    # Exactly `max_rows` rows aren't cut
+    assert run_query(db, "SELECT name FROM places LIMIT 2", max_rows=2) == "name\nplace 0\nplace 1\n[2 rows]"
+    assert run_query(db, "SELECT name FROM places WHERE 0") == "name\n[0 rows]"
+    assert run_query(db, "SELECT nope FROM places").startswith("Error:")
+
+
+def test_points_in_range_tool(tmp_path):
+    timestamps = pd.date_range("2023-01-01", periods=24 * 60, freq="min", tz="UTC")
+    points = pd.DataFrame({"timestamp": timestamps, "lat": 46.0, "lon": 7.0, "accuracy": 10.0})
+    write_point_store(points, tmp_path / "points")
+    tool = PointsInRangeTool(store_path=tmp_path / "points", max_rows=2)
+
+    encoded = tool.run("2023-01-01 10:00, 2023-01-01 11:00")
+    assert encoded.split("\n") == [
+        "timestamp\tlat\tlon\taccuracy",
+        "2023-01-01 10:00:00+00:00\t46.0\t7.0\t10.0",
+        "2023-01-01 10:01:00+00:00\t46.0\t7.0\t10.0",
+        "[showing 2 of 60 rows; use filters, aggregates or LIMIT to narrow the result down]",
+    ]
+    assert tool.run("'2024-01-01', '2024-01-02'") == "timestamp\tlat\tlon\taccuracy\n[0 rows]"
+    assert tool.run("someday, 2024-01-02").startswith("Error:")
+    assert tool.run("2024-01-01").startswith("Error: expected a start and an end time")
+    assert tool.run({"time_range": "2024-01-01, 2024-01-02"}).endswith("[0 rows]")
+    assert PointsInRangeTool(store_path=tmp_path / "missing").run("2023, 2024").startswith("Error:")
+
+
+def test_points_in_range_zero_shot(tmp_path):
+    """Zero-shot agents pass a single Action Input string, the tool parses it into a time range."""
+
+    class ToolOutputs(BaseCallbackHandler):
+        def __init__(self):
+            self.outputs = []
+
+        def on_tool_end(self, output, **kwargs):
+            self.outputs.append(output)
+
+    db_path = tmp_path / "chatlas.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE places (name TEXT)")
+    timestamps = pd.date_range("2023-01-01", periods=24 * 60, freq="min", tz="UTC")
+    write_point_store(pd.DataFrame({"timestamp": timestamps, "lat": 46.0, "lon": 7.0}), tmp_path / "points")
+
+    llm = FakeListLLM(
+        responses=[
+            "Thought: I need the raw points.\n"
+            "Action: points_in_range\n"
+            "Action Input: 2023-01-01 10:00, 2023-01-01 10:02",
+            "Thought: I know the final answer.\nFinal Answer: Zermatt",
+        ]
+    )
+    agent = create_chatlas(llm=llm, db=f"sqlite:///{db_path}", functions=False, point_store_path=tmp_path / "points")
+    handler = ToolOutputs()
+
+    assert agent.invoke({"input": "Where was I at 10am?"}, {"callbacks": [handler]})["output"] == "Zermatt"
+    assert handler.outputs == [
+        "timestamp\tlat\tlon\taccuracy\n"
+        "2023-01-01 10:00:00+00:00\t46.0\t7.0\tnan\n"
+        "2023-01-01 10:01:00+00:00\t46.0\t7.0\tnan\n"
+        "[2 rows]"
+    ]
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from chatlas.data_prep.point_store import PointStore, PointStoreWriter, write_point_store
+
+
+@pytest.fixture
+def points():
+    """A week of hourly points, shuffled, with some missing accuracies."""
+    timestamps = pd.date_range("2023-01-01", periods=7 * 24, freq="h", tz="UTC")
+    df = pd.DataFrame(
+        {
+            "timestamp": timestamps,
+            "latitudeE7": 377_000_000 + np.arange(len(timestamps)) * 100,
+            "longitudeE7": -1_224_000_000 - np.arange(len(timestamps)) * 100,
+            "accuracy": np.where(np.arange(len(timestamps)) % 5 == 0, np.nan, 12.0),
+        }
+    )
+    return df.sample(frac=1, random_state=0)
+
+
+def test_write_point_store(points, tmp_path):
+    """Columns are written sorted on timestamp and memory-mapped on open."""
+    write_point_store(points, tmp_path / "points", chunk_size=10)
+    store = PointStore(tmp_path / "points")
+
+    assert len(store) == len(points)
+    assert isinstance(store.columns["lat"], np.memmap)
+    assert np.all(np.diff(store.columns["timestamp"]) > 0)
+    assert store.time_range() == (pd.Timestamp("2023-01-01", tz="UTC"), pd.Timestamp("2023-01-07 23:00", tz="UTC"))
+
+    expected = points.sort_values("timestamp")
+    np.testing.assert_allclose(store.columns["lat"], expected["latitudeE7"] / 1e7)
+    np.testing.assert_array_equal(np.isnan(store.columns["accuracy"]), expected["accuracy"].isna())
+
+
+def test_slice(points, tmp_path):
+    """A time range is a zero-copy view of every column."""
+    write_point_store(points, tmp_path / "points")
+    store = PointStore(tmp_path / "points")
+
+    window = store.slice("2023-01-03", "2023-01-04")
+    assert len(window["timestamp"]) == 24
+    assert np.shares_memory(window["lat"], store.columns["lat"])
+    assert store.bounds("2023-01-03 00:30", pd.Timestamp("2023-01-03 02:00", tz="UTC")) == (49, 50)
+    assert store.bounds(end="2022-12-31") == (0, 0)
+    assert store.bounds("2023-01-05", "2023-01-04") == (96, 96)
+    assert len(store.slice()["lon"]) == len(points)
+
+
+def test_to_frame(points, tmp_path):
+    """A materialized window matches filtering the original points."""
+    write_point_store(points, tmp_path / "points")
+    df = PointStore(tmp_path / "points").to_frame("2023-01-02 06:00", "2023-01-02 12:00")
+
+    expected = points[(points["timestamp"] >= "2023-01-02 06:00Z") & (points["timestamp"] < "2023-01-02 12:00Z")]
+    expected = expected.sort_values("timestamp")
+    assert df.columns.tolist() == ["timestamp", "lat", "lon", "accuracy"]
+    assert df["timestamp"].tolist() == expected["timestamp"].tolist()
+    np.testing.assert_allclose(df["lon"], expected["longitudeE7"] / 1e7)
+
+    head = PointStore(tmp_path / "points").to_frame("2023-01-02 06:00", "2023-01-02 12:00", limit=2)
+    assert head["timestamp"].tolist() == expected["timestamp"].tolist()[:2]
+
+
+def test_rewrite_and_empty(points, tmp_path):
+    """Writing replaces the previous store, and empty stores open fine."""
+    write_point_store(points, tmp_path / "points")
+    write_point_store(points.head(0), tmp_path / "points")
+    store = PointStore(tmp_path / "points")
+
+    assert len(store) == 0
+    assert store.time_range() is None
+    assert store.to_frame("2023-01-01", "2023-01-02").empty
+    assert not (tmp_path / "points.tmp").exists()
+
+
+@pytest.mark.parametrize("shuffled", [False, True], ids=["in-order", "shuffled"])
+def test_point_store_writer(points, tmp_path, shuffled):
+    """Appending chunks gives the same store as writing all points at once, in any order."""
+    write_point_store(points, tmp_path / "expected")
+    ordered = points if shuffled else points.sort_values("timestamp")
+    with PointStoreWriter(tmp_path / "points", chunk_size=7) as writer:
+        for offset in range(0, len(ordered), 25):
+            writer.append(ordered.iloc[offset : offset + 25])
+    assert writer.is_sorted != shuffled
+
+    expected, store = PointStore(tmp_path / "expected"), PointStore(tmp_path / "points")
+    for name, column in expected.columns.items():
+        np.testing.assert_array_equal(store.columns[name], column)
+    assert not (tmp_path / "points.tmp").exists()
+
+
+def test_point_store_writer_abort(points, tmp_path):
+    """A failed write leaves the existing store as it was."""
+    write_point_store(points, tmp_path / "points")
+    with pytest.raises(RuntimeError):
+        with PointStoreWriter(tmp_path / "points") as writer:
+            writer.append(points.head(3))
+            raise RuntimeError("ingest failed")
+    assert len(PointStore(tmp_path / "points")) == len(points)
+    assert not (tmp_path / "points.tmp").exists()
@@ -1,14 +1,55 @@
+import json
+import sqlite3
+import tracemalloc
+from contextlib import closing
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import pytest
-from chatlas.data_prep.records import get_top_activity, load_data, preprocess_data, save_data
+from chatlas.data_prep.point_store import PointStore
+from chatlas.data_prep.records import (
+    get_top_activity,
+    iter_chunks,
+    iter_locations,
+    load_data,
+    load_data_streaming,
+    main,
+    normalize_columns,
+    preprocess_data,
+    save_data,
+    top_activities,
+)
 
 
 # Update this to your actual path relative to the test file
 DEFAULT_RECORDS_PATH = Path("./data/sample/location_history/Records.json")
 
 
+@pytest.fixture
+def records_file(tmp_path):
+    """Write a small synthetic Records.json file."""
+    locations = []
+    for i in range(25):
+        location = {
+            "latitudeE7": 377_000_000 + i,
+            "longitudeE7": -1_224_000_000 - i,
+            "accuracy": 10 + i,
+            "source": "WIFI",
+            "timestamp": f"2023-01-01T00:{i:02d}:00.000Z",
+        }
+        if i % 3 == 0:
+            location["activity"] = [
+                {"activity": [{"type": "STILL", "confidence": 70}, {"type": "WALKING", "confidence": 30}]}
+            ]
+        if i % 5 == 0:
+            location["deviceTag"] = {"id": i}
+        locations.append(location)
+    file_path = tmp_path / "Records.json"
+    file_path.write_text(json.dumps({"locations": locations}, indent=2))
+    return file_path
+
+
 @pytest.fixture(scope="function")
 def sample_data():
     """Load sample data from JSON file."""
@@ -20,6 +61,26 @@ def test_load_data(sample_data):
     assert isinstance(sample_data, pd.DataFrame), "Loaded data should be a DataFrame."
 
 
+def test_iter_locations(records_file):
+    """Elements straddling read blocks are decoded intact."""
+    locations = list(iter_locations(records_file, block_size=16))
+    expected = json.loads(records_file.read_text())["locations"]
+    assert locations == expected
+
+
+def test_iter_chunks(records_file):
+    """Chunks are capped at the requested size."""
+    sizes = [len(chunk) for chunk in iter_chunks(records_file, chunk_size=10)]
+    assert sizes == [10, 10, 5]
+
+
+def test_load_data_streaming(records_file):
+    """Streaming ingest matches the whole-file load."""
+    expected = load_data(records_file)
+    streamed = load_data_streaming(records_file, chunk_size=4)
+    pd.testing.assert_frame_equal(expected, streamed)
+
+
 def test_preprocess_data(sample_data):
     """Test the preprocess_data function."""
     preprocessed_df = preprocess_data(sample_data)
@@ -36,6 +97,46 @@ def test_get_top_activity(sample_data):
     assert percent_populated < 0.9, "More than 90% of the activities appear to be missing."
 
 
+def test_top_activities(records_file):
+    """The vectorized top activity matches get_top_activity row by row, including ties and missing values."""
+    activity = load_data(records_file)["activity"]
+    activity[1] = [
+        {"activity": [{"type": "STILL", "confidence": 40}, {"type": "TILTING", "confidence": 60}]},
+        {"activity": [{"type": "WALKING", "confidence": 60}]},
+    ]
+    activity[2] = []
+
+    top_type, top_confidence = top_activities(activity)
+    expected = activity.apply(get_top_activity)
+    assert top_type.tolist() == [x["type"] if x else None for x in expected]
+    assert top_confidence.fillna(-1).tolist() == [x["confidence"] if x else -1 for x in expected]
+    assert top_type[1] == "TILTING"
+
+
+def test_normalize_columns():
+    """Strings are lowercased like the old per-cell applymap, low-cardinality columns become categories."""
+    df = pd.DataFrame(
+        {
+            "source": ["WIFI", "GPS", None, "WIFI"] * 10,
+            "deviceTag": [12345] * 40,
+            "name": [f"Place {i}" for i in range(40)],
+            "mixed": ["ABC", 1, "Def", None] * 10,
+            "accuracy": list(range(40)),
+        }
+    )
+    normalized = normalize_columns(df)
+
+    assert normalized["source"].dtype == "category"
+    assert normalized["source"].tolist()[:4] == ["wifi", "gps", np.nan, "wifi"]
+    assert normalized["deviceTag"].dtype == "category"
+    assert normalized["name"].dtype == object
+    assert normalized["name"][3] == "place 3"
+    assert normalized["mixed"].tolist()[:4] == ["abc", 1, "def", None]
+    assert normalized["accuracy"].dtype == "int64"
+    assert df["source"][0] == "WIFI"
+    assert normalized.memory_usage(deep=True).sum() < df.memory_usage(deep=True).sum()
+
+
 def test_save_data(tmp_path):
     """Test the save_data function."""
     df = pd.DataFrame({"A": [1, 2, 3], "B": [4, 5, 6]})
@@ -45,3 +146,98 @@ def test_save_data(tmp_path):
 
     loaded_df = pd.read_pickle(output_file)
     pd.testing.assert_frame_equal(df, loaded_df)
+
+
+@pytest.mark.parametrize("stream", [True, False])
+def test_main_loads_points(records_file, tmp_path, stream):
+    """The full history is stored, reduced, saved and loaded into the points table."""
+    db_path = tmp_path / "chatlas.db"
+    main(
+        stream=stream,
+        records_path=records_file,
+        output_path=tmp_path / "records.parquet",
+        sql_db_path=db_path,
+        point_store_path=tmp_path / "points",
+        chunk_size=4,
+    )
+
+    with closing(sqlite3.connect(db_path)) as conn:
+        rows = conn.execute("SELECT timestamp, lat, lon FROM points ORDER BY timestamp").fetchall()
+    # Stationary points one minute apart: only the day's endpoints and the activity changes remain
+    assert 2 <= len(rows) < 25
+    assert rows[0] == ("2023-01-01 00:00:00", 37.7, -122.4)
+    assert rows[-1][0] == "2023-01-01 00:24:00"
+    assert len(pd.read_parquet(tmp_path / "records.parquet")) == len(rows)
+    # The point store keeps every point
+    assert len(PointStore(tmp_path / "points")) == 25
+
+
+def write_days(file_path: Path, days: int, points_per_day: int = 288) -> None:
+    """Write a Records.json file of a walk around San Francisco, a point every 5 minutes."""
+    rng = np.random.default_rng(0)
+    start = pd.Timestamp("2023-01-01", tz="UTC")
+    with file_path.open("w") as f:
+        f.write('{"locations": [')
+        for i in range(days * points_per_day):
+            timestamp = (start + pd.Timedelta(minutes=5 * i)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+            location = {
+                "latitudeE7": 377_000_000 + int(rng.integers(-10_000, 10_000)),
+                "longitudeE7": -1_224_000_000 + int(rng.integers(-10_000, 10_000)),
+                "accuracy": int(rng.integers(5, 50)),
+                "source": "WIFI",
+                "deviceTag": 1_234_567_890,
+                "platformType": "ANDROID",
+                "formFactor": "PHONE",
+                "batteryCharging": False,
+                "deviceTimestamp": timestamp,
+                "timestamp": timestamp,
+            }
+            if i % 7 == 0:
+                location["activity"] = [{"activity": [{"type": "WALKING", "confidence": 80}]}]
+            f.write(("," if i else "") + json.dumps(location))
+        f.write("]}")
+
+
+def test_main_streaming_matches_in_memory(tmp_path):
+    """Streaming several days in chunks saves the same points as processing the whole history at once."""
+    write_days(tmp_path / "Records.json", days=3)
+    for stream in [True, False]:
+        main(
+            stream=stream,
+            records_path=tmp_path / "Records.json",
+            output_path=tmp_path / f"records-{stream}.parquet",
+            sql_db_path=tmp_path / f"chatlas-{stream}.db",
+            point_store_path=tmp_path / f"points-{stream}",
+            chunk_size=100,
+        )
+
+    streamed, in_memory = (pd.read_parquet(tmp_path / f"records-{stream}.parquet") for stream in [True, False])
+    pd.testing.assert_frame_equal(streamed, in_memory, check_dtype=False, check_categorical=False)
+    for stream in [True, False]:
+        with closing(sqlite3.connect(tmp_path / f"chatlas-{stream}.db")) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM points").fetchone()[0] == len(in_memory)
+        assert len(PointStore(tmp_path / f"points-{stream}")) == 3 * 288
+
+
+def test_main_memory_is_bounded(tmp_path):
+    """Peak memory of the streaming pipeline doesn't grow with the number of chunks in the file."""
+
+    def peak_memory(days: int) -> int:
+        records_path = tmp_path / f"Records-{days}.json"
+        write_days(records_path, days)
+        tracemalloc.start()
+        try:
+            main(
+                records_path=records_path,
+                output_path=tmp_path / f"records-{days}.parquet",
+                sql_db_path=tmp_path / f"chatlas-{days}.db",
+                point_store_path=tmp_path / f"points-{days}",
+                chunk_size=500,
+            )
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    # Both files are larger than a read block, the large one has 3 times the chunks and about the same peak
+    small, large = peak_memory(20), peak_memory(60)
+    assert large < small * 1.3
@@ -0,0 +1,58 @@
+import sqlite3
+
+from chatlas.data_prep import rollups
+from chatlas.data_prep.semantic import main
+from tests.helpers import write_month
+
+
+def load_db(semantic_dir, db_path, incremental=False):
+    main(write_df=False, write_sql=True, sql_db_path=db_path, semantic_path=semantic_dir, incremental=incremental)
+
+
+def dump(conn, table_name):
+    return sorted(conn.execute(f"SELECT * FROM {table_name}").fetchall())
+
+
+def test_rollups(semantic_dir, tmp_path):
+    db_path = tmp_path / "chatlas.db"
+    load_db(semantic_dir, db_path)
+
+    with sqlite3.connect(db_path) as conn:
+        countries = conn.execute(
+            "SELECT COUNT(DISTINCT country) FROM place_rollups WHERE period = 'year' AND period_start = '2021'"
+        ).fetchone()[0]
+        assert countries == 0
+
+        visits, duration_s = conn.execute(
+            "SELECT SUM(visits), SUM(duration_s) FROM place_rollups "
+            "WHERE period = 'year' AND period_start = '2023' AND country = 'USA' AND place_id = 'place_0'"
+        ).fetchone()
+        assert (visits, duration_s) == (4, 4 * 5400)
+
+        distance_m = conn.execute(
+            "SELECT distance_m FROM activity_rollups "
+            "WHERE period = 'month' AND period_start = '2022-01' AND activity_type = 'WALKING'"
+        ).fetchone()[0]
+        assert distance_m == 1501 + 1503 + 1505
+
+        days = conn.execute("SELECT COUNT(*) FROM place_rollups WHERE period = 'day'").fetchone()[0]
+        assert days == 4 * 6
+
+
+def test_rollups_incremental(semantic_dir, tmp_path):
+    db_path = tmp_path / "chatlas.db"
+    load_db(semantic_dir, db_path, incremental=True)
+    write_month(semantic_dir, 2023, 2, n=2)
+    write_month(semantic_dir, 2024, 1, n=3)
+    load_db(semantic_dir, db_path, incremental=True)
+
+    with sqlite3.connect(db_path) as conn:
+        incremental = {table: dump(conn, table) for table in rollups.ROLLUPS}
+        rollups.refresh_rollups(conn)
+        for table in rollups.ROLLUPS:
+            assert dump(conn, table) == incremental[table]
+
+        visits = conn.execute(
+            "SELECT SUM(visits) FROM place_rollups WHERE period = 'year' AND period_start = '2023'"
+        ).fetchone()[0]
+        assert visits == 6 + 2
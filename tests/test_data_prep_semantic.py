@@ -8,6 +8,7 @@ import pandas as pd
 import pytest
 import sqlite3
 
+from chatlas.data_prep import semantic
 from chatlas.data_prep.semantic import (
     DEFAULT_SEMANTIC_PATH,
     extract_address_components,
@@ -16,8 +17,10 @@ from chatlas.data_prep.semantic import (
     load_data_from_files,
     main,
     parse_datetime,
+    split_addresses,
     write_to_df,
 )
+from tests.helpers import write_month
 
 
 # Provide a fixture to load the sample data
@@ -72,6 +75,14 @@ def test_extract_all_semantic():
     assert len(activities) > 0
 
 
+def test_extract_all_semantic_parallel(semantic_dir):
+    places, activities = extract_all_semantic(semantic_dir)
+    places_parallel, activities_parallel = extract_all_semantic(semantic_dir, workers=2)
+    pd.testing.assert_frame_equal(places, places_parallel)
+    pd.testing.assert_frame_equal(activities, activities_parallel)
+    assert len(places) == 24
+
+
 def test_process_places(sample_data):
     pass
 
@@ -108,6 +119,45 @@ def test_extract_address_components():
     assert extract_address_components(None).equals(pd.Series(["missing", "missing", "missing", "missing", "missing"]))
 
 
+def test_split_addresses():
+    addresses = pd.Series(
+        [
+            "Name, Street, City, State, Country",
+            "Street, City, State, Country",
+            "Street, City, Country",
+            "Street, City",
+            "A, B, C, D, E, F",
+            "",
+            None,
+        ]
+    )
+    expected = addresses.apply(extract_address_components)
+    expected.columns = ["addr_name", "street", "city", "state", "country"]
+    pd.testing.assert_frame_equal(split_addresses(addresses), expected)
+
+
+@pytest.mark.parametrize(
+    "addresses",
+    [
+        pd.Series(["Street, City, Country", "Street, City, State, Country"]),
+        pd.Series([None, None], dtype=object),
+        pd.Series([], dtype=object),
+        pd.Series([], dtype=float),
+    ],
+    ids=["no-five-parts", "all-none", "empty", "empty-float"],
+)
+def test_split_addresses_partial_batches(addresses):
+    """Batches where some address columns are never reached still split like the per-row version."""
+    expected = pd.DataFrame(
+        [extract_address_components(address) for address in addresses],
+        columns=range(5),
+        index=addresses.index,
+        dtype=object,
+    )
+    expected.columns = ["addr_name", "street", "city", "state", "country"]
+    pd.testing.assert_frame_equal(split_addresses(addresses), expected)
+
+
 def test_write_to_df(tmp_path):
     """Test the write_to_df function."""
     df = pd.DataFrame({"A": [1, 2, 3], "B": [4, 5, 6]})
@@ -206,6 +256,51 @@ def test_main_write_df():
         shutil.rmtree(temp_dir)
 
 
+def test_main_incremental(semantic_dir, tmp_path, monkeypatch):
+    db_path = tmp_path / "chatlas.db"
+    places_path = tmp_path / "places.pkl"
+    activities_path = tmp_path / "activities.pkl"
+
+    def run():
+        main(
+            write_df=True,
+            write_sql=True,
+            places_output_path=places_path,
+            activities_output_path=activities_path,
+            sql_db_path=db_path,
+            semantic_path=semantic_dir,
+            incremental=True,
+        )
+        with sqlite3.connect(db_path) as conn:
+            return dict(conn.execute("SELECT source_file, COUNT(*) FROM places GROUP BY source_file").fetchall())
+
+    counts = run()
+    assert counts == {"2022/2022_01.json": 6, "2022/2022_02.json": 6, "2023/2023_01.json": 6, "2023/2023_02.json": 6}
+
+    # Only the changed and the new month are parsed on the next run
+    parsed = []
+    extract_month_file = semantic.extract_month_file
+    monkeypatch.setattr(semantic, "extract_month_file", lambda f: parsed.append(f.name) or extract_month_file(f))
+    write_month(semantic_dir, 2023, 2, n=3)
+    write_month(semantic_dir, 2023, 3, n=2)
+    (semantic_dir / "2022" / "2022_01.json").unlink()
+    counts = run()
+    assert sorted(parsed) == ["2023_02.json", "2023_03.json"]
+    assert counts == {"2022/2022_02.json": 6, "2023/2023_01.json": 6, "2023/2023_02.json": 3, "2023/2023_03.json": 2}
+    assert len(pd.read_pickle(places_path)) == 17
+
+    # Nothing to do when nothing changed
+    parsed.clear()
+    run()
+    assert parsed == []
+
+
+def test_main_incremental_needs_sql(tmp_path, semantic_dir):
+    with pytest.raises(ValueError, match="write_sql"):
+        main(write_sql=False, sql_db_path=tmp_path / "chatlas.db", semantic_path=semantic_dir, incremental=True)
+    assert not (tmp_path / "chatlas.db").exists()
+
+
 def test_main_write_sql(mock_save):
     temp_db_path = "temp.db"
 
@@ -0,0 +1,65 @@
+import sqlite3
+
+import numpy as np
+
+from chatlas.agent.database import connect_database
+from chatlas.data_prep import spatial
+from chatlas.data_prep.semantic import main
+from tests.helpers import write_month
+
+
+def load_db(semantic_dir, db_path, incremental=False):
+    main(write_df=False, write_sql=True, sql_db_path=db_path, semantic_path=semantic_dir, incremental=incremental)
+
+
+def test_nearby(semantic_dir, tmp_path):
+    db_path = tmp_path / "chatlas.db"
+    load_db(semantic_dir, db_path)
+
+    with sqlite3.connect(db_path) as conn:
+        places = spatial.nearby(conn, 37.7749, -122.4194, radius_m=50)
+        assert len(places) == 16
+        assert places["distance_m"].is_monotonic_increasing
+        assert places["distance_m"].max() <= 50
+
+        activities = spatial.nearby(conn, 37.7849, -122.4294, radius_m=10, table_name="activities")
+        assert len(activities) == 8
+
+        closest = spatial.nearby(conn, 37.7749, -122.4194, radius_m=50, limit=2)
+        assert len(closest) == 2
+
+
+def test_within_bbox(semantic_dir, tmp_path):
+    db_path = tmp_path / "chatlas.db"
+    load_db(semantic_dir, db_path)
+
+    with sqlite3.connect(db_path) as conn:
+        places = spatial.within_bbox(conn, 37.7748, -122.4196, 37.7751, -122.4193, columns=["id", "lat", "lon"])
+        assert places.columns.tolist() == ["id", "lat", "lon"]
+        assert len(places) == 12
+
+
+def test_refresh_spatial_index_incremental(semantic_dir, tmp_path):
+    db_path = tmp_path / "chatlas.db"
+    load_db(semantic_dir, db_path, incremental=True)
+    write_month(semantic_dir, 2023, 2, n=2)
+    load_db(semantic_dir, db_path, incremental=True)
+
+    with sqlite3.connect(db_path) as conn:
+        ids = conn.execute("SELECT id FROM places ORDER BY id").fetchall()
+        rtree_ids = conn.execute("SELECT id FROM places_rtree ORDER BY id").fetchall()
+        assert ids == rtree_ids
+        assert len(ids) == 20
+
+
+def test_haversine_m():
+    assert np.isclose(spatial.haversine_m(0, 0, 0, 1), 111_195, rtol=1e-3)
+
+
+def test_agent_database_hides_internal_tables(semantic_dir, tmp_path):
+    db_path = tmp_path / "chatlas.db"
+    load_db(semantic_dir, db_path, incremental=True)
+    tables = connect_database(f"sqlite:///{db_path}").get_usable_table_names()
+    assert "ingest_manifest" not in tables
+    assert not [table for table in tables if table.endswith(("_node", "_parent", "_rowid"))]
+    assert {"activities", "activities_rtree", "places", "places_rtree"} <= set(tables)
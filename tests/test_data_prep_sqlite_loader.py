@@ -0,0 +1,49 @@
+import sqlite3
+
+import pandas as pd
+
+from chatlas.data_prep import sqlite_loader
+from chatlas.data_prep.semantic import main
+
+
+def test_load_typed_tables_and_indexes(semantic_dir, tmp_path):
+    db_path = tmp_path / "chatlas.db"
+    main(write_df=False, write_sql=True, sql_db_path=db_path, semantic_path=semantic_dir)
+
+    with sqlite3.connect(db_path) as conn:
+        columns = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(places)")}
+        assert columns["lat"] == "REAL"
+        assert columns["confidence_visit"] == "INTEGER"
+        assert columns["start_time"] == "TEXT"
+
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list(places)")}
+        assert {"idx_places_start_time", "idx_places_city", "idx_places_country", "idx_places_place_id"} <= indexes
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list(activities)")}
+        assert {"idx_activities_start_time", "idx_activities_activity_type"} <= indexes
+
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("SELECT COUNT(*) FROM places").fetchone()[0] == 24
+        start_time, confidence = conn.execute("SELECT start_time, confidence_visit FROM places LIMIT 1").fetchone()
+        assert start_time == "2022-01-01 10:00:00"
+        assert confidence == 95
+
+
+def test_to_sql_values():
+    assert sqlite_loader.to_sql_values(pd.Series([1, None], dtype="Int64")) == [1, None]
+    assert sqlite_loader.to_sql_values(pd.Series([1.5, float("nan")])) == [1.5, None]
+    times = pd.to_datetime(pd.Series(["2023-01-01T10:00:00Z", None]), format="ISO8601")
+    assert sqlite_loader.to_sql_values(times) == ["2023-01-01 10:00:00", None]
+
+
+def test_load_chunks(tmp_path):
+    """Chunks replace the table's rows, and the indexes are built once they are in."""
+    timestamps = pd.date_range("2023-01-01", periods=10, freq="h", tz="UTC")
+    points = pd.DataFrame({"timestamp": timestamps, "lat": 46.0, "lon": 7.0})
+    with sqlite3.connect(tmp_path / "chatlas.db") as conn:
+        sqlite_loader.load(conn, {"points": points})
+        chunks = (points.iloc[i : i + 3] for i in range(0, 10, 3))
+        assert sqlite_loader.load_chunks(conn, "points", chunks) == 10
+        rows = conn.execute("SELECT timestamp FROM points ORDER BY id").fetchall()
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list(points)")}
+    assert [row[0] for row in rows] == timestamps.strftime(sqlite_loader.TIME_FORMAT).tolist()
+    assert "idx_points_timestamp" in indexes
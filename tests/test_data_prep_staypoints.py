@@ -0,0 +1,164 @@
+import json
+import sqlite3
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from chatlas.data_prep import semantic
+from chatlas.data_prep.staypoints import (
+    PLACE_COLUMNS,
+    cluster_stays,
+    connected_components,
+    detect_places,
+    iter_stays,
+    main,
+    split_runs,
+)
+
+HOME = (37.7749, -122.4194)
+CAFE = (37.7849, -122.4094)
+
+
+def track(start: str, periods: int, freq: str, origin, destination=None, jitter_m: float = 10.0, seed: int = 0):
+    """Points from origin to destination (or around origin) with some GPS jitter."""
+    rng = np.random.default_rng(seed)
+    destination = destination or origin
+    steps = np.linspace(0, 1, periods)
+    jitter = rng.uniform(-1, 1, (2, periods)) * jitter_m / 111_320
+    return pd.DataFrame(
+        {
+            "timestamp": pd.date_range(start, periods=periods, freq=freq, tz="UTC"),
+            "latitudeE7": ((origin[0] + (destination[0] - origin[0]) * steps + jitter[0]) * 1e7).round(),
+            "longitudeE7": ((origin[1] + (destination[1] - origin[1]) * steps + jitter[1]) * 1e7).round(),
+        }
+    )
+
+
+@pytest.fixture
+def records():
+    """Home, a dense walk to a cafe, the cafe, a sparse walk back, and home again the next day."""
+    return pd.concat(
+        [
+            track("2023-01-01 08:00", 60, "1min", HOME),
+            track("2023-01-01 09:00", 180, "10s", HOME, CAFE, jitter_m=2),
+            track("2023-01-01 09:30", 60, "1min", CAFE, seed=1),
+            track("2023-01-01 10:30", 10, "3min", CAFE, HOME, jitter_m=0),
+            track("2023-01-02 07:00", 30, "2min", HOME, seed=2),
+        ],
+        ignore_index=True,
+    )
+
+
+def test_split_runs():
+    """A chain that drifts is split at the first point leaving the anchor's radius."""
+    timestamps = np.arange(6) * 60 * 1_000_000_000
+    lat = np.array([0.0, 0.0003, 0.0006, 0.0009, 0.0012, 0.0015])
+    lon = np.zeros(6)
+    # Points are ~33 m apart: within 70 m of the anchor for two steps
+    assert split_runs(timestamps, lat, lon, distance_m=70, max_gap_s=3600).tolist() == [0, 3]
+    assert split_runs(timestamps, lat, lon, distance_m=70, max_gap_s=30).tolist() == [0, 1, 2, 3, 4, 5]
+    assert split_runs(timestamps[:0], lat[:0], lon[:0], 70, 3600).tolist() == []
+
+
+def test_iter_stays(records):
+    """Stays at home, the cafe and home again; walks are not stays."""
+    stays = pd.concat(list(iter_stays([records])), ignore_index=True)
+
+    assert len(stays) == 3
+    assert stays["start_time"][0] == pd.Timestamp("2023-01-01 08:00", tz="UTC")
+    # The stay at the cafe starts and ends on the walks, within the radius of the cafe
+    arrival, departure = pd.Timestamp("2023-01-01 09:30", tz="UTC"), pd.Timestamp("2023-01-01 10:29", tz="UTC")
+    assert arrival - pd.Timedelta("5min") < stays["start_time"][1] <= arrival
+    assert departure <= stays["end_time"][1] < departure + pd.Timedelta("5min")
+    assert stays["start_time"][2] == pd.Timestamp("2023-01-02 07:00", tz="UTC")
+    np.testing.assert_allclose(stays[["lat", "lon"]].to_numpy(), [HOME, CAFE, HOME], atol=2e-4)
+
+
+def test_iter_stays_chunked(records):
+    """Carrying the open run over makes chunking invisible."""
+    expected = pd.concat(list(iter_stays([records])), ignore_index=True)
+    chunks = [records.iloc[i : i + 7] for i in range(0, len(records), 7)]
+    chunked = pd.concat(list(iter_stays(chunks)), ignore_index=True)
+    pd.testing.assert_frame_equal(expected, chunked)
+
+
+def test_iter_stays_long_stay(records):
+    """A stay spanning many chunks is carried as a summary and comes out as one stay."""
+    stay = track("2023-01-03 00:00", 2_000, "10s", CAFE, seed=3)
+    history = pd.concat([records, stay, track("2023-01-03 06:00", 10, "1min", HOME)], ignore_index=True)
+    expected = pd.concat(list(iter_stays([history])), ignore_index=True)
+    chunked = pd.concat(list(iter_stays(history.iloc[i : i + 50] for i in range(0, len(history), 50))))
+
+    pd.testing.assert_frame_equal(expected, chunked.reset_index(drop=True))
+    long_stay = chunked[chunked["n_points"] == 2_000]
+    assert len(long_stay) == 1
+    assert long_stay["end_time"].iloc[0] - long_stay["start_time"].iloc[0] == pd.Timedelta(seconds=19_990)
+
+
+def test_connected_components():
+    labels = connected_components(6, np.array([4, 1, 3]), np.array([5, 2, 4]))
+    assert labels.tolist() == [0, 1, 1, 3, 3, 3]
+
+
+def test_cluster_stays():
+    """Nearby stays share a cluster, core cells need min_samples stays."""
+    lat = np.array([37.7749, 37.77491, 37.77495, 37.7849, 37.78492])
+    lon = np.array([-122.4194, -122.41941, -122.4194, -122.4094, -122.40942])
+
+    labels = cluster_stays(lat, lon, eps_m=50)
+    assert labels[0] == labels[1] == labels[2] != labels[3]
+    assert labels[3] == labels[4]
+    # Without core cells, only stays sharing a cell are merged
+    assert len(set(cluster_stays(lat, lon, eps_m=50, min_samples=10))) > len(set(labels))
+    assert cluster_stays(lat[:0], lon[:0]).tolist() == []
+
+
+def test_detect_places(records):
+    """Output matches the semantic places schema, and the two home stays are one place."""
+    places = detect_places([records])
+
+    assert places.columns.tolist() == PLACE_COLUMNS
+    assert places["place_id"].tolist()[0] == places["place_id"].tolist()[2] != places["place_id"].tolist()[1]
+    assert places["start_time"].dt.tz is not None
+    assert places["confidence_visit"].dtype == "Int64"
+    assert (places["visit_type"] == "STAY_POINT").all()
+    assert (places["city"] == "missing").all()
+
+    unmerged = detect_places([records], merge_distance_m=None)
+    assert unmerged["place_id"].nunique() == 3
+
+
+def test_main(records, tmp_path):
+    """Records alone produce the places table, its spatial index and rollups."""
+    locations = [
+        {"timestamp": ts.isoformat().replace("+00:00", "Z"), "latitudeE7": int(lat), "longitudeE7": int(lon)}
+        for ts, lat, lon in records.itertuples(index=False)
+    ]
+    records_path = tmp_path / "Records.json"
+    records_path.write_text(json.dumps({"locations": locations}))
+    db_path = tmp_path / "chatlas.db"
+
+    main(records_path, tmp_path / "places.parquet", db_path, chunk_size=50)
+
+    assert len(semantic.storage.read_table(tmp_path / "places.parquet")) == 3
+    with closing(sqlite3.connect(db_path)) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM places").fetchone()[0] == 3
+        assert conn.execute("SELECT COUNT(*) FROM places_rtree").fetchone()[0] == 3
+        visits = conn.execute("SELECT SUM(visits) FROM place_rollups WHERE period = 'year'").fetchone()[0]
+    assert visits == 3
+
+
+def test_main_empty_records(tmp_path):
+    """A Records file without locations gives empty places rather than failing."""
+    records_path = tmp_path / "Records.json"
+    records_path.write_text(json.dumps({"locations": []}))
+    db_path = tmp_path / "chatlas.db"
+
+    main(records_path, tmp_path / "places.parquet", db_path)
+
+    places = semantic.storage.read_table(tmp_path / "places.parquet")
+    assert places.empty and places.columns.tolist() == PLACE_COLUMNS
+    with closing(sqlite3.connect(db_path)) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM places").fetchone()[0] == 0
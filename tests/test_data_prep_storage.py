@@ -0,0 +1,86 @@
+import pandas as pd
+import pyarrow.parquet as pq
+
+from chatlas.data_prep.semantic import main
+from chatlas.data_prep.storage import PLACES_TYPES, RECORDS_TYPES, ChunkedTableWriter, read_table, write_table
+
+
+def test_write_read_roundtrip(tmp_path):
+    df = pd.DataFrame(
+        {
+            "start_time": pd.to_datetime(["2023-03-01T00:00:00Z", "2023-01-01T00:00:00Z"], format="ISO8601"),
+            "lat": [1.0, 2.0],
+            "confidence_visit": pd.array([1, None], dtype="Int64"),
+            "name": ["b", None],
+            "extra": [1, 2],
+        }
+    )
+    output_file = tmp_path / "places.parquet"
+    write_table(df, output_file, types=PLACES_TYPES, sort_by="start_time")
+
+    loaded = read_table(output_file)
+    expected = df.sort_values("start_time").reset_index(drop=True)
+    pd.testing.assert_frame_equal(loaded, expected)
+    assert pq.read_schema(output_file).field("confidence_visit").type == "int64"
+
+
+def test_read_columns_and_time_range(semantic_dir, tmp_path):
+    places_path = tmp_path / "places.parquet"
+    activities_path = tmp_path / "activities.parquet"
+    main(
+        write_df=True,
+        write_sql=False,
+        places_output_path=places_path,
+        activities_output_path=activities_path,
+        semantic_path=semantic_dir,
+    )
+
+    places = read_table(places_path, columns=["name", "start_time"], start="2023-01-01", end="2023-02-01")
+    assert places.columns.tolist() == ["name", "start_time"]
+    assert len(places) == 6
+    assert places["start_time"].is_monotonic_increasing
+
+    activities = read_table(activities_path)
+    assert len(activities) == 24
+    assert str(activities["start_time"].dtype) == "datetime64[ns, UTC]"
+
+
+def test_chunked_table_writer(tmp_path):
+    """Chunks with different columns and types end up in one file under a common schema."""
+    timestamps = pd.date_range("2023-01-01", periods=6, freq="h", tz="UTC")
+    chunks = [
+        pd.DataFrame(
+            {
+                "timestamp": timestamps[:3],
+                "accuracy": [5, 6, 7],
+                "source": pd.Categorical(["wifi"] * 3),
+                "deviceTag": pd.Categorical([42] * 3),
+            }
+        ),
+        pd.DataFrame(
+            {
+                "timestamp": timestamps[3:],
+                "accuracy": [8.5, None, 9.0],
+                "source": ["gps", "cell", None],
+                "deviceTag": [42, 7, 42],
+            }
+        ),
+        pd.DataFrame({"timestamp": timestamps[:0]}),
+        pd.DataFrame({"timestamp": timestamps[3:4], "accuracy": [1.0], "velocity": [3]}),
+    ]
+    output_file = tmp_path / "records.parquet"
+    with ChunkedTableWriter(output_file, types=RECORDS_TYPES, row_group_size=4) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+
+    df = pd.read_parquet(output_file)
+    assert df.columns.tolist() == ["timestamp", "accuracy", "source", "deviceTag", "velocity"]
+    assert df["timestamp"].tolist() == [*timestamps, timestamps[3]]
+    assert df["accuracy"].tolist()[:4] == [5.0, 6.0, 7.0, 8.5]
+    assert df["source"].dtype == "category"
+    assert df["source"].tolist()[:5] == ["wifi", "wifi", "wifi", "gps", "cell"]
+    # Integer categories are encoded too, though like `write_table` they are read back as plain values
+    assert df["deviceTag"].tolist()[:6] == [42, 42, 42, 42, 7, 42]
+    assert df["velocity"].isna().sum() == 6
+    assert pq.ParquetFile(output_file).metadata.num_row_groups == 2
+    assert not (tmp_path / "records.parquet.parts").exists()
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+from chatlas.data_prep.trajectory import (
+    douglas_peucker,
+    first_in_bucket,
+    iter_reduce_records,
+    leaves_cell,
+    project,
+    reduce_records,
+)
+
+
+def make_records(timestamps, lat, lon, activity=None) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "timestamp": pd.to_datetime(timestamps, utc=True),
+            "latitudeE7": (np.asarray(lat) * 1e7).round().astype(np.int64),
+            "longitudeE7": (np.asarray(lon) * 1e7).round().astype(np.int64),
+            "top_activity": activity if activity is not None else ["walking"] * len(timestamps),
+        }
+    )
+
+
+def test_douglas_peucker():
+    """Points on a line are dropped, the corner of an L is kept."""
+    x = np.r_[np.arange(0.0, 100.0, 10.0), np.full(10, 100.0)]
+    y = np.r_[np.zeros(10), np.arange(0.0, 100.0, 10.0)]
+    y[3] += 1.0
+
+    keep = douglas_peucker(x, y, tolerance=5.0)
+    assert np.flatnonzero(keep).tolist() == [0, 10, 19]
+    assert douglas_peucker(x, y, tolerance=0.5)[3]
+    assert douglas_peucker(np.zeros(1), np.zeros(1), 1.0).tolist() == [True]
+
+
+def test_first_in_bucket():
+    timestamps = np.array([0, 10, 59, 60, 61, 200]) * 1_000_000_000
+    assert first_in_bucket(timestamps, 60).tolist() == [True, False, False, True, False, True]
+
+
+def test_leaves_cell():
+    """Jitter within a cell is dropped, moving ~100 m is kept."""
+    lat = np.array([37.7700000, 37.7700001, 37.7700002, 37.7709])
+    lon = np.array([-122.4100000, -122.4100001, -122.4100000, -122.4100000])
+    assert leaves_cell(lat, lon, 25.0).tolist() == [True, False, False, True]
+
+
+def test_project():
+    x, y = project(np.array([0.0, 0.0, 1.0]), np.array([0.0, 1.0, 0.0]), lat0=0.0)
+    np.testing.assert_allclose(np.hypot(x, y), [0.0, 111_195.0, 111_195.0], atol=1.0)
+
+
+def test_reduce_records():
+    """A straight walk collapses to its endpoints, while day, gap and activity endpoints survive."""
+    # A walk along a meridian every 5 seconds, a one hour gap, a drive, then a second day
+    walk = pd.date_range("2023-01-01 10:00", periods=360, freq="5s")
+    drive = pd.date_range("2023-01-01 11:30", periods=120, freq="5s")
+    next_day = pd.date_range("2023-01-02 09:00", periods=5, freq="1min")
+    timestamps = walk.append(drive).append(next_day)
+    lat = np.r_[37.77 + np.arange(360) * 1e-5, 37.80 + np.arange(120) * 1e-4, np.full(5, 37.9)]
+    lon = np.full(len(timestamps), -122.41)
+    activity = ["walking"] * 360 + ["in_passenger_vehicle"] * 120 + [None] * 5
+    df = make_records(timestamps, lat, lon, activity).sample(frac=1, random_state=0)
+
+    reduced = reduce_records(df)
+
+    assert reduced["timestamp"].is_monotonic_increasing
+    kept = set(reduced["timestamp"])
+    expected_endpoints = [walk[0], walk[-1], drive[0], drive[-1], next_day[0], next_day[-1]]
+    assert {pd.Timestamp(t, tz="UTC") for t in expected_endpoints} <= kept
+    assert len(reduced) < len(df) / 20
+    np.testing.assert_allclose(reduced["lat"], reduced["latitudeE7"] / 1e7)
+
+    unreduced = reduce_records(df, bucket_s=None, min_distance_m=None, tolerance_m=None)
+    assert len(unreduced) == len(df)
+
+
+def test_reduce_records_keeps_shape():
+    """Turns deviating more than the tolerance are kept."""
+    timestamps = pd.date_range("2023-01-01 10:00", periods=200, freq="1min")
+    lat = np.r_[37.77 + np.arange(100) * 1e-4, np.full(100, 37.77 + 99e-4)]
+    lon = np.r_[np.full(100, -122.41), -122.41 + np.arange(100) * 1e-4]
+    reduced = reduce_records(make_records(timestamps, lat, lon), tolerance_m=10.0)
+
+    assert pd.Timestamp(timestamps[99], tz="UTC") in set(reduced["timestamp"])
+    assert len(reduced) == 3
+
+
+def test_reduce_records_empty():
+    reduced = reduce_records(make_records([], [], []))
+    assert reduced.empty
+    assert {"lat", "lon"} <= set(reduced.columns)
+
+
+def test_iter_reduce_records():
+    """Reducing chunk by chunk, across day boundaries, matches reducing the whole history."""
+    rng = np.random.default_rng(0)
+    n = 3_000
+    timestamps = pd.Timestamp("2023-01-01 20:00", tz="UTC") + pd.to_timedelta(np.cumsum(rng.integers(5, 120, n)), "s")
+    lat = 46.0 + np.cumsum(rng.normal(0, 1e-4, n))
+    lon = 7.0 + np.cumsum(rng.normal(0, 1e-4, n))
+    # Activities with gaps, also across day boundaries
+    activity = rng.choice(np.array(["walking", "still", None], dtype=object), n, p=[0.01, 0.01, 0.98])
+    df = make_records(timestamps, lat, lon, activity)
+
+    expected = reduce_records(df)
+    chunks = (df.iloc[i : i + 250].reset_index(drop=True) for i in range(0, n, 250))
+    batches = list(iter_reduce_records(chunks))
+    assert len(batches) > 1
+    pd.testing.assert_frame_equal(pd.concat(batches, ignore_index=True), expected)
+    assert list(iter_reduce_records([])) == []
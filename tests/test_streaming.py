@@ -0,0 +1,80 @@
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from chatlas import streaming
+from chatlas.streaming import CURSOR, StreamHandler
+
+
+class Container:
+    def __init__(self):
+        self.renders = []
+
+    def markdown(self, text):
+        self.renders.append(text)
+
+
+def llm_result(content="", **additional_kwargs) -> LLMResult:
+    message = AIMessage(content=content, additional_kwargs=additional_kwargs)
+    return LLMResult(generations=[[ChatGeneration(message=message)]])
+
+
+def test_streams_answer_and_discards_tool_calls():
+    container = Container()
+    handler = StreamHandler(container, min_interval_s=0)
+
+    handler.on_chat_model_start({}, [])
+    handler.on_llm_new_token("Let me check")
+    handler.on_llm_end(llm_result("Let me check", function_call={"name": "sql_db_query", "arguments": "{}"}))
+    assert container.renders[-1] == ""
+
+    handler.on_chat_model_start({}, [])
+    for token in ["You ", "visited ", "3 ", "countries."]:
+        handler.on_llm_new_token(token)
+    assert container.renders[-1] == "You visited 3 countries." + CURSOR
+    handler.on_llm_end(llm_result("You visited 3 countries."))
+
+    assert container.renders[-1] == "You visited 3 countries."
+    assert handler.time_to_first_token is not None
+
+
+def test_throttles_renders():
+    container = Container()
+    handler = StreamHandler(container, min_interval_s=60)
+    handler.on_chat_model_start({}, [])
+    for _ in range(100):
+        handler.on_llm_new_token("word ")
+    handler.on_llm_end(llm_result("word " * 100))
+    # The first token and the final flush
+    assert len(container.renders) == 2
+    assert container.renders[-1] == "word " * 100
+
+
+def test_final_answer_prefix():
+    container = Container()
+    handler = StreamHandler(container, min_interval_s=0, final_answer_prefix="Final Answer:")
+    handler.on_llm_start({}, [])
+    for token in ["Thought: done\n", "Final ", "Answer:", " Paris"]:
+        handler.on_llm_new_token(token)
+    handler.on_llm_end(llm_result())
+    assert container.renders == ["Paris" + CURSOR, "Paris"]
+
+
+def test_time_to_first_token_ignores_retracted_tokens(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(streaming.time, "perf_counter", lambda: now[0])
+    container = Container()
+    handler = StreamHandler(container, min_interval_s=0)
+
+    now[0] = 1.0
+    handler.on_chat_model_start({}, [])
+    handler.on_llm_new_token("Let me check")
+    handler.on_llm_end(llm_result("Let me check", function_call={"name": "sql_db_query", "arguments": "{}"}))
+    assert container.renders == ["Let me check" + CURSOR, ""]
+    assert handler.time_to_first_token is None
+
+    now[0] = 3.0
+    handler.on_chat_model_start({}, [])
+    handler.on_llm_new_token("Paris")
+    now[0] = 4.0
+    handler.on_llm_end(llm_result("Paris"))
+    assert handler.time_to_first_token == 3.0
@@ -0,0 +1,30 @@
+from chatlas.utils import FieldExtractor, get_nested_value
+
+
+def test_field_extractor_matches_get_nested_value():
+    spec = {
+        "name": ["location", "name"],
+        "lat": ["location", "latitudeE7"],
+        "type": ["placeVisitType"],
+        "first": ["activities", 0, "probability"],
+        "second": ["activities", 1, "probability"],
+        "negative": ["activities", -1, "probability"],
+        "deep": ["a", "b", "c", "d"],
+    }
+    objs = [
+        {"location": {"name": "Cafe", "latitudeE7": 1}, "placeVisitType": "SINGLE_PLACE"},
+        {"location": None, "activities": [{"probability": 0.5}]},
+        {"location": ["not", "a", "dict"], "activities": "not a list", "a": {"b": {"c": {"d": 4}}}},
+        {"placeVisitType": None, "a": {"b": [1]}},
+        {},
+    ]
+    for default in (None, "missing"):
+        columns = FieldExtractor(spec, default=default).extract(objs)
+        expected = {column: [get_nested_value(obj, keys, default) for obj in objs] for column, keys in spec.items()}
+        assert columns == expected
+
+
+def test_field_extractor_empty():
+    extractor = FieldExtractor({"a": ["a"], "b": ["b", "c"]})
+    assert extractor.extract([]) == {"a": [], "b": []}
+    assert extractor.empty() == {"a": [], "b": []}